@@ -38,6 +38,9 @@ setup(
     include_package_data=True,
     zip_safe=False,
     extras_require=dict(
+        http2=[
+            'hyper',
+        ],
         test=[
             'responses',
             'unittest2',
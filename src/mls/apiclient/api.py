@@ -1,19 +1,32 @@
 # -*- coding: utf-8 -*-
 """MLS API."""
 
+from mls.apiclient import cache
+from mls.apiclient import client
 from mls.apiclient import exceptions
+from mls.apiclient import hosts
 from mls.apiclient import HTTP_HEADER_PREFIX
 from mls.apiclient import PRODUCT_NAME
+from mls.apiclient import singleflight
+from mls.apiclient import transport as transports
 from mls.apiclient import utils
+from mls.apiclient.deadline import current as current_deadline
+from mls.apiclient.executor import TimeoutError
 
 import datetime
+import functools
 import json
 import logging
 import requests
+import threading
+import time
 
 
 logger = logging.getLogger(PRODUCT_NAME)
 
+#: Default (connect, read) timeout in seconds for MLS requests.
+DEFAULT_TIMEOUT = (3.05, 30)
+
 
 class API(object):
     """API class for the MLS.
@@ -22,24 +35,220 @@ class API(object):
     authenticating the connections and requests to the MLS database.
     """
 
-    def __init__(self, base_url, api_key=None, lang=None, debug=None):
+    def __init__(
+        self, base_url, api_key=None, lang=None, debug=None,
+        pool_connections=10, pool_maxsize=10, pool_block=False,
+        retry=None, circuit_breakers=None, verify=None, fingerprint=None,
+        timeout=DEFAULT_TIMEOUT, http2=False, dns_cache=None, transport=None,
+        coalesce=True, rate_limiter=None, concurrency_limiter=None,
+        hedging=None, scheduler=None, metadata_cache=None,
+        validator_cache=None, response_cache=None, search_cache=None,
+        negative_cache=None,
+    ):
         """Create API object.
 
+        ``base_url`` can be a list of base URLs of several mirrors of the
+        MLS. Requests are then sent to the fastest healthy mirror, and GET
+        requests fail over to the next mirror on connection or server errors
+        (see :class:`mls.apiclient.hosts.HostPool`).
+
+        ``timeout`` is the default timeout for all requests, either a number
+        or a ``(connect, read)`` tuple of seconds.
+
+        ``pool_connections``, ``pool_maxsize`` and ``pool_block`` configure
+        the connection pool of the default transport, ``retry`` and
+        ``circuit_breakers`` its failure handling (see
+        :mod:`mls.apiclient.retry`), ``verify`` and ``fingerprint`` its TLS
+        verification, ``http2`` the use of HTTP/2 and ``dns_cache`` the
+        caching of host addresses (see
+        :class:`mls.apiclient.transport.RequestsTransport`).
+        Pass an existing ``transport`` to share its connections with other API
+        objects.
+
+        With ``coalesce``, identical GET requests made concurrently (e.g. by
+        several threads) are sent only once and share the result (see
+        :class:`mls.apiclient.singleflight.SingleFlight`).
+
+        A ``rate_limiter`` (see :class:`mls.apiclient.ratelimit.RateLimiter`)
+        delays requests exceeding the allowed rate per host and API key, a
+        ``concurrency_limiter`` (see
+        :class:`mls.apiclient.concurrency.AdaptiveLimiter`) the requests
+        exceeding the number of allowed concurrent requests.
+
+        A ``hedging`` policy (see :class:`mls.apiclient.hedging.HedgePolicy`)
+        sends slow GET requests again to another mirror.
+
+        A ``scheduler`` (see
+        :class:`mls.apiclient.scheduler.PriorityScheduler`) shares the
+        connections between interactive, prefetch and bulk requests.
+
+        Field titles, field order and listing categories are cached in
+        ``metadata_cache`` (by default a :class:`mls.apiclient.cache.TTLCache`
+        keeping them for an hour). Pass ``False`` to disable the cache.
+
+        With a ``validator_cache`` (see
+        :class:`mls.apiclient.cache.ValidatorCache`), GET requests are sent
+        as conditional requests with the ``ETag`` and ``Last-Modified``
+        validators of earlier responses. Unchanged data is then parsed from
+        the cached body instead of being sent again.
+
+        An optional ``response_cache`` (e.g. a
+        :class:`mls.apiclient.persistent.SQLiteCache`) keeps the details
+        returned by ``Resource.get`` and ``ListingResource.get`` across
+        restarts. Searches of ``Resource.search`` and
+        ``ListingResource.search`` are kept in an optional ``search_cache``
+        (e.g. a :class:`mls.apiclient.cache.TTLCache`), the TTL can be set
+        per resource with ``search_ttl``. Missing objects are remembered by
+        an optional ``negative_cache`` (a
+        :class:`mls.apiclient.cache.NegativeCache`), so repeated lookups of
+        withdrawn objects don't reach the MLS.
+
         Usage::
 
             >>> from mls.apiclient import api
             >>> mls = api.API('https://demomls.com')
+
+        The API object can be used as a context manager to release the
+        pooled connections when done::
+
+            >>> with api.API('https://demomls.com') as mls:
+            ...     mls.get('api/rest/v1/developments')
         """
-        self.base_url = base_url
+        self.hosts = hosts.HostPool(base_url)
+        self.base_urls = self.hosts.base_urls
+        self.base_url = self.base_urls[0]
         self.api_key = api_key
         self.lang = lang
         self.debug = debug
+        self.timeout = timeout
+        if transport is None:
+            transport = transports.RequestsTransport(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                retry=retry,
+                circuit_breakers=circuit_breakers,
+                verify=verify,
+                fingerprint=fingerprint,
+                http2=http2,
+                dns_cache=dns_cache,
+            )
+        self.transport = transport
+        self.single_flight = singleflight.SingleFlight() if coalesce else None
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.hedging = hedging
+        self.scheduler = scheduler
+        if metadata_cache is None:
+            metadata_cache = cache.TTLCache()
+        if metadata_cache is False:
+            metadata_cache = None
+        self.metadata_cache = metadata_cache
+        self.validator_cache = validator_cache
+        self.response_cache = response_cache
+        self.search_cache = search_cache
+        self.negative_cache = negative_cache
+        self._listing_resource = None
+        self._listing_resource_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-    def request(self, url, method, body=None, params=None):
+    @property
+    def session(self):
+        """Return the session of a ``requests`` based transport."""
+        return self.transport.session
+
+    @property
+    def listing_resource(self):
+        """Return the legacy listing resource sharing this API's transport."""
+        if self._listing_resource is None:
+            with self._listing_resource_lock:
+                if self._listing_resource is None:
+                    self._listing_resource = client.ListingResource(
+                        self.base_urls,
+                        api_key=self.api_key,
+                        debug=self.debug,
+                        transport=self.transport,
+                        hosts=self.hosts,
+                        rate_limiter=self.rate_limiter,
+                        concurrency_limiter=self.concurrency_limiter,
+                        hedging=self.hedging,
+                        scheduler=self.scheduler,
+                        metadata_cache=self.metadata_cache or False,
+                        response_cache=self.response_cache,
+                        search_cache=self.search_cache,
+                        negative_cache=self.negative_cache,
+                    )
+        return self._listing_resource
+
+    def warmup(self, connections=1):
+        """Resolve the MLS host and open ``connections`` pooled connections.
+
+        Call this after starting a worker to avoid paying for DNS, TCP and
+        TLS on the first requests. Returns the number of opened connections.
+        """
+        return sum(
+            self.transport.warmup(base_url, connections)
+            for base_url in self.base_urls
+        )
+
+    def keep_warm(self, connections=1, interval=30.0):
+        """Keep at least ``connections`` idle connections open.
+
+        The pool is topped up every ``interval`` seconds in a background
+        thread, until the API is closed.
+        """
+        for base_url in self.base_urls:
+            self.transport.keep_warm(base_url, connections, interval)
+
+    def host_stats(self):
+        """Return latency and error statistics for every MLS host."""
+        return self.hosts.stats()
+
+    def close(self):
+        """Close all pooled connections.
+
+        The API object stays usable, new connections are opened on the next
+        request.
+        """
+        if self.hedging is not None:
+            self.hedging.close()
+        self.transport.close()
+
+    def request(
+        self, url, method, body=None, params=None, timeout=None, deadline=None,
+    ):
         """Make HTTP call, formats response and does error handling.
 
-        Uses http_call method in API class.
+        Uses http_call method in API class. ``timeout`` overrides the default
+        timeout of the API, ``deadline`` limits the time for the request (see
+        :class:`mls.apiclient.deadline.Deadline`).
+
+        Identical concurrent GET requests are coalesced. A request waiting
+        for another one still fails once its own deadline is spent.
         """
+        key, url = self._build_url(url, params)
+        deadline = deadline or current_deadline()
+        if method == 'GET' and body is None and self.single_flight:
+            try:
+                return self.single_flight.do(
+                    key,
+                    self._failover_request,
+                    url, method, body, timeout, deadline,
+                    wait=deadline.remaining() if deadline else None,
+                )
+            except TimeoutError:
+                raise exceptions.DeadlineExceeded(
+                    'Deadline exceeded while waiting for {0}.'.format(url)
+                )
+        return self._failover_request(url, method, body, timeout, deadline)
+
+    def _build_url(self, url, params=None):
+        """Return the request key and the URL with all parameters."""
         url, url_params = utils.split_url_params(url)
         if params:
             url_params = utils.merge_dict(url_params, params)
@@ -47,23 +256,81 @@ class API(object):
             url_params = utils.merge_dict(url_params, {'apikey': self.api_key})
         if self.lang:
             url_params = utils.merge_dict(url_params, {'lang': self.lang})
-        url = utils.join_url_params(url, url_params)
+        # The encoded query is hashable, whatever the type of the values.
+        key = utils.join_url_params(url, sorted(url_params.items()))
+        return key, utils.join_url_params(url, url_params)
+
+    def _failover_request(
+        self, url, method, body, timeout, deadline, rotate=False,
+    ):
+        """Make the request, failing over to the other hosts for GETs.
+
+        With ``rotate``, the second best host is tried first.
+        """
+        candidates = self.hosts.candidates(url, failover=method == 'GET')
+        if rotate:
+            candidates = candidates[1:] + candidates[:1]
+        for candidate in candidates[:-1]:
+            try:
+                return self._request(
+                    candidate, method, body, timeout, deadline,
+                )
+            except exceptions.ServerError as e:
+                logger.warning(
+                    'Request to {0} failed ({1}), failing over.'.format(
+                        candidate, e,
+                    )
+                )
+        return self._request(candidates[-1], method, body, timeout, deadline)
 
+    def _request(self, url, method, body, timeout, deadline):
+        """Make the HTTP call to one host and record its latency and errors.
+        """
+        # Local queueing doesn't count as latency of the host.
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url, self.api_key, deadline)
+        if self.scheduler is not None:
+            self.scheduler.acquire(deadline=deadline)
+        limiter = self.concurrency_limiter
+        if limiter is not None:
+            try:
+                token = limiter.acquire(deadline)
+            except exceptions.DeadlineExceeded:
+                if self.scheduler is not None:
+                    self.scheduler.release()
+                raise
+        start = time.time()
+        failed = False
         try:
             return self.http_call(
                 url,
                 method,
-                data=json.dumps(body),
+                data=json.dumps(body) if body is not None else None,
                 headers=self.headers(),
+                timeout=timeout,
+                deadline=deadline,
             )
         except exceptions.BadRequest as error:
             # Format Error message for bad request
             return {'error': json.loads(error.content)}
+        except exceptions.ServerError:
+            failed = True
+            raise
+        except requests.Timeout:
+            failed = True
+            raise exceptions.ServerError(504, 'Timeout', url=url)
         except requests.ConnectionError, e:
+            failed = True
             if e.request:
                 raise exceptions.ServerError(503, url=e.request.url)
             else:
                 raise exceptions.ServerError(503, url=url)
+        finally:
+            self.hosts.record(url, time.time() - start, error=failed)
+            if limiter is not None:
+                limiter.release(token, error=failed)
+            if self.scheduler is not None:
+                self.scheduler.release()
 
     def http_call(self, url, method, **kwargs):
         """Make a http call and log response information."""
@@ -71,31 +338,67 @@ class API(object):
             logger.info('Request[{0}]: {1}'.format(method, url))
         start_time = datetime.datetime.now()
 
-        verify_ssl = True
-        while True:
-            try:
-                response = requests.request(
-                    method,
-                    url,
-                    verify=verify_ssl,
-                    **kwargs
-                )
-            except requests.exceptions.SSLError:
-                verify_ssl = False
-                continue
-            else:
-                break
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        validators = self.validator_cache if method == 'GET' else None
+        if validators is not None:
+            kwargs['headers'] = utils.merge_dict(
+                kwargs.get('headers') or {}, validators.headers(url),
+            )
+        response = self._send(method, url, **kwargs)
 
         duration = datetime.datetime.now() - start_time
         if self.debug:
-            logger.info('Response[{0}]: {1}, Duration: {2}.{3}s.'.format(
-                response.status_code,
-                response.reason,
-                duration.seconds,
-                duration.microseconds,
-            ))
+            logger.info(
+                'Response[{0}]: {1}, Duration: {2}.{3}s, '
+                'Size: {4} bytes ({5} bytes decoded).'.format(
+                    response.status_code,
+                    response.reason,
+                    duration.seconds,
+                    duration.microseconds,
+                    response.wire_size,
+                    response.decoded_size,
+                )
+            )
 
-        return self.handle_response(response, response.content.decode('utf-8'))
+        if validators is None:
+            return self.handle_response(
+                response, response.content.decode('utf-8'),
+            )
+        if response.status_code == 304:
+            cached = validators.not_modified(url)
+            if cached is not None:
+                return self.handle_response(
+                    cached, cached.content.decode('utf-8'),
+                )
+            # The cached response was dropped after the validators were
+            # sent, ask for the full response again.
+            kwargs['headers'] = dict(
+                (name, value) for name, value in kwargs['headers'].items()
+                if name not in ('If-None-Match', 'If-Modified-Since')
+            )
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(
+                    url, self.api_key,
+                    kwargs.get('deadline') or current_deadline(),
+                )
+            response = self._send(method, url, **kwargs)
+        result = self.handle_response(
+            response, response.content.decode('utf-8'),
+        )
+        validators.store(url, response)
+        return result
+
+    def _send(self, method, url, **kwargs):
+        """Send the request and adapt the rate limit to the response."""
+        response = self.transport.request(method, url, **kwargs)
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(
+                url,
+                self.api_key,
+                utils.extract_headers(response.headers, HTTP_HEADER_PREFIX),
+            )
+        return response
 
     def handle_response(self, response, content):
         """Validate HTTP response."""
@@ -141,10 +444,37 @@ class API(object):
             'Accept': 'application/json',
         }
 
-    def get(self, action, params=None):
-        """Make GET request."""
-        return self.request(
-            utils.join_url(self.base_url, action),
-            'GET',
-            params=params or {},
+    def get(self, action, params=None, timeout=None, deadline=None):
+        """Make GET request.
+
+        With a ``hedging`` policy, a slow request is sent again to the next
+        mirror (see :class:`mls.apiclient.hedging.HedgePolicy`).
+        """
+        url = utils.join_url(self.base_url, action)
+        params = params or {}
+        if self.hedging is None:
+            return self.request(
+                url, 'GET', params=params, timeout=timeout, deadline=deadline,
+            )
+
+        # Thread local deadlines don't reach the worker threads.
+        deadline = deadline or current_deadline()
+        return self.hedging.run(
+            functools.partial(
+                self.request,
+                url,
+                'GET',
+                params=params,
+                timeout=timeout,
+                deadline=deadline,
+            ),
+            functools.partial(
+                self._failover_request,
+                self._build_url(url, params)[1],
+                'GET',
+                None,
+                timeout,
+                deadline,
+                rotate=True,
+            ),
         )
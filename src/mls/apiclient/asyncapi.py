@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""MLS API running requests concurrently."""
+
+from mls.apiclient import api
+from mls.apiclient.concurrency import AdaptiveLimiter
+from mls.apiclient.executor import Executor
+
+
+class AsyncAPI(api.API):
+    """API running its requests in a pool of worker threads.
+
+    All workers share the pooled connections of the API's transport. The
+    ``*_async`` methods return :class:`mls.apiclient.executor.Future`
+    objects, the blocking methods of :class:`mls.apiclient.api.API` keep
+    working as before.
+
+    Usage::
+
+        >>> from mls.apiclient.asyncapi import AsyncAPI
+        >>> from mls.apiclient.resources import Development
+        >>> with AsyncAPI('https://demomls.com', max_workers=10) as mls:
+        ...     futures = [
+        ...         Development.get_async(mls, key) for key in keys
+        ...     ]
+        ...     developments = [future.result() for future in futures]
+
+    ``max_workers`` defaults to ``pool_maxsize``, so that every worker gets
+    a pooled connection. Unless a ``concurrency_limiter`` is given, the
+    number of concurrent requests adapts to the MLS latency up to
+    ``max_workers`` (see :class:`mls.apiclient.concurrency.AdaptiveLimiter`).
+    """
+
+    def __init__(self, base_url, max_workers=None, executor=None, **kwargs):
+        max_workers = max_workers or kwargs.get('pool_maxsize', 10)
+        if kwargs.get('concurrency_limiter') is None:
+            kwargs['concurrency_limiter'] = AdaptiveLimiter(
+                max_limit=max_workers,
+            )
+        super(AsyncAPI, self).__init__(base_url, **kwargs)
+        self.max_workers = max_workers
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = Executor(max_workers=self.max_workers)
+        self.executor = executor
+
+    @property
+    def listing_resource(self):
+        """Return the legacy listing resource sharing the executor."""
+        resource = super(AsyncAPI, self).listing_resource
+        resource.executor = self.executor
+        return resource
+
+    def submit(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in a worker, return its future."""
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def request_async(self, url, method, **kwargs):
+        """Make a request in a worker, see :meth:`API.request`."""
+        return self.submit(self.request, url, method, **kwargs)
+
+    def get_async(self, action, **kwargs):
+        """Make a GET request in a worker, see :meth:`API.get`."""
+        return self.submit(self.get, action, **kwargs)
+
+    def close(self):
+        """Stop the workers and close all pooled connections.
+
+        New workers are started on the next asynchronous call.
+        """
+        if self._owns_executor:
+            self.executor.shutdown()
+            self.executor = Executor(max_workers=self.max_workers)
+        super(AsyncAPI, self).close()
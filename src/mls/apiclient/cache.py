@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""In-memory caches for rarely changing MLS data."""
+
+from copy import deepcopy
+from mls.apiclient.stats import Counters
+
+import collections
+import threading
+import time
+
+
+#: Params which don't change the results of a search.
+IGNORED_PARAMS = ('apikey', 'format')
+
+
+def _normalize(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if not isinstance(value, basestring):
+        value = str(value)
+    return value.strip()
+
+
+def search_key(url, params=None, lang=None):
+    """Return a cache key for a search, independent of the params order.
+
+    Credentials and the response format are not part of the key. Values are
+    compared as stripped strings and params without a value are ignored.
+
+    Usage::
+
+        >>> search_key('https://demomls.com/api/listings',
+        ...            {'limit': 10, 'apikey': '1234', 'lang': 'en'})
+        ('https://demomls.com/api/listings', 'en', (('limit', '10'),))
+    """
+    params = dict(params or {})
+    if lang is None:
+        lang = params.get('lang')
+    items = []
+    for name, value in params.items():
+        if name in IGNORED_PARAMS or name == 'lang':
+            continue
+        if value is None or value == '':
+            continue
+        items.append((name, _normalize(value)))
+    return url, lang, tuple(sorted(items))
+
+
+class TTLCache(object):
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    At most ``maxsize`` entries are kept, the least recently used entry is
+    evicted first. Lookups are counted as ``hits`` and ``misses`` in
+    ``stats``. Values are copied on the way out, so callers can't change
+    the cached data.
+
+    Usage::
+
+        >>> from mls.apiclient.cache import TTLCache
+        >>> cache = TTLCache(maxsize=256, ttl=3600)
+        >>> cache.get_or_set(('field_titles', 'developments'), load_titles)
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, clock=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = Counters()
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= self._clock():
+            del self._entries[key]
+            return False, None
+        # Move the entry to the end, it's the most recently used now.
+        del self._entries[key]
+        self._entries[key] = entry
+        return True, entry[1]
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key`` or ``default``."""
+        with self._lock:
+            found, value = self._lookup(key)
+        if not found:
+            self.stats.incr('misses')
+            return default
+        self.stats.incr('hits')
+        return deepcopy(value)
+
+    def set(self, key, value, ttl=None):
+        """Cache ``value`` for ``ttl`` seconds (defaults to the cache TTL)."""
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._clock() + ttl, deepcopy(value))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.incr('evictions')
+
+    def get_or_set(self, key, fn, ttl=None):
+        """Return the cached value for ``key``, caching ``fn()`` on a miss.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+        if found:
+            self.stats.incr('hits')
+            return deepcopy(value)
+        self.stats.incr('misses')
+        value = fn()
+        self.set(key, value, ttl=ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """Remove the entry for ``key`` or all entries."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class ValidatorCache(object):
+    """Remember the validators and bodies of MLS responses.
+
+    For every URL, the last response with an ``ETag`` or ``Last-Modified``
+    header is stored. Only its raw body is kept, which is smaller than the
+    decoded result and cheaper to parse again than to copy. At most
+    ``maxsize`` URLs are kept, the least recently used URL is evicted
+    first. Responses answered with ``304 Not Modified`` are counted in
+    ``stats`` as ``not_modified`` with the saved bytes in ``bytes_saved``.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.cache import ValidatorCache
+        >>> mls = api.API(
+        ...     'https://demomls.com',
+        ...     validator_cache=ValidatorCache(maxsize=64),
+        ... )
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.stats = Counters()
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def headers(self, url):
+        """Return the conditional request headers for ``url``."""
+        with self._lock:
+            response = self._entries.get(url)
+        if response is None:
+            return {}
+        headers = {}
+        if response.headers.get('ETag'):
+            headers['If-None-Match'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = response.headers['Last-Modified']
+        return headers
+
+    def store(self, url, response):
+        """Remember ``response`` if it has validators."""
+        if not response.headers.get('ETag') and \
+                not response.headers.get('Last-Modified'):
+            return
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = response
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def not_modified(self, url):
+        """Return the cached response for a ``304 Not Modified`` response.
+
+        Returns ``None`` if nothing is cached for ``url``.
+        """
+        with self._lock:
+            response = self._entries.pop(url, None)
+            if response is None:
+                return None
+            self._entries[url] = response
+        self.stats.incr('not_modified')
+        self.stats.incr('bytes_saved', response.wire_size)
+        return response
+
+    def invalidate(self, url=None):
+        """Remove the entry for ``url`` or all entries."""
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+
+class NegativeCache(object):
+    """Remember missing objects for ``ttl`` seconds.
+
+    At most ``maxsize`` keys are kept, the oldest key is evicted first.
+    Lookups are counted as ``hits`` and ``misses`` in ``stats``.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.cache import NegativeCache
+        >>> mls = api.API(
+        ...     'https://demomls.com',
+        ...     negative_cache=NegativeCache(ttl=60),
+        ... )
+    """
+
+    def __init__(self, ttl=60, maxsize=10000, clock=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stats = Counters()
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def add(self, key):
+        """Remember that the object for ``key`` is missing."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = self._clock() + self.ttl
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.incr('evictions')
+
+    def __contains__(self, key):
+        return bool(self.missing([key]))
+
+    def missing(self, keys):
+        """Return the keys known to be missing, checked under one lock."""
+        keys = list(keys)
+        now = self._clock()
+        missing = []
+        with self._lock:
+            for key in keys:
+                expires = self._entries.get(key)
+                if expires is None:
+                    continue
+                if expires <= now:
+                    del self._entries[key]
+                    continue
+                missing.append(key)
+        if missing:
+            self.stats.incr('hits', len(missing))
+        if len(keys) > len(missing):
+            self.stats.incr('misses', len(keys) - len(missing))
+        return missing
+
+    def invalidate(self, key=None):
+        """Forget the entry for ``key`` or all entries."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
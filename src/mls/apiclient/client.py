@@ -5,14 +5,32 @@ mls.apiclient is a Python client for the RESTful API of the Propertyshelf MLS.
 """
 
 from copy import deepcopy
+from mls.apiclient import HTTP_HEADER_PREFIX
+from mls.apiclient.cache import search_key
+from mls.apiclient.cache import TTLCache
+from mls.apiclient.deadline import current as current_deadline
+from mls.apiclient.exceptions import CircuitOpenError
+from mls.apiclient.exceptions import DeadlineExceeded
 from mls.apiclient.exceptions import ImproperlyConfigured
 from mls.apiclient.exceptions import MLSError
 from mls.apiclient.exceptions import ObjectNotFound
+from mls.apiclient.executor import Executor
+from mls.apiclient.executor import gather
+from mls.apiclient.executor import iter_results
+from mls.apiclient.executor import pool
+from mls.apiclient.executor import prefetch as prefetch_pages
+from mls.apiclient.hosts import HostPool
+from mls.apiclient.persistent import make_key
+from mls.apiclient.transport import RequestsTransport
+from mls.apiclient.utils import extract_headers
+from mls.apiclient.utils import split_url_params
 from urlparse import urljoin
 
 import datetime
 import logging
 import requests
+import threading
+import time
 
 
 API_URL = 'api'
@@ -31,15 +49,54 @@ class ResourceBase(object):
     path_search = 'search'
     path_detail = 'detail'
     path_categories = None
+    #: Seconds to keep search results, defaults to the search cache TTL.
+    search_ttl = None
 
-    def __init__(self, base_url, api_key='', path=None, debug=False):
-        self._base_url = base_url
+    def __init__(
+        self, base_url, api_key='', path=None, debug=False, transport=None,
+        timeout=2.5, hosts=None, executor=None, rate_limiter=None,
+        concurrency_limiter=None, hedging=None, scheduler=None,
+        metadata_cache=None, response_cache=None, search_cache=None,
+        search_ttl=None, negative_cache=None,
+    ):
+        if hosts is None:
+            hosts = HostPool(base_url)
+        self._hosts = hosts
+        self._base_url = hosts.base_urls[0]
         self._api_key = api_key
         self._debug = debug
         if path:
             self.path = path
         self._url = '/'.join([self._base_url, API_URL, self.path])
         self._format = 'json'
+        self._timeout = timeout
+        if transport is None:
+            transport = RequestsTransport()
+        self._transport = transport
+        self.executor = executor
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.hedging = hedging
+        self.scheduler = scheduler
+        if metadata_cache is None:
+            metadata_cache = TTLCache()
+        if metadata_cache is False:
+            metadata_cache = None
+        self.metadata_cache = metadata_cache
+        self.response_cache = response_cache
+        self.search_cache = search_cache
+        self.negative_cache = negative_cache
+        if search_ttl is not None:
+            self.search_ttl = search_ttl
+        self._executor_lock = threading.Lock()
+
+    def _submit(self, fn, *args, **kwargs):
+        """Run ``fn`` in a worker thread and return its future."""
+        if self.executor is None:
+            with self._executor_lock:
+                if self.executor is None:
+                    self.executor = Executor()
+        return self.executor.submit(fn, *args, **kwargs)
 
     def all(self):
         """Returns all objects of this Resource."""
@@ -49,83 +106,350 @@ class ResourceBase(object):
         """Returns one object of this Resource.
 
         You have to give one keyword argument to find the object.
+
+        With a ``hedging`` policy, a slow request is sent again to the next
+        MLS host (see :class:`mls.apiclient.hedging.HedgePolicy`). Objects
+        are kept in the optional ``response_cache``, missing objects in the
+        optional ``negative_cache``.
         """
+        params = self._detail_params(key, lang, params)
+        if self.response_cache is None and self.negative_cache is None:
+            return self._get(params)
+        cache_key = self._cache_key(params)
+        negative_cache = self.negative_cache
+        if negative_cache is not None and cache_key in negative_cache:
+            raise ObjectNotFound('Item not found.')
+        result = None
+        if self.response_cache is not None:
+            result = self.response_cache.get(cache_key)
+        if result is None:
+            try:
+                result = self._get(params)
+            except ObjectNotFound:
+                if negative_cache is not None:
+                    negative_cache.add(cache_key)
+                raise
+            if self.response_cache is not None:
+                self.response_cache.set(cache_key, result)
+        return result
+
+    def _detail_params(self, key, lang=None, params=None):
+        """Returns the request params for the object ``key``."""
         if not params or not isinstance(params, dict):
             params = {}
         params['search'] = '/'.join([self.path_detail, key])
         if lang is not None:
             params['lang'] = lang
-        result = self._query(params, batching=False)
+        return params
+
+    def _cache_key(self, params):
+        """Returns the cache key for the request params of an object."""
+        return make_key(
+            urljoin(self._url + '/', params['search']),
+            dict(params, apikey=self._api_key),
+        )
+
+    def _get(self, params):
+        """Returns one object of this Resource from the MLS."""
+        if self.hedging is None:
+            result = self._query(params, batching=False)
+        else:
+            deadline = current_deadline()
+            result = self.hedging.run(
+                lambda: self._query(params, batching=False, deadline=deadline),
+                lambda: self._query(
+                    params, batching=False, deadline=deadline, rotate=True,
+                ),
+            )
         if result is None:
             raise ObjectNotFound('Item not found.')
         return result
 
+    def get_many(self, keys, lang=None, params=None, concurrency=4):
+        """Returns the objects for several keys in the order of ``keys``.
+
+        The objects are fetched concurrently by at most ``concurrency``
+        threads (or the workers of the resource's ``executor``). If an
+        object can't be fetched, the exception (e.g. ``ObjectNotFound``) is
+        returned in its place. Keys in the ``negative_cache`` are not
+        requested at all.
+        """
+        def fetch(key):
+            return self.get(key, lang=lang, params=dict(params or {}))
+
+        if self.negative_cache is None:
+            return gather(
+                fetch, keys, errors=MLSError, executor=self.executor,
+                max_workers=concurrency,
+            )
+        keys = list(keys)
+        cache_keys = [
+            self._cache_key(self._detail_params(key, lang, dict(params or {})))
+            for key in keys
+        ]
+        missing = set(self.negative_cache.missing(cache_keys))
+        found = iter(gather(
+            fetch,
+            [key for key, cache_key in zip(keys, cache_keys)
+             if cache_key not in missing],
+            errors=MLSError,
+            executor=self.executor,
+            max_workers=concurrency,
+        ))
+        return [
+            ObjectNotFound('Item not found.') if cache_key in missing
+            else next(found)
+            for cache_key in cache_keys
+        ]
+
     def category(self, key, lang=None):
-        """Return values for a categorie."""
+        """Return values for a categorie.
+
+        The values are cached in the ``metadata_cache`` of the resource.
+        """
         if self.path_categories is None:
             return
         params = {}
         params['search'] = '/'.join([self.path_categories, key])
         if lang is not None:
             params['lang'] = lang
-        result = self._query(params, batching=False)
+        if self.metadata_cache is None:
+            result = self._query(params, batching=False)
+        else:
+            result = self.metadata_cache.get_or_set(
+                (self._url, params['search'], lang, self._api_key),
+                lambda: self._query(params, batching=False),
+            )
         if result is None:
             raise ObjectNotFound('Item not found.')
         return [tuple(item) for item in result]
 
+    def iter_search(
+        self, params, page_size=None, max_items=None, max_pages=None,
+        prefetch=0,
+    ):
+        """Yield the results of a search page by page.
+
+        The next page is found with the ``next`` URL of the batching
+        information or, if missing, the ``limit`` and ``offset`` of the
+        current page. ``page_size`` sets the ``limit`` of every page. Stops
+        after ``max_items`` results or ``max_pages`` pages.
+
+        With ``prefetch``, up to that many following pages are fetched in
+        the background while the current page is consumed.
+        """
+        params = dict(params)
+        if page_size is not None:
+            params['limit'] = page_size
+        pages = self._iter_pages(params, max_pages)
+        items = 0
+        for results in prefetch_pages(pages, prefetch):
+            for item in results:
+                yield item
+                items += 1
+                if max_items is not None and items >= max_items:
+                    return
+
+    def _iter_pages(self, params, max_pages=None):
+        """Yield the results of every page of a search."""
+        pages = 0
+        while True:
+            results, batching = self.search(dict(params))
+            yield results or []
+            pages += 1
+            if max_pages is not None and pages >= max_pages:
+                return
+            params = self._get_next_params(params, results, batching)
+            if params is None:
+                return
+
+    def fetch_all(self, params, page_size=None, max_workers=4, ordered=True):
+        """Yield all results of a search, fetching the pages concurrently.
+
+        After the first page, the offsets of the remaining pages are taken
+        from the batching information and fetched by at most
+        ``max_workers`` threads (or the workers of the resource's
+        ``executor``). Results are yielded in the order of the pages or,
+        without ``ordered``, as pages complete.
+        """
+        params = dict(params)
+        if page_size is not None:
+            params['limit'] = page_size
+        results, batching = self.search(dict(params))
+        for item in results or []:
+            yield item
+        if not results or not batching:
+            return
+        limit = int(params.get('limit') or batching.get('items') or
+                    len(results))
+        start = int(params.get('offset', 0)) + limit
+        offsets = range(start, batching.get('results', 0), limit)
+        if not offsets:
+            return
+        params['limit'] = limit
+
+        def fetch(offset):
+            return self.search(dict(params, offset=offset))[0] or []
+
+        with pool(self.executor, max_workers) as executor:
+            futures = [executor.submit(fetch, offset) for offset in offsets]
+            for items in iter_results(futures, ordered=ordered):
+                for item in items:
+                    yield item
+
+    def _get_next_params(self, params, results, batching):
+        """Return the search params for the page after ``results``."""
+        if not results or not batching:
+            return
+        if batching.get('next'):
+            params = split_url_params(batching['next'])[1]
+            for name in ('apikey', 'format', 'search'):
+                params.pop(name, None)
+            return params
+        offset = int(params.get('offset', 0)) + len(results)
+        if offset >= batching.get('results', 0):
+            return
+        return dict(params, offset=offset)
+
+    def get_async(self, key, lang=None, params=None):
+        """Return a future for :meth:`get`."""
+        return self._submit(self.get, key, lang=lang, params=params)
+
+    def category_async(self, key, lang=None):
+        """Return a future for :meth:`category`."""
+        return self._submit(self.category, key, lang=lang)
+
+    def search_async(self, params):
+        """Return a future for :meth:`search`."""
+        return self._submit(self.search, params)
+
     def search(self, params):
         """Returns a list of objects.
 
         You can search for objects by giving one or more keyword arguments.
         Use limit and offset to limit the results.
+
+        With a ``search_cache``, the results and batching of equal searches
+        are kept for ``search_ttl`` seconds.
         """
         if len(params) == 0:
             raise MLSError('You have to give at least one search argument.')
         params['search'] = self.path_search
-        results, batching = self._query(params)
+        if self.search_cache is None:
+            return self._query(params)
+        key = search_key(self._url, params)
+        result = self.search_cache.get(key)
+        if result is None:
+            result = self._query(params)
+            self.search_cache.set(key, result, ttl=self.search_ttl)
+        results, batching = result
         return results, batching
 
-    def _get_response(self, url, params, timeout=2.5):
+    def _get_response(
+        self, url, params, timeout=None, deadline=None, rotate=False,
+    ):
         """Get the response from the MLS.
 
         :param url: [required] Request URL.
         :type url: string
         :param params: [required] Request params.
         :type params: dict
-        :param timeout: Request timeout.
-        :type timeout: float
+        :param timeout: Request timeout, defaults to the resource's timeout.
+        :type timeout: float or (connect, read) tuple
+        :param deadline: Time budget for the request.
+        :type deadline: mls.apiclient.deadline.Deadline
         :returns: response
-        :rtype: requests.response object
+        :rtype: mls.apiclient.transport.Response
+
+        If the resource knows several MLS hosts, the request fails over to
+        the next host on connection and server errors. With ``rotate``, the
+        second best host is tried first.
         """
+        candidates = self._hosts.candidates(url)
+        if rotate:
+            candidates = candidates[1:] + candidates[:1]
+        for index, candidate in enumerate(candidates):
+            last = index == len(candidates) - 1
+            try:
+                r = self._get_host_response(
+                    candidate, params, timeout, deadline,
+                )
+            except DeadlineExceeded:
+                raise
+            except MLSError:
+                if last:
+                    raise
+                continue
+            if r.status_code < 500 or last:
+                return r
+
+    def _get_host_response(self, url, params, timeout, deadline):
+        """Get the response from one MLS host and record its latency."""
         if self._debug:
             start_time = datetime.datetime.now()
 
-        verify_ssl = True
-        while True:
+        if timeout is None:
+            timeout = self._timeout
+        deadline = deadline or current_deadline()
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url, self._api_key, deadline)
+        if self.scheduler is not None:
+            self.scheduler.acquire(deadline=deadline)
+        limiter = self.concurrency_limiter
+        if limiter is not None:
             try:
-                r = requests.get(url, params=params, timeout=timeout, verify=verify_ssl)
-            except requests.exceptions.SSLError, e:
-                verify_ssl = False
-                continue
-            except requests.exceptions.ConnectionError, e:
-                if e.request:
-                    raise MLSError(
-                        'Connection to the MLS at {0} failed.'.format(
-                            e.request.url,
-                        )
-                    )
-                else:
-                    raise MLSError(e)
-            except requests.exceptions.MissingSchema:
-                raise MLSError(
-                    'No or wrong MLS URL provided.'
-                )
-            except requests.exceptions.Timeout, e:
+                token = limiter.acquire(deadline)
+            except DeadlineExceeded:
+                if self.scheduler is not None:
+                    self.scheduler.release()
+                raise
+        # Local queueing doesn't count as latency of the host.
+        start = time.time()
+        failed = True
+        try:
+            r = self._transport.request(
+                'GET', url, params=params, timeout=timeout, deadline=deadline,
+            )
+            failed = r.status_code >= 500
+        except DeadlineExceeded:
+            # The request was not sent, the host is not to blame.
+            start = None
+            raise
+        except CircuitOpenError, e:
+            raise MLSError(
+                'The MLS at {0} is currently unavailable.'.format(e.url)
+            )
+        except requests.exceptions.ConnectionError, e:
+            if e.request:
                 raise MLSError(
-                    'Connection to the MLS at {0} timed out.'.format(e.request.url)
+                    'Connection to the MLS at {0} failed.'.format(
+                        e.request.url,
+                    )
                 )
             else:
-                break
+                raise MLSError(e)
+        except requests.exceptions.MissingSchema:
+            raise MLSError(
+                'No or wrong MLS URL provided.'
+            )
+        except requests.exceptions.Timeout:
+            raise MLSError(
+                'Connection to the MLS at {0} timed out.'.format(url)
+            )
+        finally:
+            if start is not None:
+                self._hosts.record(url, time.time() - start, error=failed)
+            if limiter is not None:
+                limiter.release(token, error=failed)
+            if self.scheduler is not None:
+                self.scheduler.release()
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(
+                url,
+                self._api_key,
+                extract_headers(r.headers, HTTP_HEADER_PREFIX),
+            )
 
         if self._debug:
             logger.info('Request: {0}'.format(r.url))
@@ -138,7 +462,7 @@ class ResourceBase(object):
             ))
         return r
 
-    def _query(self, _params, batching=True):
+    def _query(self, _params, batching=True, deadline=None, rotate=False):
         """Generates the URL and sends the HTTP request to the MLS."""
         url = self._url
         params = deepcopy(_params)
@@ -150,7 +474,9 @@ class ResourceBase(object):
         # encoded_args = urllib.urlencode(params)
         # url = url + '?' + encoded_args
 
-        r = self._get_response(url, params)
+        r = self._get_response(
+            url, params, deadline=deadline, rotate=rotate,
+        )
 
         try:
             response = r.json()
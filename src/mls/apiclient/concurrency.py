@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Adaptive limit for the number of concurrent MLS requests."""
+
+from mls.apiclient.exceptions import DeadlineExceeded
+from mls.apiclient.stats import Counters
+
+import threading
+import time
+
+
+class AdaptiveLimiter(object):
+    """Limit the concurrent requests, adapting the limit to the MLS load.
+
+    The limit follows AIMD: it grows by one request per ``limit``
+    successful requests as long as the latency stays within ``tolerance``
+    times the lowest latency seen recently, and it is multiplied by
+    ``backoff`` when the latency rises or a request fails with a server
+    error or timeout. To react to one overload only once, the limit is
+    decreased at most once per ``limit`` completed requests. It always
+    stays between ``min_limit`` and ``max_limit``.
+
+    Requests exceeding the limit wait for a free slot, at most until their
+    deadline. Share one limiter between all API objects and resources
+    talking to the same MLS; the current state is available from
+    :meth:`metrics`.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.concurrency import AdaptiveLimiter
+        >>> mls = api.API(
+        ...     'https://demomls.com',
+        ...     concurrency_limiter=AdaptiveLimiter(initial=4, max_limit=32),
+        ... )
+    """
+
+    def __init__(
+        self, initial=4, min_limit=1, max_limit=32, backoff=0.5,
+        tolerance=2.0, window=100, clock=None,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.window = window
+        self.stats = Counters()
+        self._clock = clock or time.time
+        self._condition = threading.Condition()
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._min_latency = None
+        self._samples = 0
+        self._since_decrease = None
+
+    @property
+    def limit(self):
+        """Return the current number of allowed concurrent requests."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """Return the number of running requests."""
+        return self._in_flight
+
+    def acquire(self, deadline=None):
+        """Wait for a free slot, return a token for :meth:`release`.
+
+        Raises ``DeadlineExceeded`` if no slot is free before the
+        ``deadline``.
+        """
+        with self._condition:
+            if self._in_flight >= self.limit:
+                self.stats.incr('waited')
+                while self._in_flight >= self.limit:
+                    if deadline is None:
+                        self._condition.wait()
+                        continue
+                    remaining = deadline.remaining()
+                    if remaining <= 0:
+                        raise DeadlineExceeded(
+                            'Deadline exceeded while waiting for a free '
+                            'connection slot.'
+                        )
+                    self._condition.wait(remaining)
+            self._in_flight += 1
+        return self._clock()
+
+    def release(self, token, error=False):
+        """Free the slot and adapt the limit to the outcome of the request.
+
+        ``error`` marks requests failing with an overload symptom (server
+        errors and timeouts).
+        """
+        latency = self._clock() - token
+        with self._condition:
+            self._in_flight -= 1
+            if self._since_decrease is not None:
+                self._since_decrease += 1
+            if error:
+                self._decrease()
+            else:
+                self._record(latency)
+            self._condition.notify_all()
+
+    def _record(self, latency):
+        self._samples += 1
+        if self._samples > self.window:
+            # Forget the old baseline, the MLS might have got slower.
+            self._samples = 1
+            self._min_latency = None
+        if self._min_latency is None or latency < self._min_latency:
+            self._min_latency = latency
+        if latency > self._min_latency * self.tolerance:
+            self._decrease()
+        else:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+    def _decrease(self):
+        if (self._since_decrease is not None and
+                self._since_decrease < self.limit):
+            return
+        limit = max(self.min_limit, self._limit * self.backoff)
+        if limit < self._limit:
+            self._since_decrease = 0
+            self.stats.incr('decreases')
+            self._limit = limit
+
+    def metrics(self):
+        """Return the current limit, running requests and counters."""
+        with self._condition:
+            metrics = {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'min_latency': self._min_latency,
+            }
+        metrics.update(self.stats.as_dict())
+        return metrics
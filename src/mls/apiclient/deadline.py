@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Time budgets spanning several MLS requests."""
+
+from mls.apiclient.exceptions import DeadlineExceeded
+
+import threading
+import time
+
+
+_local = threading.local()
+
+
+def current():
+    """Return the innermost active deadline of this thread or ``None``."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+
+
+class Deadline(object):
+    """A time budget for one or more MLS requests.
+
+    Every request made with a deadline gets at most the remaining time as
+    connect and read timeout, and fails with
+    :class:`mls.apiclient.exceptions.DeadlineExceeded` without contacting
+    the MLS once the budget is spent.
+
+    The deadline can be passed explicitly or activated for the current
+    thread with a ``with`` statement::
+
+        >>> from mls.apiclient.deadline import Deadline
+        >>> with Deadline(2.0):
+        ...     groups = development.groups()
+        ...     phases = development.phases()
+    """
+
+    def __init__(self, seconds, clock=None):
+        self._clock = clock or time.time
+        self.expires_at = self._clock() + seconds
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.stack.remove(self)
+
+    def remaining(self):
+        """Return the remaining time in seconds, never less than zero."""
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        """Return if the budget is spent."""
+        return self.remaining() <= 0
+
+    def check(self, url=None):
+        """Raise ``DeadlineExceeded`` if the budget is spent."""
+        if self.expired:
+            raise DeadlineExceeded(
+                'Deadline exceeded before requesting {0}.'.format(url)
+            )
+
+    def clamp(self, timeout):
+        """Return ``timeout`` limited to the remaining time.
+
+        ``timeout`` can be ``None``, a number or a ``(connect, read)`` tuple.
+        """
+        remaining = self.remaining()
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(
+                remaining if value is None else min(value, remaining)
+                for value in timeout
+            )
+        return min(timeout, remaining)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""DNS caching for the pooled MLS connections."""
+
+from mls.apiclient.stats import Counters
+
+import socket
+import threading
+import time
+import urllib3
+
+
+class DNSCache(object):
+    """Cache the resolved addresses of MLS hosts for ``ttl`` seconds.
+
+    All addresses of a host are kept, new connections try them in order.
+    Lookups are counted as ``hits`` and ``misses`` in ``stats``.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.dns import DNSCache
+        >>> mls = api.API('https://demomls.com', dns_cache=DNSCache(ttl=300))
+    """
+
+    def __init__(self, ttl=300, resolver=None, clock=None):
+        self.ttl = ttl
+        self.stats = Counters()
+        self._resolver = resolver or socket.getaddrinfo
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def resolve(self, host, port):
+        """Return the first address to connect to for ``host``."""
+        return self.resolve_all(host, port)[0]
+
+    def resolve_all(self, host, port):
+        """Return all addresses of ``host`` in the resolver's order."""
+        key = (host, port)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.stats.incr('hits')
+            return list(entry[1])
+        self.stats.incr('misses')
+        infos = self._resolver(host, port, 0, socket.SOCK_STREAM)
+        addresses = []
+        for info in infos:
+            if info[4][0] not in addresses:
+                addresses.append(info[4][0])
+        if not addresses:
+            raise socket.gaierror('No address found for {0}.'.format(host))
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        return list(addresses)
+
+    def invalidate(self, host=None):
+        """Remove the cached addresses of ``host`` or of all hosts."""
+        with self._lock:
+            if host is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if key[0] == host:
+                    del self._entries[key]
+
+
+class _CachedDNSMixin(object):
+    """Resolve the host using the DNS cache of the class.
+
+    Like ``socket.create_connection``, every address is tried until a
+    connection is established.
+    """
+
+    dns_cache = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        error = None
+        try:
+            for address in self.dns_cache.resolve_all(host, self.port):
+                self._dns_host = address
+                try:
+                    return super(_CachedDNSMixin, self)._new_conn()
+                except (
+                    urllib3.exceptions.ConnectTimeoutError,
+                    urllib3.exceptions.NewConnectionError,
+                ) as e:
+                    error = e
+            raise error
+        finally:
+            self._dns_host = host
+
+
+def pool_classes_by_scheme(dns_cache):
+    """Return ``urllib3`` connection pool classes using ``dns_cache``.
+
+    The result can be set as ``pool_classes_by_scheme`` of a
+    ``urllib3.PoolManager``. TLS certificates are still checked against the
+    host name.
+    """
+    pools = urllib3.connectionpool
+    connections = urllib3.connection
+    http_connection = type('CachedDNSHTTPConnection', (
+        _CachedDNSMixin, connections.HTTPConnection,
+    ), {'dns_cache': dns_cache})
+    https_connection = type('CachedDNSHTTPSConnection', (
+        _CachedDNSMixin, connections.HTTPSConnection,
+    ), {'dns_cache': dns_cache})
+    return {
+        'http': type('CachedDNSHTTPConnectionPool', (
+            pools.HTTPConnectionPool,
+        ), {'ConnectionCls': http_connection}),
+        'https': type('CachedDNSHTTPSConnectionPool', (
+            pools.HTTPSConnectionPool,
+        ), {'ConnectionCls': https_connection}),
+    }
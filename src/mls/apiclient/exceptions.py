@@ -75,3 +75,13 @@ class ResourceNotFound(ClientError):
 class ServerError(ConnectionError):
     """5xx Server Error."""
     pass
+
+
+class CircuitOpenError(ServerError):
+    """503 raised without contacting the MLS while its circuit is open."""
+    pass
+
+
+class DeadlineExceeded(MLSError):
+    """This exception is raised if the time budget for requests is spent."""
+    pass
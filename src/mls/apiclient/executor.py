@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""Futures and a thread pool to run MLS requests concurrently."""
+
+from mls.apiclient import scheduler
+from mls.apiclient.deadline import current as current_deadline
+
+import contextlib
+import Queue
+import sys
+import threading
+import time
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+CANCELLED = 'cancelled'
+FINISHED = 'finished'
+
+_DONE = object()
+
+_local = threading.local()
+
+
+class CancelledError(Exception):
+    """The future was cancelled before it was run."""
+
+
+class TimeoutError(Exception):
+    """The result of the future was not available in time."""
+
+
+class Future(object):
+    """The result of a call running in an :class:`Executor`.
+
+    Modelled after ``concurrent.futures.Future``.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._state = PENDING
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def __repr__(self):
+        return '<Future state={0}>'.format(self._state)
+
+    def cancel(self):
+        """Cancel the call if it is not running yet.
+
+        Returns if the future is cancelled.
+        """
+        with self._condition:
+            if self._state in (RUNNING, FINISHED):
+                return False
+            if self._state == PENDING:
+                self._state = CANCELLED
+                self._condition.notify_all()
+        self._run_callbacks()
+        return True
+
+    def cancelled(self):
+        """Return if the call was cancelled."""
+        return self._state == CANCELLED
+
+    def running(self):
+        """Return if the call is currently running."""
+        return self._state == RUNNING
+
+    def done(self):
+        """Return if the call finished or was cancelled."""
+        return self._state in (CANCELLED, FINISHED)
+
+    def _wait(self, timeout):
+        with self._condition:
+            if not self.done():
+                self._condition.wait(timeout)
+            if self._state == CANCELLED:
+                raise CancelledError()
+            if self._state != FINISHED:
+                raise TimeoutError()
+
+    def result(self, timeout=None):
+        """Return the result of the call, waiting at most ``timeout`` seconds.
+
+        Exceptions raised by the call are re-raised.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """Return the exception raised by the call or ``None``."""
+        self._wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+
+    def add_done_callback(self, fn):
+        """Call ``fn`` with the future once it is done."""
+        with self._condition:
+            if not self.done():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def set_running_or_notify_cancel(self):
+        """Mark the future as running.
+
+        Returns ``False`` if the future was cancelled and must not be run.
+        """
+        with self._condition:
+            if self._state == CANCELLED:
+                return False
+            self._state = RUNNING
+            return True
+
+    def set_result(self, result):
+        """Set the result of the call."""
+        with self._condition:
+            self._result = result
+            self._state = FINISHED
+            self._condition.notify_all()
+        self._run_callbacks()
+
+    def set_exception(self, exc_info):
+        """Set the exception of the call as ``sys.exc_info()`` tuple."""
+        if not isinstance(exc_info, tuple):
+            exc_info = (exc_info.__class__, exc_info, None)
+        with self._condition:
+            self._exc_info = exc_info
+            self._state = FINISHED
+            self._condition.notify_all()
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        with self._condition:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class Executor(object):
+    """Run calls in a pool of at most ``max_workers`` daemon threads.
+
+    Threads are started on demand and share the connection pool of the
+    transport they use. Calls run with the request priority class and the
+    active deadline of the submitting thread (see
+    :mod:`mls.apiclient.scheduler` and :mod:`mls.apiclient.deadline`).
+
+    Usage::
+
+        >>> from mls.apiclient.executor import Executor
+        >>> with Executor(max_workers=4) as executor:
+        ...     future = executor.submit(mls.get, 'api/rest/v1/developments')
+        ...     developments = future.result()
+    """
+
+    def __init__(self, max_workers=10):
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
+        self.max_workers = max_workers
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` and return its future."""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit after shutdown.')
+            self._queue.put(
+                (future, fn, args, kwargs, _context()),
+            )
+            if self._idle == 0 and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work)
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._idle -= 1
+        return future
+
+    def in_worker(self):
+        """Return if the current thread is one of the workers."""
+        return getattr(_local, 'executor', None) is self
+
+    def map(self, fn, *iterables):
+        """Return the results of ``fn`` for every item in input order."""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads after the scheduled calls are done."""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+        for thread in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _work(self):
+        _local.executor = self
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs, context = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    with _activate(*context):
+                        result = fn(*args, **kwargs)
+                except BaseException:
+                    future.set_exception(sys.exc_info())
+                else:
+                    future.set_result(result)
+            del item, future
+            with self._lock:
+                self._idle += 1
+
+
+def _context():
+    """Return the priority class and deadline of the current thread."""
+    return scheduler.current(), current_deadline()
+
+
+@contextlib.contextmanager
+def _activate(priority, deadline=None):
+    """Use the priority class and deadline of another thread."""
+    with scheduler.priority(priority):
+        if deadline is None:
+            yield
+        else:
+            with deadline:
+                yield
+
+
+@contextlib.contextmanager
+def pool(executor=None, max_workers=4):
+    """Yield an executor to fan out calls the current thread waits for.
+
+    This is ``executor`` or, if missing, a pool of at most ``max_workers``
+    threads which is shut down afterwards. A worker of ``executor`` gets a
+    new pool as well: its calls would wait behind the calls of the other
+    workers, and all workers could end up waiting for each other.
+    """
+    owned = executor is None or executor.in_worker()
+    if owned:
+        executor = Executor(max_workers=max_workers)
+    try:
+        yield executor
+    finally:
+        if owned:
+            executor.shutdown(wait=False)
+
+
+def as_completed(futures, timeout=None):
+    """Yield the ``futures`` as they finish, waiting at most ``timeout``."""
+    done = Queue.Queue()
+    futures = list(futures)
+    for future in futures:
+        future.add_done_callback(done.put)
+    end = None if timeout is None else time.time() + timeout
+    for _ in futures:
+        if end is None:
+            # Queue.get without a timeout can't be interrupted on Python 2.
+            yield done.get(True, sys.maxint)
+            continue
+        try:
+            yield done.get(True, max(0, end - time.time()))
+        except Queue.Empty:
+            raise TimeoutError()
+
+
+def wait(futures, timeout=None):
+    """Wait until all ``futures`` are done.
+
+    Returns a tuple of the done and not done futures.
+    """
+    end = None if timeout is None else time.time() + timeout
+    for future in futures:
+        remaining = None if end is None else max(0, end - time.time())
+        try:
+            future.exception(remaining)
+        except (CancelledError, TimeoutError):
+            pass
+    done = [future for future in futures if future.done()]
+    not_done = [future for future in futures if not future.done()]
+    return done, not_done
+
+
+def iter_results(futures, ordered=True):
+    """Yield the results of ``futures`` in order or as they finish.
+
+    Futures which are not done yet are cancelled when the consumer stops
+    early.
+    """
+    futures = list(futures)
+    try:
+        if ordered:
+            for future in futures:
+                yield future.result()
+        else:
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def gather(fn, items, errors=(), executor=None, max_workers=4):
+    """Return ``fn(item)`` for every item in input order.
+
+    The calls run concurrently in ``executor`` or in at most
+    ``max_workers`` threads (see :func:`pool`). Exceptions listed in
+    ``errors`` are returned in place of the result of the failed item, other
+    exceptions are raised.
+    """
+    def call(item):
+        try:
+            return fn(item)
+        except errors as e:
+            return e
+
+    with pool(executor, max_workers) as workers:
+        return list(iter_results([workers.submit(call, item)
+                                  for item in items]))
+
+
+def prefetch(iterable, depth=1):
+    """Iterate over ``iterable`` in a background thread.
+
+    Up to ``depth`` items are produced ahead of the consumer, e.g. the next
+    pages of a search while the current page is processed. Once the
+    consumer stops early, no further items are produced (a request already
+    in flight is finished and discarded). Interactive requests made by the
+    background thread are sent with the prefetch priority class, the active
+    deadline of the consumer applies to them as well.
+    """
+    if depth < 1:
+        for item in iterable:
+            yield item
+        return
+    buffer = Queue.Queue(depth)
+    stop = threading.Event()
+
+    # Prefetched pages are not waited for yet, so they don't need the
+    # capacity reserved for interactive requests.
+    priority, deadline = _context()
+    if priority == scheduler.INTERACTIVE:
+        priority = scheduler.PREFETCH
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            with _activate(priority, deadline):
+                while not stop.is_set():
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        buffer.put((_DONE, None))
+                        return
+                    except BaseException:
+                        buffer.put((None, sys.exc_info()))
+                        return
+                    buffer.put((item, None))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, exc_info = buffer.get()
+            if exc_info is not None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        # Unblock the producer waiting for a free slot.
+        while True:
+            try:
+                buffer.get_nowait()
+            except Queue.Empty:
+                break
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Hedged requests to cut the tail latency of idempotent MLS requests."""
+
+from mls.apiclient import scheduler
+from mls.apiclient.executor import Executor
+from mls.apiclient.executor import Future
+from mls.apiclient.stats import Counters
+
+import collections
+import math
+import Queue
+import sys
+import threading
+import time
+
+
+_EXPIRED = object()
+
+
+class HedgePolicy(object):
+    """Send a second request when the first one is slower than usual.
+
+    If the first request did not finish after the ``percentile`` of the
+    latencies of the last ``window`` requests (but at least ``min_delay``
+    seconds), the request is sent again, and the first successful response
+    wins. Hedging starts after ``min_samples`` requests. At most
+    ``max_rate`` hedges per request are sent, so the additional load stays
+    bounded.
+
+    The first request runs in its own thread, only the hedges share a pool
+    of ``max_workers`` threads. Sent requests, hedges and hedges winning
+    the race are counted in ``stats``.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.hedging import HedgePolicy
+        >>> mls = api.API(
+        ...     ['https://mls1.com', 'https://mls2.com'],
+        ...     hedging=HedgePolicy(percentile=95, max_rate=0.05),
+        ... )
+    """
+
+    def __init__(
+        self, percentile=95, min_delay=0.05, max_rate=0.1, window=100,
+        min_samples=20, max_workers=10, clock=None,
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.stats = Counters()
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._executor = None
+
+    def record(self, latency):
+        """Record the latency of a request."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def get_delay(self):
+        """Return the seconds to wait before hedging or ``None``."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = int(math.ceil(self.percentile / 100.0 * len(latencies))) - 1
+        return max(self.min_delay, latencies[max(0, index)])
+
+    def allow(self):
+        """Return if another hedge keeps the hedge rate below the cap."""
+        requests = self.stats.get('requests')
+        return self.stats.get('hedges') < self.max_rate * requests
+
+    def _submit(self, fn):
+        with self._lock:
+            if self._executor is None:
+                self._executor = Executor(max_workers=self.max_workers)
+        return self._executor.submit(fn)
+
+    def run(self, primary, hedge):
+        """Return the result of ``primary()``, hedged with ``hedge()``.
+
+        ``hedge`` should send the same request, e.g. to another mirror.
+        Errors are only raised if both requests fail.
+        """
+        self.stats.incr('requests')
+        start = self._clock()
+        delay = self.get_delay()
+        if delay is None:
+            result = primary()
+            self.record(self._clock() - start)
+            return result
+
+        # Waiting without a timeout doesn't poll on Python 2, so the race is
+        # reported through a queue and the delay is slept by a timer thread.
+        done = Queue.Queue()
+
+        def expire():
+            time.sleep(delay)
+            done.put(_EXPIRED)
+
+        first = _spawn(primary)
+        first.add_done_callback(done.put)
+        _start_thread(expire)
+        second = None
+        while True:
+            future = done.get()
+            if future is _EXPIRED:
+                if not first.done() and self.allow():
+                    self.stats.incr('hedges')
+                    second = self._submit(hedge)
+                    second.add_done_callback(done.put)
+                continue
+            if future.exception() is None:
+                if future is second:
+                    self.stats.incr('hedge_wins')
+                self.record(self._clock() - start)
+                return future.result()
+            if second is None or (first.done() and second.done()):
+                return first.result()
+
+    def close(self):
+        """Stop the worker threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def _start_thread(target):
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+
+
+def _spawn(fn):
+    """Run ``fn`` in a new thread with the caller's priority class."""
+    future = Future()
+    priority = scheduler.current()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            with scheduler.priority(priority):
+                result = fn()
+        except BaseException:
+            future.set_exception(sys.exc_info())
+        else:
+            future.set_result(result)
+
+    _start_thread(run)
+    return future
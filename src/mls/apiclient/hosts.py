@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Latency aware selection between several MLS hosts."""
+
+import threading
+import time
+
+
+class HostStats(object):
+    """Moving averages of latency and error rate of one MLS host.
+
+    The error rate also halves every ``half_life`` seconds, so a host
+    which gets no requests after failing recovers over time.
+    """
+
+    def __init__(self, alpha, half_life=30.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.updated = None
+
+    def get_error_rate(self, now):
+        """Return the error rate decayed until ``now``."""
+        if self.updated is None or not self.error_rate:
+            return self.error_rate
+        elapsed = max(0.0, now - self.updated)
+        return self.error_rate * 0.5 ** (elapsed / self.half_life)
+
+    def record(self, latency, error=False, now=None):
+        if now is None:
+            now = time.time()
+        self.error_rate = self.get_error_rate(now)
+        self.updated = now
+        self.requests += 1
+        if error:
+            self.errors += 1
+        else:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.alpha * (latency - self.latency)
+        self.error_rate += self.alpha * ((1.0 if error else 0.0) -
+                                         self.error_rate)
+
+    def as_dict(self, now=None):
+        if now is None:
+            now = time.time()
+        return {
+            'latency': self.latency,
+            'error_rate': self.get_error_rate(now),
+            'requests': self.requests,
+            'errors': self.errors,
+        }
+
+
+class HostPool(object):
+    """Track the health of several mirrors of the MLS and pick the best one.
+
+    For every base URL, an exponentially weighted moving average of the
+    latency of successful requests and of the error rate is kept (``alpha``
+    is the weight of the latest request). Hosts are ranked by their latency
+    plus ``error_penalty`` seconds per unit of error rate, hosts without
+    requests first and otherwise in the configured order. The error rate
+    halves every ``half_life`` seconds, so failed hosts are tried again
+    after a while even if they get no requests in the meantime.
+
+    Usage::
+
+        >>> pool = HostPool(['https://mls1.com', 'https://mls2.com'])
+        >>> pool.candidates('https://mls1.com/api/rest/v1/developments')
+        ['https://mls1.com/api/rest/v1/developments',
+         'https://mls2.com/api/rest/v1/developments']
+    """
+
+    def __init__(
+        self, base_urls, alpha=0.3, error_penalty=10.0, half_life=30.0,
+        clock=None,
+    ):
+        if not isinstance(base_urls, (list, tuple)):
+            base_urls = [base_urls]
+        if not base_urls:
+            raise ValueError('At least one base URL is required.')
+        self.base_urls = [base_url.rstrip('/') for base_url in base_urls]
+        self.error_penalty = error_penalty
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._stats = dict(
+            (base_url, HostStats(alpha, half_life))
+            for base_url in self.base_urls
+        )
+
+    def _score(self, base_url, now):
+        stats = self._stats[base_url]
+        return (
+            (stats.latency or 0.0) +
+            stats.get_error_rate(now) * self.error_penalty
+        )
+
+    def ordered(self):
+        """Return the base URLs, best host first."""
+        now = self._clock()
+        with self._lock:
+            return sorted(
+                self.base_urls, key=lambda url: self._score(url, now),
+            )
+
+    def best(self):
+        """Return the base URL of the best host."""
+        return self.ordered()[0]
+
+    def match(self, url):
+        """Return the configured base URL ``url`` belongs to or ``None``."""
+        for base_url in self.base_urls:
+            if url == base_url or url.startswith(base_url + '/'):
+                return base_url
+
+    def candidates(self, url, failover=True):
+        """Return the URLs to try for ``url``, best host first.
+
+        ``url`` is moved to every host (or the best host only without
+        ``failover``). URLs of unknown hosts are returned unchanged.
+        """
+        base_url = self.match(url)
+        if base_url is None:
+            return [url]
+        path = url[len(base_url):]
+        hosts = self.ordered()
+        if not failover:
+            hosts = hosts[:1]
+        return [host + path for host in hosts]
+
+    def record(self, url, latency, error=False):
+        """Record the outcome of a request to ``url``."""
+        base_url = self.match(url)
+        if base_url is None:
+            return
+        now = self._clock()
+        with self._lock:
+            self._stats[base_url].record(latency, error=error, now=now)
+
+    def stats(self):
+        """Return the statistics for every host."""
+        now = self._clock()
+        with self._lock:
+            return dict(
+                (base_url, stats.as_dict(now))
+                for base_url, stats in self._stats.items()
+            )
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache for MLS responses."""
+
+from mls.apiclient.stats import Counters
+from mls.apiclient.utils import urlencode
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+
+def make_key(url, params=None, lang=None):
+    """Return a cache key for a request, independent of the params order.
+
+    The key is a SHA-256 hash, so credentials in the params (e.g. the API
+    key) are not stored on disk.
+
+    Usage::
+
+        >>> make_key('https://demomls.com/api/listings/l1',
+        ...          {'format': 'json', 'apikey': '1234'}, lang='en')
+        '3d3fb937de1d74c835ae4978ece74d1647f6b245b88bf87d1bbf8a8a2c73887c'
+    """
+    params = dict(params or {})
+    if lang is None:
+        lang = params.get('lang')
+    params.pop('lang', None)
+    key = url
+    if params:
+        key += '?' + urlencode(sorted(params.items()))
+    if lang:
+        key += '#' + lang
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return hashlib.sha256(key).hexdigest()
+
+
+class SQLiteCache(object):
+    """Compressed response cache in a SQLite database.
+
+    Entries expire after ``ttl`` seconds. Once the compressed entries take
+    more than ``max_size`` bytes, expired and then the least recently used
+    entries are removed. The access time of an entry is only updated every
+    ``touch_interval`` seconds, so reads rarely need the write lock.
+    Several processes can share one database file; every thread uses its
+    own connection. Lookups are counted as ``hits`` and ``misses`` in
+    ``stats``.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.persistent import SQLiteCache
+        >>> mls = api.API(
+        ...     'https://demomls.com',
+        ...     response_cache=SQLiteCache('/var/cache/mls.sqlite', ttl=3600),
+        ... )
+    """
+
+    def __init__(
+        self, path, ttl=3600, max_size=50 * 1024 * 1024, timeout=10.0,
+        touch_interval=60, clock=None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self.stats = Counters()
+        self._clock = clock or time.time
+        self._local = threading.local()
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'size INTEGER NOT NULL, expires REAL NOT NULL, '
+                'accessed REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS responses_accessed '
+                'ON responses (accessed)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS responses_expires '
+                'ON responses (expires)'
+            )
+            # The total size is kept up to date by every write, so it is
+            # only summed up when the table is created.
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS totals ('
+                'name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+            )
+            connection.execute(
+                'INSERT OR IGNORE INTO totals (name, value) '
+                'SELECT \'size\', COALESCE(SUM(size), 0) FROM responses'
+            )
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key`` or ``default``."""
+        now = self._clock()
+        connection = self._connection
+        row = connection.execute(
+            'SELECT value, accessed FROM responses '
+            'WHERE key = ? AND expires > ?',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            self.stats.incr('misses')
+            return default
+        if now - row[1] >= self.touch_interval:
+            connection.execute(
+                'UPDATE responses SET accessed = ? WHERE key = ?',
+                (now, key),
+            )
+        self.stats.incr('hits')
+        return json.loads(zlib.decompress(bytes(row[0])).decode('utf-8'))
+
+    def set(self, key, value, ttl=None):
+        """Cache the JSON serializable ``value`` for ``ttl`` seconds."""
+        if ttl is None:
+            ttl = self.ttl
+        data = zlib.compress(json.dumps(value).encode('utf-8'))
+        now = self._clock()
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT size FROM responses WHERE key = ?', (key,),
+            ).fetchone()
+            connection.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, sqlite3.Binary(data), len(data), now + ttl, now),
+            )
+            size = self._add_size(
+                connection, len(data) - (row[0] if row else 0),
+            )
+            if size > self.max_size:
+                self._evict(connection, now, size)
+
+    def _add_size(self, connection, delta):
+        """Change the total size of the entries, return the new total."""
+        connection.execute(
+            'UPDATE totals SET value = value + ? WHERE name = \'size\'',
+            (delta,),
+        )
+        return connection.execute(
+            'SELECT value FROM totals WHERE name = \'size\'',
+        ).fetchone()[0]
+
+    def _evict(self, connection, now, size):
+        """Remove expired and least recently used entries."""
+        rows = connection.execute(
+            'SELECT key, size FROM responses WHERE expires <= ?', (now,),
+        ).fetchall()
+        removed = sum(entry_size for key, entry_size in rows)
+        keys = [key for key, entry_size in rows]
+        if size - removed > self.max_size:
+            expired = set(keys)
+            for key, entry_size in connection.execute(
+                'SELECT key, size FROM responses ORDER BY accessed',
+            ):
+                if size - removed <= self.max_size:
+                    break
+                if key in expired:
+                    continue
+                keys.append(key)
+                removed += entry_size
+                self.stats.incr('evictions')
+        connection.executemany(
+            'DELETE FROM responses WHERE key = ?', [(key,) for key in keys],
+        )
+        self._add_size(connection, -removed)
+
+    def invalidate(self, key=None):
+        """Remove the entry for ``key`` or all entries."""
+        with self._transaction() as connection:
+            if key is None:
+                connection.execute('DELETE FROM responses')
+                connection.execute(
+                    'UPDATE totals SET value = 0 WHERE name = \'size\'',
+                )
+                return
+            row = connection.execute(
+                'SELECT size FROM responses WHERE key = ?', (key,),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    'DELETE FROM responses WHERE key = ?', (key,),
+                )
+                self._add_size(connection, -row[0])
+
+    def close(self):
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class _Transaction(object):
+    """Run statements in an immediate transaction.
+
+    ``BEGIN IMMEDIATE`` takes the write lock up front, so concurrent
+    writers wait (up to the connection timeout) instead of failing.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        else:
+            self.connection.execute('ROLLBACK')
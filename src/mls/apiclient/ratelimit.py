@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Client side rate limiting of MLS requests."""
+
+from mls.apiclient.exceptions import DeadlineExceeded
+from mls.apiclient.stats import Counters
+from mls.apiclient.transport import get_base_url
+from mls.apiclient.utils import get_count
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Allow ``rate`` requests per second with bursts of ``burst`` requests.
+
+    Callers exceeding the rate are queued: every caller reserves the next
+    free slot and sleeps until it is due, so waiting requests are sent in
+    the order they arrived.
+    """
+
+    def __init__(self, rate, burst=1, clock=None, sleep=None):
+        if rate <= 0:
+            raise ValueError('rate must be greater than 0.')
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._clock = clock or time.time
+        self._sleep = sleep or time.sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = self._clock()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def reserve(self, timeout=None):
+        """Take a token and return the seconds to wait before using it.
+
+        If the wait would be longer than ``timeout`` seconds, no token is
+        taken and ``None`` is returned.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            delay = 0.0
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+            if timeout is not None and delay > timeout:
+                return None
+            self._tokens -= 1
+            return delay
+
+    def acquire(self, deadline=None):
+        """Wait for a token, return the seconds waited.
+
+        Raises ``DeadlineExceeded`` without waiting if the token is due
+        after the ``deadline``.
+        """
+        delay = self.reserve(
+            None if deadline is None else deadline.remaining(),
+        )
+        if delay is None:
+            raise DeadlineExceeded(
+                'Deadline exceeded while waiting for the rate limit.'
+            )
+        if delay > 0:
+            self._sleep(delay)
+        return delay
+
+    def update(self, rate=None, remaining=None, reset=None):
+        """Adapt the bucket to the limits announced by the MLS.
+
+        ``rate`` replaces the allowed requests per second. If ``remaining``
+        requests are left until the limit is ``reset`` in seconds, no more
+        requests than that are let through before the reset.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if rate is not None and rate > 0:
+                self.rate = float(rate)
+            if remaining is not None and reset is not None and reset > 0:
+                tokens = float(remaining)
+                if tokens <= 0:
+                    # Postpone the next token until the limit is reset.
+                    tokens = -reset * self.rate + 1
+                self._tokens = min(self._tokens, tokens)
+
+
+class RateLimiter(object):
+    """Token bucket rate limits per MLS host and API key.
+
+    ``rate`` is the number of requests per second, ``burst`` the number of
+    requests which can be sent at once after a pause. Requests exceeding the
+    limit wait instead of failing. The time spent waiting is counted in
+    ``stats`` (``throttled`` requests and ``throttle_time`` seconds).
+
+    With ``adaptive``, the limits are taken from the ``RateLimit-Limit``
+    (requests per ``RateLimit-Period`` seconds, default 1),
+    ``RateLimit-Remaining`` and ``RateLimit-Reset`` (seconds) headers of
+    the MLS responses (with the ``X-MLS`` prefix).
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.ratelimit import RateLimiter
+        >>> mls = api.API(
+        ...     'https://demomls.com',
+        ...     rate_limiter=RateLimiter(rate=10, burst=20),
+        ... )
+    """
+
+    def __init__(
+        self, rate, burst=1, adaptive=True, clock=None, sleep=None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.adaptive = adaptive
+        self.stats = Counters()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def get(self, url, api_key=None):
+        """Return the token bucket for the host of ``url`` and ``api_key``."""
+        key = (get_base_url(url), api_key)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(
+                    self.rate,
+                    self.burst,
+                    clock=self._clock,
+                    sleep=self._sleep,
+                )
+        return bucket
+
+    def acquire(self, url, api_key=None, deadline=None):
+        """Wait until a request to ``url`` is allowed.
+
+        Raises ``DeadlineExceeded`` if that is after the ``deadline``.
+        """
+        delay = self.get(url, api_key).acquire(deadline)
+        if delay > 0:
+            self.stats.incr('throttled')
+            self.stats.incr('throttle_time', delay)
+        return delay
+
+    def update(self, url, api_key=None, headers=None):
+        """Adapt the limits to the rate limit ``headers`` of a response.
+
+        ``headers`` are the MLS headers without prefix, as returned by
+        :func:`mls.apiclient.utils.extract_headers`.
+        """
+        if not self.adaptive or not headers:
+            return
+        headers = dict((key.lower(), value) for key, value in headers.items())
+        limit = get_count(headers, 'ratelimit-limit')
+        remaining = get_count(headers, 'ratelimit-remaining')
+        reset = get_count(headers, 'ratelimit-reset')
+        if limit is None and remaining is None:
+            return
+        rate = None
+        if limit is not None:
+            period = get_count(headers, 'ratelimit-period') or 1
+            rate = float(limit) / period
+        self.get(url, api_key).update(
+            rate=rate, remaining=remaining, reset=reset,
+        )
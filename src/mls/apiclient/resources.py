@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """MLS rest client entity resource classes."""
 
-from mls.apiclient import client
+from mls.apiclient import cache
+from mls.apiclient import exceptions
+from mls.apiclient import executor
 from mls.apiclient import REST_API_URL
 from mls.apiclient import REST_API_VERSION
 from mls.apiclient import utils
+from mls.apiclient.persistent import make_key
 
 import urlparse
 
@@ -40,6 +43,8 @@ class Resource(object):
     """Base class for resources."""
 
     endpoint = None
+    #: Seconds to keep search results, defaults to the search cache TTL.
+    search_ttl = None
 
     def __init__(self, api, data):
         if not isinstance(data, dict):
@@ -64,9 +69,53 @@ class Resource(object):
         """Returns one object of this Resource.
 
         You have to give one keyword argument to find the object.
+
+        The object is kept in the optional ``response_cache`` of the API,
+        a missing object in the optional ``negative_cache``.
         """
         url = utils.join_url(cls.get_endpoint_url(), resource_id)
-        return cls(api, api.get(url))
+        response_cache = getattr(api, 'response_cache', None)
+        negative_cache = getattr(api, 'negative_cache', None)
+        if response_cache is None and negative_cache is None:
+            return cls(api, api.get(url))
+        key = make_key(
+            utils.join_url(api.base_url, url),
+            {'apikey': api.api_key},
+            api.lang,
+        )
+        if negative_cache is not None and key in negative_cache:
+            raise exceptions.ResourceNotFound(404, 'Not Found', url)
+        data = None
+        if response_cache is not None:
+            data = response_cache.get(key)
+        if data is None:
+            try:
+                data = api.get(url)
+            except exceptions.ResourceNotFound:
+                if negative_cache is not None:
+                    negative_cache.add(key)
+                raise
+            if response_cache is not None:
+                response_cache.set(key, data)
+        return cls(api, data)
+
+    @classmethod
+    def get_many(cls, api, resource_ids, concurrency=4):
+        """Returns the objects for several ids in the order of the ids.
+
+        The objects are fetched concurrently by at most ``concurrency``
+        threads (or the workers of an
+        :class:`mls.apiclient.asyncapi.AsyncAPI`). If an object can't be
+        fetched, the exception (e.g. ``ResourceNotFound`` or
+        ``ServerError``) is returned in its place.
+        """
+        return executor.gather(
+            lambda resource_id: cls.get(api, resource_id),
+            resource_ids,
+            errors=(exceptions.MLSError, exceptions.ConnectionError),
+            executor=getattr(api, 'executor', None),
+            max_workers=concurrency,
+        )
 
     @classmethod
     def search(cls, api, params=None):
@@ -74,31 +123,156 @@ class Resource(object):
 
         You can search for objects by giving one or more keyword arguments.
         Use limit and offset to limit the results.
+
+        With a ``search_cache`` on the API, the results and headers of equal
+        searches are kept for ``search_ttl`` seconds.
         """
         url = cls.get_endpoint_url()
-        return cls(api, api.get(url, params))
+        search_cache = getattr(api, 'search_cache', None)
+        if search_cache is None:
+            return cls(api, api.get(url, params))
+        key = cache.search_key(
+            utils.join_url(api.base_url, url), params, api.lang,
+        )
+        data = search_cache.get(key)
+        if data is None:
+            data = api.get(url, params)
+            search_cache.set(key, data, ttl=cls.search_ttl)
+        return cls(api, data)
+
+    @classmethod
+    def iter_search(
+        cls, api, params=None, page_size=None, max_items=None,
+        max_pages=None, prefetch=0,
+    ):
+        """Yield the objects of a search page by page.
+
+        The next page is found with the ``next`` link of the collection or,
+        if missing, the ``CountTotal``, ``CountLimit`` and ``CountOffset``
+        headers. ``page_size`` sets the ``limit`` of every page. Stops after
+        ``max_items`` objects or ``max_pages`` pages.
+
+        With ``prefetch``, up to that many following pages are fetched in
+        the background while the current page is consumed (see
+        :func:`mls.apiclient.executor.prefetch`).
+
+        Usage::
+
+            >>> for development in Development.iter_search(mls, page_size=50):
+            ...     print(development.title)
+        """
+        params = dict(params or {})
+        if page_size is not None:
+            params['limit'] = page_size
+        pages = cls._iter_pages(api, params, max_pages)
+        items = 0
+        for page in executor.prefetch(pages, prefetch):
+            for item in page.get_items():
+                yield item
+                items += 1
+                if max_items is not None and items >= max_items:
+                    return
+
+    @classmethod
+    def _iter_pages(cls, api, params, max_pages=None):
+        """Yield the pages of a search."""
+        page = cls.search(api, params)
+        pages = 0
+        while True:
+            yield page
+            pages += 1
+            if max_pages is not None and pages >= max_pages:
+                return
+            url = page.get_next_url(params)
+            if url is None:
+                return
+            page = cls(api, api.request(url, 'GET'))
+
+    @classmethod
+    def fetch_all(
+        cls, api, params=None, page_size=None, max_workers=4, ordered=True,
+    ):
+        """Yield all objects of a search, fetching the pages concurrently.
+
+        After the first page, the offsets of the remaining pages are taken
+        from the ``CountTotal`` and ``CountLimit`` headers and fetched by at
+        most ``max_workers`` threads (or the workers of an
+        :class:`mls.apiclient.asyncapi.AsyncAPI`). Objects are yielded in
+        the order of the pages or, without ``ordered``, as pages complete.
+        """
+        params = dict(params or {})
+        if page_size is not None:
+            params['limit'] = page_size
+        page = cls.search(api, params)
+        for item in page.get_items():
+            yield item
+        headers = page.get_headers()
+        offsets = utils.get_page_offsets(headers)
+        if not offsets:
+            return
+        params['limit'] = utils.get_count(headers, 'CountLimit')
+
+        def fetch(offset):
+            data = api.get(
+                cls.get_endpoint_url(), dict(params, offset=offset),
+            )
+            return cls(api, data).get_items()
+
+        shared = getattr(api, 'executor', None)
+        with executor.pool(shared, max_workers) as workers:
+            futures = [workers.submit(fetch, offset) for offset in offsets]
+            for items in executor.iter_results(futures, ordered=ordered):
+                for item in items:
+                    yield item
+
+    @classmethod
+    def get_async(cls, api, resource_id):
+        """Return a future for :meth:`get`.
+
+        ``api`` has to be a :class:`mls.apiclient.asyncapi.AsyncAPI`.
+        """
+        return api.submit(cls.get, api, resource_id)
+
+    @classmethod
+    def search_async(cls, api, params=None):
+        """Return a future for :meth:`search`.
+
+        ``api`` has to be a :class:`mls.apiclient.asyncapi.AsyncAPI`.
+        """
+        return api.submit(cls.search, api, params)
 
     @classmethod
     def get_field_titles(cls, api):
-        """Return the translated titles of the fields."""
-        url = utils.join_url(
-            REST_API_URL,
-            REST_API_VERSION,
-            'field_titles',
-            cls.endpoint,
-        )
-        return api.get(url)
+        """Return the translated titles of the fields.
+
+        The titles are cached in the ``metadata_cache`` of the API.
+        """
+        return cls._get_metadata(api, 'field_titles')
 
     @classmethod
     def get_field_order(cls, api):
-        """Return the list of fieldnames in order as defined in the MLS."""
+        """Return the list of fieldnames in order as defined in the MLS.
+
+        The order is cached in the ``metadata_cache`` of the API.
+        """
+        return cls._get_metadata(api, 'field_order')
+
+    @classmethod
+    def _get_metadata(cls, api, name):
+        """Return field metadata of the resource, cached if possible."""
         url = utils.join_url(
             REST_API_URL,
             REST_API_VERSION,
-            'field_order',
+            name,
             cls.endpoint,
         )
-        return api.get(url)
+        metadata_cache = getattr(api, 'metadata_cache', None)
+        if metadata_cache is None:
+            return api.get(url)
+        return metadata_cache.get_or_set(
+            (api.base_url, name, cls.endpoint, api.lang, api.api_key),
+            lambda: api.get(url),
+        )
 
     @classmethod
     def get_endpoint_url(cls):
@@ -117,6 +291,27 @@ class Resource(object):
         """Returns the URL to the resource object."""
         return utils.get_link(self._links, 'self')
 
+    def get_next_url(self, params=None):
+        """Return the URL of the next page of a collection or ``None``.
+
+        Uses the ``next`` link or the count headers together with the
+        search ``params``.
+        """
+        url = utils.get_link(self._links, 'next')
+        if url is not None:
+            return url
+        if not self._data.get('collection'):
+            return
+        offsets = utils.get_page_offsets(self._headers)
+        if not offsets:
+            return
+        params = dict(params or {}, offset=offsets[0])
+        params['limit'] = utils.get_count(self._headers, 'CountLimit')
+        return utils.join_url_params(
+            utils.join_url(self._api.base_url, self.get_endpoint_url()),
+            params,
+        )
+
     def get_headers(self):
         """Returns a dictionary of the headers for this resource object."""
         return self._headers
@@ -197,6 +392,10 @@ class Development(Resource):
         data = self._api.request(url, 'GET', params=params)
         return self.__class_group__(self._api, data).get_items()
 
+    def groups_async(self, params=None):
+        """Return a future for :meth:`groups`."""
+        return self._api.submit(self.groups, params)
+
     def listings(self, params=None):
         """Search for listings assigned to that development project."""
         if params is None:
@@ -209,10 +408,11 @@ class Development(Resource):
             return
         url_params = dict(urlparse.parse_qsl(url_params[1]))
         params.update(url_params)
-        listing_resource = client.ListingResource(
-            self._api.base_url, api_key=self._api.api_key,
-        )
-        return listing_resource.search(params=params)
+        return self._api.listing_resource.search(params=params)
+
+    def listings_async(self, params=None):
+        """Return a future for :meth:`listings`."""
+        return self._api.submit(self.listings, params)
 
     def phases(self, params=None):
         """Search for development phases within that development."""
@@ -220,6 +420,10 @@ class Development(Resource):
         data = self._api.request(url, 'GET', params=params)
         return self.__class_phase__(self._api, data).get_items()
 
+    def phases_async(self, params=None):
+        """Return a future for :meth:`phases`."""
+        return self._api.submit(self.phases, params)
+
     def pictures(self):
         """Get the pictures for that development."""
         result = []
@@ -261,10 +465,11 @@ class DevelopmentPhase(Resource):
             return
         url_params = dict(urlparse.parse_qsl(url_params[1]))
         params.update(url_params)
-        listing_resource = client.ListingResource(
-            self._api.base_url, api_key=self._api.api_key,
-        )
-        return listing_resource.search(params=params)
+        return self._api.listing_resource.search(params=params)
+
+    def listings_async(self, params=None):
+        """Return a future for :meth:`listings`."""
+        return self._api.submit(self.listings, params)
 
 
 class Listing(Resource):
@@ -292,7 +497,8 @@ class PropertyGroup(Resource):
             return
         url_params = dict(urlparse.parse_qsl(url_params[1]))
         params.update(url_params)
-        listing_resource = client.ListingResource(
-            self._api.base_url, api_key=self._api.api_key,
-        )
-        return listing_resource.search(params=params)
+        return self._api.listing_resource.search(params=params)
+
+    def listings_async(self, params=None):
+        """Return a future for :meth:`listings`."""
+        return self._api.submit(self.listings, params)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Retry and circuit breaker policies for MLS requests."""
+
+import email.utils
+import random
+import threading
+import time
+
+
+class RetryPolicy(object):
+    """Decide if and when a failed request is sent again.
+
+    Only idempotent methods are retried. The delay grows exponentially with
+    every attempt (``backoff_factor * 2 ** attempt``, capped at
+    ``max_backoff``) and is randomized with full jitter. A ``Retry-After``
+    header sent by the MLS takes precedence, as long as it does not exceed
+    ``max_backoff``.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.retry import RetryPolicy
+        >>> mls = api.API('https://demomls.com', retry=RetryPolicy(total=3))
+    """
+
+    def __init__(
+        self, total=2, backoff_factor=0.1, max_backoff=5.0, jitter=True,
+        status_forcelist=(500, 502, 503, 504), methods=('GET', 'HEAD'),
+        respect_retry_after=True,
+    ):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_forcelist = frozenset(status_forcelist)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.respect_retry_after = respect_retry_after
+
+    def can_retry(self, method, attempt):
+        """Return if another attempt is allowed after ``attempt`` failed."""
+        return attempt < self.total and method.upper() in self.methods
+
+    def is_retryable_status(self, status_code):
+        """Return if a response with the status code should be retried."""
+        return status_code in self.status_forcelist
+
+    def get_backoff(self, attempt):
+        """Return the delay in seconds before the next attempt."""
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def get_retry_after(self, response):
+        """Return the delay requested by the ``Retry-After`` header.
+
+        ``None`` is returned if the header is missing or can not be parsed.
+        """
+        if response is None or not self.respect_retry_after:
+            return None
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0, int(value))
+        except ValueError:
+            pass
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, email.utils.mktime_tz(date) - time.time())
+
+    def get_delay(self, attempt, response=None):
+        """Return the delay before the next attempt.
+
+        Returns ``None`` if the MLS asked to wait longer than ``max_backoff``,
+        in which case the request should not be retried.
+        """
+        retry_after = self.get_retry_after(response)
+        if retry_after is None:
+            return self.get_backoff(attempt)
+        if retry_after > self.max_backoff:
+            return None
+        return retry_after
+
+
+class CircuitBreaker(object):
+    """Fail fast while a MLS host is unhealthy.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    all requests are rejected. Once ``recovery_timeout`` seconds have passed,
+    the circuit is half-open and a single probe request is let through. A
+    successful probe closes the circuit again, a failed one re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, clock=None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        """Return the current state of the circuit."""
+        with self._lock:
+            if self._state == self.OPEN and self._recovered():
+                return self.HALF_OPEN
+            return self._state
+
+    def _recovered(self):
+        return self._clock() - self._opened_at >= self.recovery_timeout
+
+    def allow(self):
+        """Return if a request may be sent."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if not self._recovered():
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        """Record a successful request and close the circuit."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """Record a failed request, open the circuit if needed."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if (self._state == self.HALF_OPEN or
+                    self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class CircuitBreakerRegistry(object):
+    """Create and hold one circuit breaker per MLS base URL."""
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, clock=None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, base_url):
+        """Return the circuit breaker for ``base_url``."""
+        with self._lock:
+            breaker = self._breakers.get(base_url)
+            if breaker is None:
+                breaker = self._breakers[base_url] = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    recovery_timeout=self.recovery_timeout,
+                    clock=self._clock,
+                )
+            return breaker
+
+    def states(self):
+        """Return the circuit state for every known base URL."""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return dict(
+            (base_url, breaker.state)
+            for base_url, breaker in breakers.items()
+        )
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Priority scheduling of MLS requests sharing one connection pool."""
+
+from mls.apiclient.exceptions import DeadlineExceeded
+from mls.apiclient.stats import Counters
+
+import contextlib
+import threading
+import time
+
+
+INTERACTIVE = 'interactive'
+PREFETCH = 'prefetch'
+BULK = 'bulk'
+
+#: Priority classes, highest priority first.
+PRIORITIES = (INTERACTIVE, PREFETCH, BULK)
+
+_local = threading.local()
+
+
+def current():
+    """Return the priority class of this thread's requests."""
+    return getattr(_local, 'priority', None) or INTERACTIVE
+
+
+@contextlib.contextmanager
+def priority(name):
+    """Send the requests of this thread with the priority class ``name``.
+
+    Usage::
+
+        >>> from mls.apiclient import scheduler
+        >>> with scheduler.priority(scheduler.BULK):
+        ...     developments = list(Development.fetch_all(mls))
+    """
+    if name not in PRIORITIES:
+        raise ValueError('Unknown priority class {0}.'.format(name))
+    previous = getattr(_local, 'priority', None)
+    _local.priority = name
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class PriorityScheduler(object):
+    """Share ``capacity`` concurrent requests between priority classes.
+
+    ``reserved`` maps priority classes to the number of slots only they
+    and higher classes may use, e.g. with a capacity of 10 and 2 slots
+    reserved for interactive requests, prefetch and bulk requests never
+    use more than 8 slots. Lower classes also yield: a request only gets a
+    free slot if no request of a higher class is waiting.
+
+    The current number of waiting requests is reported per class by
+    :meth:`queue_depths`; ``stats`` counts the requests (``<class>``), the
+    requests which had to wait (``<class>_waited``) and the time spent
+    waiting (``<class>_wait_time``).
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.scheduler import PriorityScheduler
+        >>> mls = api.API(
+        ...     'https://demomls.com',
+        ...     scheduler=PriorityScheduler(capacity=10),
+        ... )
+    """
+
+    def __init__(self, capacity=10, reserved=None, clock=None):
+        if reserved is None:
+            reserved = {INTERACTIVE: max(1, capacity // 5)}
+        self.capacity = capacity
+        self.reserved = reserved
+        self.stats = Counters()
+        self._clock = clock or time.time
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = dict((name, 0) for name in PRIORITIES)
+
+    def _limit(self, name):
+        """Return the number of slots usable by the priority class."""
+        limit = self.capacity
+        for higher in PRIORITIES[:PRIORITIES.index(name)]:
+            limit -= self.reserved.get(higher, 0)
+        return max(1, limit)
+
+    def _can_run(self, name):
+        if self._in_flight >= self._limit(name):
+            return False
+        return not any(
+            self._waiting[higher]
+            for higher in PRIORITIES[:PRIORITIES.index(name)]
+        )
+
+    def acquire(self, name=None, deadline=None):
+        """Wait for a slot for a request of the priority class ``name``.
+
+        Defaults to the priority class of the current thread. Raises
+        ``DeadlineExceeded`` if no slot is free before the ``deadline``.
+        """
+        name = name or current()
+        self.stats.incr(name)
+        with self._condition:
+            if not self._can_run(name):
+                start = self._clock()
+                self._waiting[name] += 1
+                try:
+                    while not self._can_run(name):
+                        if deadline is None:
+                            self._condition.wait()
+                            continue
+                        remaining = deadline.remaining()
+                        if remaining <= 0:
+                            # Lower classes may have waited for this one.
+                            self._condition.notify_all()
+                            raise DeadlineExceeded(
+                                'Deadline exceeded while waiting for a '
+                                '{0} slot.'.format(name)
+                            )
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting[name] -= 1
+                    self.stats.incr(name + '_waited')
+                    self.stats.incr(
+                        name + '_wait_time', self._clock() - start,
+                    )
+            self._in_flight += 1
+        return name
+
+    def release(self):
+        """Free the slot of a finished request."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, name=None, deadline=None):
+        """Hold a slot while the ``with`` block runs."""
+        self.acquire(name, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def queue_depths(self):
+        """Return the number of waiting requests per priority class."""
+        with self._condition:
+            return dict(self._waiting)
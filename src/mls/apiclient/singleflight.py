@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Coalescing of identical concurrent MLS requests."""
+
+from copy import deepcopy
+from mls.apiclient.executor import Future
+from mls.apiclient.executor import TimeoutError
+from mls.apiclient.stats import Counters
+
+import sys
+import threading
+
+
+class SingleFlight(object):
+    """Run only one call at a time per key.
+
+    Calls made while a call with the same key is in flight wait for it and
+    share its result (or exception) instead of running again. Results are
+    copied for the waiting callers, so they can't change each other's data.
+
+    Calls are counted in ``stats`` as ``leaders`` (calls that ran),
+    ``coalesced`` (calls that waited for a leader) and ``timeouts`` (calls
+    that stopped waiting).
+
+    Usage::
+
+        >>> from mls.apiclient.singleflight import SingleFlight
+        >>> flight = SingleFlight()
+        >>> flight.do(('GET', url), lambda: mls.http_call(url, 'GET'))
+    """
+
+    def __init__(self):
+        self.stats = Counters()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``, shared with concurrent callers.
+
+        A caller waiting for another call gives up after ``wait`` seconds
+        (a keyword argument not passed to ``fn``) with
+        :class:`mls.apiclient.executor.TimeoutError`.
+        """
+        wait = kwargs.pop('wait', None)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [Future(), 0]
+            else:
+                call[1] += 1
+        future = call[0]
+        if not leader:
+            self.stats.incr('coalesced')
+            try:
+                return deepcopy(future.result(wait))
+            except TimeoutError:
+                self.stats.incr('timeouts')
+                raise
+
+        self.stats.incr('leaders')
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            self._finish(key)
+            future.set_exception(sys.exc_info())
+            raise
+        followers = self._finish(key)
+        future.set_result(result)
+        if followers:
+            # The followers copy the shared result, the leader gets its own.
+            result = deepcopy(result)
+        return result
+
+    def _finish(self, key):
+        """Stop sharing the call, return the number of waiting callers."""
+        with self._lock:
+            return self._calls.pop(key)[1]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Runtime statistics for the MLS clients."""
+
+import threading
+
+
+class Counters(object):
+    """Thread-safe named counters.
+
+    Usage::
+
+        >>> counters = Counters()
+        >>> counters.incr('requests')
+        >>> counters.incr('bytes_wire', 512)
+        >>> counters.as_dict()
+        {'requests': 1, 'bytes_wire': 512}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def incr(self, name, value=1):
+        """Increase the counter ``name`` by ``value``."""
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def get(self, name, default=0):
+        """Return the current value of the counter ``name``."""
+        with self._lock:
+            return self._values.get(name, default)
+
+    def as_dict(self):
+        """Return a snapshot of all counters."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        """Reset all counters."""
+        with self._lock:
+            self._values.clear()
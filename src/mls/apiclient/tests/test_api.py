@@ -22,8 +22,10 @@ class TestAPI(base.BaseTestCase):
         responses.stop()
         responses.reset()
 
-    def _callFUT(self, base_url, api_key=None, lang=None, debug=False):
-        return api.API(base_url, api_key=api_key, lang=lang, debug=debug)
+    def _callFUT(self, base_url, api_key=None, lang=None, debug=False, **kw):
+        return api.API(
+            base_url, api_key=api_key, lang=lang, debug=debug, **kw
+        )
 
     def test_class(self):
         """Validate the class initialization and attributes."""
@@ -38,6 +40,30 @@ class TestAPI(base.BaseTestCase):
         self.assertEqual(api.lang, 'de')
         self.assertTrue(api.debug)
 
+    def test_timeout(self):
+        """Validate the default and per call timeouts."""
+        timeouts = []
+
+        def callback(request):
+            timeouts.append(request.req_kwargs['timeout'])
+            return (200, {}, u'{}')
+
+        responses.add_callback(responses.GET, self.URL, callback=callback)
+        self.api.get(self.PATH)
+        self.api.get(self.PATH, timeout=(1, 2))
+        self.assertEqual(timeouts, [api.DEFAULT_TIMEOUT, (1, 2)])
+
+    def test_read_timeout(self):
+        """Validate that a timeout is reported as server error."""
+        responses.add(
+            responses.GET,
+            self.URL,
+            body=requests.exceptions.ReadTimeout('timed out'),
+        )
+        with self.assertRaises(exceptions.ServerError) as context:
+            self.api.get(self.PATH)
+        self.assertEqual(context.exception.status_code, 504)
+
     def test_headers(self):
         """Validate the ``headers`` method."""
         headers = self.api.headers()
@@ -297,3 +323,50 @@ class TestAPI(base.BaseTestCase):
         result = self.api.request(self.URL, 'GET')
         response_headers = result.get('headers')
         self.assertEqual(response_headers, {'h1': 'v1', 'h2': 'v2'})
+
+    def test_session_reused(self):
+        """Validate that consecutive calls share one pooled session."""
+        responses.add(
+            responses.GET,
+            self.URL,
+            body=u'{"some": "content"}',
+            status=200,
+        )
+        session = self.api.session
+        self.api.get(self.PATH)
+        self.api.get(self.PATH)
+        self.assertIs(self.api.session, session)
+        self.assertEqual(len(responses.calls), 2)
+
+    def test_session_pool_config(self):
+        """Validate the connection pool configuration of the session."""
+        mls = self._callFUT(self.BASE_URL, pool_connections=2, pool_maxsize=5)
+        adapter = mls.session.get_adapter(self.BASE_URL)
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 5)
+
+    def test_session_ignores_cookies(self):
+        """Validate that the shared session does not store cookies."""
+        responses.add(
+            responses.GET,
+            self.URL,
+            body=u'{"some": "content"}',
+            adding_headers={'Set-Cookie': 'foo=bar; Path=/'},
+            status=200,
+        )
+        self.api.get(self.PATH)
+        self.assertEqual(len(self.api.session.cookies), 0)
+
+    def test_close(self):
+        """Validate that closing the API drops the session."""
+        session = self.api.session
+        self.api.close()
+        self.assertIsNone(self.api.transport._session)
+        self.assertIsNot(self.api.session, session)
+
+    def test_context_manager(self):
+        """Validate the context manager lifecycle."""
+        with self._callFUT(self.BASE_URL) as mls:
+            session = mls.session
+            self.assertIsNotNone(session)
+        self.assertIsNone(mls.transport._session)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Test the asynchronous API."""
+
+from mls.apiclient import asyncapi
+from mls.apiclient import exceptions
+from mls.apiclient.resources import Development
+from mls.apiclient.tests import base
+from mls.apiclient.tests import utils
+from mls.apiclient.transport import MemoryTransport
+
+import json
+
+
+class AsyncAPITestCase(base.BaseTestCase):
+    """AsyncAPI test case."""
+
+    PATH = '/api/rest/v1/developments'
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.api = asyncapi.AsyncAPI(
+            self.BASE_URL, transport=self.transport, max_workers=4,
+        )
+
+    def tearDown(self):
+        self.api.close()
+
+    def test_get_async(self):
+        """Validate running a GET request in a worker."""
+        self.transport.add(self.BASE_URL + self.PATH, body=u'{"a": 1}')
+        future = self.api.get_async(self.PATH)
+        self.assertEqual(future.result(1)['response'], {'a': 1})
+
+    def test_errors(self):
+        """Validate that request errors are raised by the future."""
+        future = self.api.get_async(self.PATH)
+        self.assertRaises(exceptions.ResourceNotFound, future.result, 1)
+
+    def test_resources(self):
+        """Validate the asynchronous resource methods."""
+        self.transport.add(
+            utils.get_url(self.BASE_URL + self.PATH, 'dev-1'),
+            body=utils.load_fixture('development_en.json'),
+        )
+        future = Development.get_async(self.api, 'dev-1')
+        development = future.result(1)
+        self.assertIsInstance(development, Development)
+        self.assertEqual(development.get_id(), 'dev-agency__dev001')
+
+    def test_get_many_in_workers(self):
+        """Validate that resource fan-outs in all workers finish."""
+        self.transport.add(
+            utils.get_url(self.BASE_URL + self.PATH, 'dev-1'),
+            body=utils.load_fixture('development_en.json'),
+        )
+        mls = asyncapi.AsyncAPI(
+            self.BASE_URL, transport=self.transport, max_workers=2,
+        )
+        futures = [
+            mls.submit(Development.get_many, mls, ['dev-1', 'dev-1'])
+            for _ in range(2)
+        ]
+        for future in futures:
+            self.assertEqual(len(future.result(3)), 2)
+        mls.close()
+
+    def test_fetch_all_in_workers(self):
+        """Validate that page fan-outs in all workers finish."""
+        self.transport.add(
+            self.BASE_URL + self.PATH,
+            body=json.dumps({'collection': [{'id': 'a'}, {'id': 'b'}]}),
+            headers={
+                'X-MLS-CountTotal': '6',
+                'X-MLS-CountLimit': '2',
+                'X-MLS-CountOffset': '0',
+            },
+        )
+        mls = asyncapi.AsyncAPI(
+            self.BASE_URL, transport=self.transport, max_workers=2,
+        )
+
+        def fetch_all():
+            return list(Development.fetch_all(mls, page_size=2))
+
+        futures = [mls.submit(fetch_all) for _ in range(2)]
+        for future in futures:
+            self.assertEqual(len(future.result(3)), 6)
+        mls.close()
+
+    def test_close(self):
+        """Validate that the API stays usable after closing it."""
+        self.transport.add(self.BASE_URL + self.PATH, body=u'{}')
+        self.api.close()
+        future = self.api.get_async(self.PATH)
+        self.assertEqual(future.result(1)['status'], 200)
+
+    def test_listing_resource(self):
+        """Validate that the listing resource shares the workers."""
+        self.assertIs(self.api.listing_resource.executor, self.api.executor)
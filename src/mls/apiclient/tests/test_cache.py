@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""Test the in-memory caches."""
+
+from mls.apiclient import api
+from mls.apiclient.cache import NegativeCache
+from mls.apiclient.cache import search_key
+from mls.apiclient.cache import TTLCache
+from mls.apiclient.cache import ValidatorCache
+from mls.apiclient.client import ListingResource
+from mls.apiclient.exceptions import ObjectNotFound
+from mls.apiclient.exceptions import ResourceNotFound
+from mls.apiclient.resources import Development
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+from mls.apiclient.transport import MemoryTransport
+from mls.apiclient.transport import Response
+
+import json
+
+
+class TTLCacheTestCase(base.BaseTestCase):
+    """TTLCache test case."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = TTLCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_get_set(self):
+        """Validate caching values and counting lookups."""
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', {'value': 1})
+        self.assertEqual(self.cache.get('a'), {'value': 1})
+        self.assertEqual(self.cache.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_copies(self):
+        """Validate that callers can't change cached values."""
+        value = {'value': 1}
+        self.cache.set('a', value)
+        value['value'] = 2
+        self.cache.get('a')['value'] = 3
+        self.assertEqual(self.cache.get('a'), {'value': 1})
+
+    def test_ttl(self):
+        """Validate that entries expire."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2, ttl=20)
+        self.clock.now += 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+
+    def test_lru(self):
+        """Validate that the least recently used entry is evicted."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.stats.get('evictions'), 1)
+
+    def test_get_or_set(self):
+        """Validate loading missing values."""
+        calls = []
+
+        def load():
+            calls.append(1)
+            return 'value'
+
+        self.assertEqual(self.cache.get_or_set('a', load), 'value')
+        self.assertEqual(self.cache.get_or_set('a', load), 'value')
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidate(self):
+        """Validate removing one or all entries."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.invalidate('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get('b'))
+
+
+class MetadataCacheTestCase(base.BaseTestCase):
+    """Caching of field metadata and categories."""
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+
+    def test_field_titles(self):
+        """Validate that field titles are cached per language."""
+        self.transport.add(
+            self.BASE_URL + '/api/rest/v1/field_titles/developments',
+            body=u'{"title": "Title"}',
+        )
+        mls = api.API(self.BASE_URL, lang='en', transport=self.transport)
+        Development.get_field_titles(mls)
+        titles = Development.get_field_titles(mls)
+        self.assertEqual(titles['response'], {'title': 'Title'})
+        self.assertEqual(len(self.transport.calls), 1)
+        mls.lang = 'de'
+        Development.get_field_titles(mls)
+        self.assertEqual(len(self.transport.calls), 2)
+        self.assertEqual(mls.metadata_cache.stats.get('hits'), 1)
+
+    def test_field_order_disabled(self):
+        """Validate that the cache can be disabled."""
+        self.transport.add(
+            self.BASE_URL + '/api/rest/v1/field_order/developments',
+            body=u'{"order": ["id", "title"]}',
+        )
+        mls = api.API(
+            self.BASE_URL, transport=self.transport, metadata_cache=False,
+        )
+        Development.get_field_order(mls)
+        Development.get_field_order(mls)
+        self.assertEqual(len(self.transport.calls), 2)
+        self.assertIsNone(mls.listing_resource.metadata_cache)
+
+    def test_category(self):
+        """Validate that listing categories are cached."""
+        self.transport.add(
+            self.BASE_URL + '/api/listings/categories/view_types',
+            body=u'{"status": "ok", "result": [["beach_view", "Beach"]]}',
+        )
+        resource = ListingResource(self.BASE_URL, transport=self.transport)
+        resource.category('view_types')
+        self.assertEqual(
+            resource.category('view_types'), [('beach_view', 'Beach')],
+        )
+        self.assertEqual(len(self.transport.calls), 1)
+        resource.metadata_cache.invalidate()
+        resource.category('view_types')
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_shared(self):
+        """Validate that the listing resource shares the API's cache."""
+        mls = api.API(self.BASE_URL, transport=self.transport)
+        self.assertIs(mls.listing_resource.metadata_cache, mls.metadata_cache)
+
+
+class ConditionalTransport(MemoryTransport):
+    """Memory transport answering conditional requests."""
+
+    def __init__(self, etag, **kwargs):
+        super(ConditionalTransport, self).__init__(**kwargs)
+        self.etag = etag
+        self.request_headers = []
+
+    def send(self, method, url, headers=None, **kwargs):
+        self.request_headers.append(headers or {})
+        if (headers or {}).get('If-None-Match') == self.etag:
+            self.calls.append((method, url))
+            return Response(304, url=url)
+        return super(ConditionalTransport, self).send(
+            method, url, headers=headers, **kwargs
+        )
+
+
+class ValidatorCacheTestCase(base.BaseTestCase):
+    """Conditional requests with the validator cache."""
+
+    PATH = '/api/rest/v1/developments'
+
+    def setUp(self):
+        self.transport = ConditionalTransport('"v1"')
+        self.transport.add(
+            self.BASE_URL + self.PATH,
+            body=u'{"collection": [{"id": "dev-1"}]}',
+            headers={
+                'ETag': '"v1"',
+                'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT',
+            },
+        )
+
+    def _make_api(self, **kwargs):
+        kwargs.setdefault('validator_cache', ValidatorCache())
+        return api.API(self.BASE_URL, transport=self.transport, **kwargs)
+
+    def test_not_modified(self):
+        """Validate that unchanged data is served from the cache."""
+        mls = self._make_api()
+        first = mls.get(self.PATH)
+        first['response']['collection'] = []
+        second = mls.get(self.PATH)
+        self.assertEqual(
+            second['response']['collection'], [{'id': 'dev-1'}],
+        )
+        self.assertEqual(self.transport.request_headers[1], {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+        })
+        stats = mls.validator_cache.stats
+        self.assertEqual(stats.get('not_modified'), 1)
+        self.assertEqual(stats.get('bytes_saved'), 33)
+
+    def test_changed(self):
+        """Validate that changed data replaces the cached result."""
+        mls = self._make_api()
+        mls.get(self.PATH)
+        self.transport.etag = '"v2"'
+        self.assertEqual(mls.get(self.PATH)['status'], 200)
+        self.assertEqual(mls.validator_cache.stats.get('not_modified'), 0)
+
+    def test_evicted(self):
+        """Validate a 304 response after the cached result was dropped."""
+        class EvictingCache(ValidatorCache):
+            def headers(self, url):
+                headers = super(EvictingCache, self).headers(url)
+                self.invalidate(url)
+                return headers
+
+        mls = self._make_api(validator_cache=EvictingCache())
+        mls.get(self.PATH)
+        result = mls.get(self.PATH)
+        self.assertEqual(
+            result['response']['collection'], [{'id': 'dev-1'}],
+        )
+        self.assertIn('If-None-Match', self.transport.request_headers[1])
+        self.assertNotIn('If-None-Match', self.transport.request_headers[2])
+
+    def test_disabled(self):
+        """Validate that conditional requests are disabled by default."""
+        mls = api.API(self.BASE_URL, transport=self.transport)
+        mls.get(self.PATH)
+        mls.get(self.PATH)
+        self.assertNotIn('If-None-Match', self.transport.request_headers[1])
+
+    def test_invalidate(self):
+        """Validate forgetting the validators."""
+        mls = self._make_api()
+        mls.get(self.PATH)
+        mls.validator_cache.invalidate()
+        mls.get(self.PATH)
+        self.assertNotIn('If-None-Match', self.transport.request_headers[1])
+
+
+class SearchKeyTestCase(base.BaseTestCase):
+    """Test the 'search_key' function."""
+
+    URL = 'https://demomls.com/api/listings'
+
+    def _callFUT(self, *args, **kwargs):
+        return search_key(*args, **kwargs)
+
+    def test_normalized(self):
+        """Validate that equal searches get the same key."""
+        first = self._callFUT(self.URL, {
+            'apikey': '1234', 'format': 'json', 'lang': 'en',
+            'limit': 10, 'pool': True, 'location': ' marbella',
+        })
+        second = self._callFUT(self.URL, {
+            'location': 'marbella', 'pool': 'true', 'limit': '10',
+            'offset': None,
+        }, lang='en')
+        self.assertEqual(first, second)
+        self.assertEqual(first, (self.URL, 'en', (
+            ('limit', '10'), ('location', 'marbella'), ('pool', 'true'),
+        )))
+
+    def test_lang(self):
+        """Validate that the language is part of the key."""
+        self.assertNotEqual(
+            self._callFUT(self.URL, {'limit': 10}, lang='en'),
+            self._callFUT(self.URL, {'limit': 10}, lang='de'),
+        )
+
+
+class SearchCacheTestCase(base.BaseTestCase):
+    """Caching of search results."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = TTLCache(ttl=60, clock=self.clock)
+        self.transport = MemoryTransport()
+
+    def test_listing_search(self):
+        """Validate that listing searches are cached with batching."""
+        self.transport.add(
+            self.BASE_URL + '/api/listings/search',
+            body=json.dumps({
+                'status': 'ok',
+                'result': [{'id': 'l1'}],
+                'batching': {'active': True, 'results_total': 1},
+            }),
+        )
+        resource = ListingResource(
+            self.BASE_URL, transport=self.transport,
+            search_cache=self.cache, search_ttl=10,
+        )
+        first = resource.search({'limit': 10, 'lang': 'en'})
+        second = resource.search({'lang': 'en', 'limit': '10'})
+        self.assertEqual(first, second)
+        self.assertEqual(second[1]['results'], 1)
+        self.assertEqual(len(self.transport.calls), 1)
+        self.clock.now += 10
+        resource.search({'limit': 10, 'lang': 'en'})
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_resource_search(self):
+        """Validate that resource searches are cached with headers."""
+        self.transport.add(
+            self.BASE_URL + '/api/rest/v1/developments',
+            body=u'{"collection": [{"id": "dev-1"}]}',
+            headers={'X-MLS-CountTotal': '1'},
+        )
+        mls = api.API(
+            self.BASE_URL, transport=self.transport, search_cache=self.cache,
+        )
+        Development.search(mls, {'limit': 10, 'offset': 0})
+        result = Development.search(mls, {'offset': '0', 'limit': '10'})
+        self.assertEqual(result._data, {'collection': [{'id': 'dev-1'}]})
+        self.assertEqual(result._headers, {'CountTotal': '1'})
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertIs(mls.listing_resource.search_cache, self.cache)
+
+
+class NegativeCacheTestCase(base.BaseTestCase):
+    """NegativeCache test case."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = NegativeCache(ttl=10, maxsize=4, clock=self.clock)
+
+    def test_ttl(self):
+        """Validate that missing keys are remembered for the TTL."""
+        self.assertNotIn('a', self.cache)
+        self.cache.add('a')
+        self.assertIn('a', self.cache)
+        self.clock.now += 10
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(self.cache.stats.as_dict(), {'hits': 1, 'misses': 2})
+
+    def test_maxsize(self):
+        """Validate that the oldest keys are evicted."""
+        for key in 'abcdef':
+            self.cache.add(key)
+        self.assertEqual(
+            self.cache.missing(['a', 'b', 'c', 'f', 'x']), ['c', 'f'],
+        )
+        self.assertEqual(self.cache.stats.get('evictions'), 2)
+
+    def test_invalidate(self):
+        """Validate forgetting one or all keys."""
+        self.cache.add('a')
+        self.cache.add('b')
+        self.cache.invalidate('a')
+        self.assertEqual(self.cache.missing(['a', 'b']), ['b'])
+        self.cache.invalidate()
+        self.assertEqual(self.cache.missing(['a', 'b']), [])
+
+
+class NegativeCachingTestCase(base.BaseTestCase):
+    """Resources remembering missing objects."""
+
+    def setUp(self):
+        self.cache = NegativeCache()
+        self.transport = MemoryTransport()
+
+    def test_listing(self):
+        """Validate that missing listings are requested once."""
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/gone',
+            body=json.dumps({'status': 'ok', 'result': None}),
+        )
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/l1',
+            body=json.dumps({'status': 'ok', 'result': {'id': 'l1'}}),
+        )
+        resource = ListingResource(
+            self.BASE_URL, transport=self.transport,
+            negative_cache=self.cache,
+        )
+        for _ in range(2):
+            self.assertRaises(ObjectNotFound, resource.get, 'gone', 'en')
+        self.assertEqual(len(self.transport.calls), 1)
+        result = resource.get_many(['l1', 'gone'], lang='en')
+        self.assertEqual(result[0], {'id': 'l1'})
+        self.assertIsInstance(result[1], ObjectNotFound)
+        self.assertEqual(len(self.transport.calls), 2)
+        resource.get_many(['gone'], lang='de')
+        self.assertEqual(len(self.transport.calls), 3)
+
+    def test_resource(self):
+        """Validate that missing resources are requested once."""
+        self.transport.add(
+            self.BASE_URL + '/api/rest/v1/developments/gone',
+            body=u'{}', status=404,
+        )
+        mls = api.API(
+            self.BASE_URL, transport=self.transport,
+            negative_cache=self.cache,
+        )
+        for _ in range(2):
+            self.assertRaises(
+                ResourceNotFound, Development.get, mls, 'gone',
+            )
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertIs(mls.listing_resource.negative_cache, self.cache)
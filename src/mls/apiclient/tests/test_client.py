@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Test the legacy MLS API client."""
+
+from mls.apiclient.client import ListingResource
+from mls.apiclient.exceptions import ObjectNotFound
+from mls.apiclient.tests import base
+from mls.apiclient.transport import MemoryTransport
+
+import json
+import responses
+import urlparse
+
+
+class ListingResourceTestCase(base.BaseTestCase):
+    """ListingResource test case."""
+
+    PATH = '/api/listings/search'
+
+    def setUp(self):
+        responses.start()
+        self.resource = ListingResource(self.BASE_URL, api_key='1234')
+
+    def tearDown(self):
+        responses.stop()
+        responses.reset()
+
+    def _register(self, total=5, next_links=True):
+        def callback(request):
+            params = dict(urlparse.parse_qsl(request.url.split('?')[1]))
+            self.assertEqual(params['apikey'], '1234')
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', 2))
+            ids = range(offset, min(offset + limit, total))
+            following = None
+            if next_links and offset + limit < total:
+                following = (
+                    'https://demomls.com/api/listings/search?apikey=1234&'
+                    'format=json&type=rs&limit={0}&offset={1}'.format(
+                        limit, offset + limit,
+                    )
+                )
+            body = {
+                'status': 'ok',
+                'result': [{'id': str(i)} for i in ids],
+                'batching': {
+                    'active': True,
+                    'next': following,
+                    'results_page': len(ids),
+                    'results_total': total,
+                },
+            }
+            return (200, {}, json.dumps(body))
+
+        responses.add_callback(
+            responses.GET, self.URL, callback=callback,
+        )
+
+    def test_iter_search(self):
+        """Validate following the 'next' URLs."""
+        self._register()
+        result = self.resource.iter_search({'type': 'rs'}, page_size=2)
+        self.assertEqual(
+            [item['id'] for item in result], ['0', '1', '2', '3', '4'],
+        )
+        self.assertEqual(len(responses.calls), 3)
+
+    def test_iter_search_offsets(self):
+        """Validate following the offsets without 'next' URLs."""
+        self._register(next_links=False)
+        result = self.resource.iter_search({'type': 'rs'}, page_size=2)
+        self.assertEqual(
+            [item['id'] for item in result], ['0', '1', '2', '3', '4'],
+        )
+
+    def test_iter_search_limits(self):
+        """Validate the item and page limits."""
+        self._register()
+        result = self.resource.iter_search({'type': 'rs'}, max_items=3)
+        self.assertEqual(len(list(result)), 3)
+        result = self.resource.iter_search({'type': 'rs'}, max_pages=1)
+        self.assertEqual(len(list(result)), 2)
+
+    def test_fetch_all(self):
+        """Validate fetching the remaining pages concurrently."""
+        self._register(total=9, next_links=False)
+        result = self.resource.fetch_all({'type': 'rs'}, page_size=2)
+        self.assertEqual(
+            [item['id'] for item in result], [str(i) for i in range(9)],
+        )
+        self.assertEqual(len(responses.calls), 5)
+
+    def test_fetch_all_unordered(self):
+        """Validate yielding the pages as they complete."""
+        self._register(total=9)
+        result = self.resource.fetch_all(
+            {'type': 'rs'}, page_size=2, ordered=False,
+        )
+        self.assertEqual(
+            sorted(item['id'] for item in result),
+            [str(i) for i in range(9)],
+        )
+
+    def test_iter_search_prefetch(self):
+        """Validate prefetching the following pages."""
+        self._register(total=9)
+        result = self.resource.iter_search(
+            {'type': 'rs'}, page_size=2, prefetch=1,
+        )
+        self.assertEqual(
+            [item['id'] for item in result], [str(i) for i in range(9)],
+        )
+        self.assertEqual(len(responses.calls), 5)
+
+
+class GetManyTestCase(base.BaseTestCase):
+    """ResourceBase.get_many test case."""
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.resource = ListingResource(
+            self.BASE_URL, transport=self.transport,
+        )
+
+    def _add(self, key, result):
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/' + key,
+            body=json.dumps({'status': 'ok', 'result': result}),
+        )
+
+    def test_get_many(self):
+        """Validate the input order and per key failures."""
+        for index in range(5):
+            self._add('l{0}'.format(index), {'id': index})
+        self._add('missing', None)
+        result = self.resource.get_many(
+            ['l3', 'missing', 'l0', 'l4', 'l1', 'l2'], lang='de',
+        )
+        self.assertIsInstance(result[1], ObjectNotFound)
+        self.assertEqual(
+            [item['id'] for item in result if isinstance(item, dict)],
+            [3, 0, 4, 1, 2],
+        )
+        self.assertTrue(all(
+            'lang=de' in url for method, url in self.transport.calls
+        ))
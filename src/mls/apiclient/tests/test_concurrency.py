@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Test the adaptive concurrency limit."""
+
+from mls.apiclient import api
+from mls.apiclient import asyncapi
+from mls.apiclient import exceptions
+from mls.apiclient.concurrency import AdaptiveLimiter
+from mls.apiclient.deadline import Deadline
+from mls.apiclient.scheduler import PriorityScheduler
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+from mls.apiclient.transport import MemoryTransport
+
+import threading
+import time
+
+
+class AdaptiveLimiterTestCase(base.BaseTestCase):
+    """AdaptiveLimiter test case."""
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def _callFUT(self, **kw):
+        return AdaptiveLimiter(clock=self.clock, **kw)
+
+    def _request(self, limiter, latency, error=False):
+        token = limiter.acquire()
+        self.clock.now += latency
+        limiter.release(token, error=error)
+
+    def test_increase(self):
+        """Validate that the limit grows while the latency is flat."""
+        limiter = self._callFUT(initial=2, max_limit=4)
+        for _ in range(20):
+            self._request(limiter, 0.1)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_latency(self):
+        """Validate that the limit shrinks when the latency rises."""
+        limiter = self._callFUT(initial=8)
+        self._request(limiter, 0.1)
+        self._request(limiter, 0.5)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_error(self):
+        """Validate that the limit shrinks once per overload."""
+        limiter = self._callFUT(initial=8, min_limit=2)
+        self._request(limiter, 0.1, error=True)
+        self._request(limiter, 0.1, error=True)
+        self.assertEqual(limiter.limit, 4)
+        for _ in range(4):
+            self._request(limiter, 0.1, error=True)
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(10):
+            self._request(limiter, 0.1, error=True)
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.metrics()['decreases'], 2)
+
+    def test_wait(self):
+        """Validate that requests exceeding the limit wait."""
+        limiter = AdaptiveLimiter(initial=1)
+        token = limiter.acquire()
+        acquired = threading.Event()
+
+        def request():
+            limiter.release(limiter.acquire())
+            acquired.set()
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(token)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        self.assertEqual(limiter.metrics()['waited'], 1)
+
+    def test_deadline(self):
+        """Validate that waiting requests give up at their deadline."""
+        limiter = AdaptiveLimiter(initial=1)
+        limiter.acquire()
+        start = time.time()
+        self.assertRaises(
+            exceptions.DeadlineExceeded, limiter.acquire, Deadline(0.05),
+        )
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_metrics(self):
+        """Validate the exposed metrics."""
+        limiter = self._callFUT(initial=3)
+        limiter.acquire()
+        metrics = limiter.metrics()
+        self.assertEqual(metrics['limit'], 3)
+        self.assertEqual(metrics['in_flight'], 1)
+
+
+class APIConcurrencyTestCase(base.BaseTestCase):
+    """Concurrency limit in the API."""
+
+    PATH = '/api/rest/v1/developments'
+
+    def test_server_error(self):
+        """Validate that server errors shrink the limit."""
+        transport = MemoryTransport()
+        transport.add(self.BASE_URL + self.PATH, status=503)
+        limiter = AdaptiveLimiter(initial=8)
+        mls = api.API(
+            self.BASE_URL, transport=transport, concurrency_limiter=limiter,
+        )
+        self.assertRaises(exceptions.ServerError, mls.get, self.PATH)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertIs(mls.listing_resource.concurrency_limiter, limiter)
+
+    def test_deadline(self):
+        """Validate that a request giving up frees its scheduler slot."""
+        transport = MemoryTransport()
+        transport.add(self.BASE_URL + self.PATH, body=u'{}')
+        limiter = AdaptiveLimiter(initial=1)
+        scheduler = PriorityScheduler(capacity=2)
+        mls = api.API(
+            self.BASE_URL, transport=transport, concurrency_limiter=limiter,
+            scheduler=scheduler,
+        )
+        limiter.acquire()
+        self.assertRaises(
+            exceptions.DeadlineExceeded,
+            mls.get, self.PATH, deadline=Deadline(0.05),
+        )
+        self.assertEqual(scheduler._in_flight, 0)
+        self.assertEqual(transport.calls, [])
+
+    def test_async_api(self):
+        """Validate the default limit of the asynchronous API."""
+        mls = asyncapi.AsyncAPI(self.BASE_URL, max_workers=6)
+        self.assertEqual(mls.concurrency_limiter.max_limit, 6)
+        mls.close()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Test the deadline budgets."""
+
+from mls.apiclient import deadline
+from mls.apiclient import exceptions
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+
+
+class DeadlineTestCase(base.BaseTestCase):
+    """Test the deadline class."""
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def _callFUT(self, seconds):
+        return deadline.Deadline(seconds, clock=self.clock)
+
+    def test_remaining(self):
+        budget = self._callFUT(2)
+        self.assertEqual(budget.remaining(), 2)
+        self.clock.now += 1.5
+        self.assertEqual(budget.remaining(), 0.5)
+        self.assertFalse(budget.expired)
+        self.clock.now += 1
+        self.assertEqual(budget.remaining(), 0)
+        self.assertTrue(budget.expired)
+
+    def test_check(self):
+        budget = self._callFUT(1)
+        budget.check()
+        self.clock.now += 1
+        self.assertRaises(exceptions.DeadlineExceeded, budget.check)
+
+    def test_clamp(self):
+        budget = self._callFUT(2)
+        self.assertEqual(budget.clamp(None), 2)
+        self.assertEqual(budget.clamp(1), 1)
+        self.assertEqual(budget.clamp(5), 2)
+        self.assertEqual(budget.clamp((1, 5)), (1, 2))
+        self.assertEqual(budget.clamp((None, 1)), (2, 1))
+
+    def test_current(self):
+        self.assertIsNone(deadline.current())
+        with self._callFUT(2) as outer:
+            self.assertIs(deadline.current(), outer)
+            with self._callFUT(1) as inner:
+                self.assertIs(deadline.current(), inner)
+            self.assertIs(deadline.current(), outer)
+        self.assertIsNone(deadline.current())
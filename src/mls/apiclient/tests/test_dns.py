@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Test the DNS cache."""
+
+from mls.apiclient import dns
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+
+import socket
+
+
+class DNSCacheTestCase(base.BaseTestCase):
+    """Test the DNS cache."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.lookups = []
+        self.cache = dns.DNSCache(
+            ttl=60, resolver=self._resolve, clock=self.clock,
+        )
+
+    def _resolve(self, host, port, family, type):
+        self.lookups.append((host, port))
+        address = '10.0.0.{0}'.format(len(self.lookups))
+        return [(socket.AF_INET, type, 6, '', (address, port))]
+
+    def test_resolve(self):
+        self.assertEqual(self.cache.resolve('demomls.com', 443), '10.0.0.1')
+        self.assertEqual(self.cache.resolve('demomls.com', 443), '10.0.0.1')
+        self.assertEqual(self.lookups, [('demomls.com', 443)])
+        self.assertEqual(self.cache.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_ttl(self):
+        self.cache.resolve('demomls.com', 443)
+        self.clock.now += 60
+        self.assertEqual(self.cache.resolve('demomls.com', 443), '10.0.0.2')
+        self.assertEqual(len(self.lookups), 2)
+
+    def test_invalidate(self):
+        self.cache.resolve('demomls.com', 443)
+        self.cache.resolve('mirror.demomls.com', 443)
+        self.cache.invalidate('demomls.com')
+        self.cache.resolve('demomls.com', 443)
+        self.cache.resolve('mirror.demomls.com', 443)
+        self.assertEqual(len(self.lookups), 3)
+        self.cache.invalidate()
+        self.cache.resolve('mirror.demomls.com', 443)
+        self.assertEqual(len(self.lookups), 4)
+
+    def test_all_addresses(self):
+        def resolve(host, port, family, type):
+            return [
+                (socket.AF_INET6, type, 6, '', ('::1', port, 0, 0)),
+                (socket.AF_INET, type, 6, '', ('127.0.0.1', port)),
+                (socket.AF_INET, type, 6, '', ('127.0.0.1', port)),
+            ]
+
+        cache = dns.DNSCache(resolver=resolve)
+        self.assertEqual(
+            cache.resolve_all('demomls.com', 443), ['::1', '127.0.0.1'],
+        )
+        self.assertEqual(cache.resolve('demomls.com', 443), '::1')
+
+
+class CachedDNSConnectionTestCase(base.BaseTestCase):
+    """Test connections using the DNS cache."""
+
+    def setUp(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_fallback(self):
+        """Validate that the next address is tried on connection errors."""
+        def resolve(host, port, family, type):
+            # Only 127.0.0.1 accepts connections on the port.
+            return [
+                (socket.AF_INET, type, 6, '', ('127.0.0.2', port)),
+                (socket.AF_INET, type, 6, '', ('127.0.0.1', port)),
+            ]
+
+        pools = dns.pool_classes_by_scheme(dns.DNSCache(resolver=resolve))
+        connection = pools['http'].ConnectionCls(
+            'mls.example', self.port, timeout=1,
+        )
+        sock = connection._new_conn()
+        self.assertEqual(sock.getpeername(), ('127.0.0.1', self.port))
+        self.assertEqual(connection.host, 'mls.example')
+        sock.close()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""Test the thread pool executor."""
+
+from mls.apiclient import deadline
+from mls.apiclient import executor
+from mls.apiclient.tests import base
+
+import threading
+import time
+
+
+class FutureTestCase(base.BaseTestCase):
+    """Future test case."""
+
+    def test_result(self):
+        """Validate setting and getting the result."""
+        future = executor.Future()
+        calls = []
+        future.add_done_callback(calls.append)
+        self.assertFalse(future.done())
+        future.set_result(42)
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 42)
+        self.assertIsNone(future.exception())
+        self.assertEqual(calls, [future])
+
+    def test_exception(self):
+        """Validate that exceptions are re-raised."""
+        future = executor.Future()
+        future.set_exception(ValueError('wrong'))
+        self.assertRaises(ValueError, future.result)
+        self.assertIsInstance(future.exception(), ValueError)
+
+    def test_timeout(self):
+        """Validate waiting for a result with a timeout."""
+        future = executor.Future()
+        self.assertRaises(executor.TimeoutError, future.result, 0.01)
+
+    def test_cancel(self):
+        """Validate that only pending futures can be cancelled."""
+        future = executor.Future()
+        self.assertTrue(future.cancel())
+        self.assertTrue(future.cancelled())
+        self.assertFalse(future.set_running_or_notify_cancel())
+        self.assertRaises(executor.CancelledError, future.result)
+
+        future = executor.Future()
+        future.set_running_or_notify_cancel()
+        self.assertFalse(future.cancel())
+
+
+class ExecutorTestCase(base.BaseTestCase):
+    """Executor test case."""
+
+    def setUp(self):
+        self.executor = executor.Executor(max_workers=3)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_submit(self):
+        """Validate running calls in worker threads."""
+        future = self.executor.submit(lambda a, b=0: a + b, 1, b=2)
+        self.assertEqual(future.result(1), 3)
+
+    def test_map(self):
+        """Validate that results are returned in input order."""
+        self.assertEqual(
+            self.executor.map(lambda a: a * 2, range(10)),
+            [a * 2 for a in range(10)],
+        )
+
+    def test_max_workers(self):
+        """Validate that at most ``max_workers`` threads run."""
+        event = threading.Event()
+        futures = [self.executor.submit(event.wait, 1) for _ in range(6)]
+        self.assertEqual(len(self.executor._threads), 3)
+        event.set()
+        done, not_done = executor.wait(futures, timeout=2)
+        self.assertEqual((len(done), len(not_done)), (6, 0))
+
+    def test_cancel_pending(self):
+        """Validate that cancelled calls are not run."""
+        event = threading.Event()
+        calls = []
+        for _ in range(3):
+            self.executor.submit(event.wait, 1)
+        future = self.executor.submit(calls.append, 1)
+        self.assertTrue(future.cancel())
+        event.set()
+        self.executor.shutdown()
+        self.assertEqual(calls, [])
+
+    def test_as_completed(self):
+        """Validate yielding futures as they finish."""
+        event = threading.Event()
+        slow = self.executor.submit(event.wait, 1)
+        fast = self.executor.submit(lambda: 1)
+        completed = executor.as_completed([slow, fast], timeout=2)
+        self.assertIs(next(completed), fast)
+        event.set()
+        self.assertIs(next(completed), slow)
+
+    def test_in_worker(self):
+        """Validate detecting the worker threads."""
+        self.assertFalse(self.executor.in_worker())
+        future = self.executor.submit(self.executor.in_worker)
+        self.assertTrue(future.result(1))
+
+    def test_gather_in_workers(self):
+        """Validate that workers don't wait for calls queued behind them."""
+        futures = [
+            self.executor.submit(
+                executor.gather, lambda a: a * 2, range(3),
+                executor=self.executor,
+            )
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            [future.result(2) for future in futures], [[0, 2, 4]] * 3,
+        )
+
+    def test_shutdown(self):
+        """Validate that no calls are accepted after shutdown."""
+        self.executor.shutdown()
+        self.assertRaises(RuntimeError, self.executor.submit, len, [])
+
+
+class DeadlineTestCase(base.BaseTestCase):
+    """Deadlines of calls running in other threads."""
+
+    def test_submit(self):
+        """Validate that workers use the deadline of the caller."""
+        with executor.Executor(max_workers=1) as pool:
+            self.assertIsNone(pool.submit(deadline.current).result(1))
+            with deadline.Deadline(5) as budget:
+                future = pool.submit(deadline.current)
+            self.assertIs(future.result(1), budget)
+            self.assertIsNone(pool.submit(deadline.current).result(1))
+
+    def test_prefetch(self):
+        """Validate that the producer uses the deadline of the consumer."""
+        def produce():
+            for _ in range(3):
+                yield deadline.current()
+
+        with deadline.Deadline(5) as budget:
+            items = list(executor.prefetch(produce(), 1))
+        self.assertEqual(items, [budget] * 3)
+
+
+class IterResultsTestCase(base.BaseTestCase):
+    """iter_results test case."""
+
+    def test_ordered(self):
+        """Validate yielding the results in order."""
+        futures = [executor.Future() for _ in range(3)]
+        for index, future in reversed(list(enumerate(futures))):
+            future.set_result(index)
+        self.assertEqual(list(executor.iter_results(futures)), [0, 1, 2])
+
+    def test_cancel_on_close(self):
+        """Validate that pending futures are cancelled on an early stop."""
+        futures = [executor.Future() for _ in range(3)]
+        futures[0].set_result(0)
+        results = executor.iter_results(futures)
+        self.assertEqual(next(results), 0)
+        results.close()
+        self.assertTrue(futures[1].cancelled())
+        self.assertTrue(futures[2].cancelled())
+
+
+class PrefetchTestCase(base.BaseTestCase):
+    """prefetch test case."""
+
+    def test_items(self):
+        """Validate that all items are yielded in order."""
+        self.assertEqual(list(executor.prefetch(range(5), 2)), range(5))
+        self.assertEqual(list(executor.prefetch(range(5), 0)), range(5))
+
+    def test_depth(self):
+        """Validate that at most ``depth`` items are produced ahead."""
+        produced = []
+
+        def produce():
+            for index in range(10):
+                produced.append(index)
+                yield index
+
+        items = executor.prefetch(produce(), 2)
+        self.assertEqual(next(items), 0)
+        time.sleep(0.1)
+        # One item consumed, two buffered and one waiting for a free slot.
+        self.assertLessEqual(len(produced), 4)
+        items.close()
+
+    def test_exception(self):
+        """Validate that errors of the producer are raised."""
+        def produce():
+            yield 1
+            raise ValueError('wrong')
+
+        items = executor.prefetch(produce(), 1)
+        self.assertEqual(next(items), 1)
+        self.assertRaises(ValueError, next, items)
+
+    def test_stop(self):
+        """Validate that production stops when the consumer stops."""
+        closed = threading.Event()
+
+        def produce():
+            try:
+                for index in range(100):
+                    yield index
+            finally:
+                closed.set()
+
+        items = executor.prefetch(produce(), 1)
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertTrue(closed.wait(1))
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Test hedged requests."""
+
+from mls.apiclient import api
+from mls.apiclient.client import ListingResource
+from mls.apiclient.hedging import HedgePolicy
+from mls.apiclient.tests import base
+from mls.apiclient.transport import MemoryTransport
+
+import threading
+
+
+class SlowTransport(MemoryTransport):
+    """Memory transport answering slowly for one host."""
+
+    def __init__(self, slow_host, **kwargs):
+        super(SlowTransport, self).__init__(**kwargs)
+        self.slow_host = slow_host
+        self.release = threading.Event()
+
+    def send(self, method, url, **kwargs):
+        if url.startswith(self.slow_host):
+            self.release.wait(2)
+        return super(SlowTransport, self).send(method, url, **kwargs)
+
+
+class HedgePolicyTestCase(base.BaseTestCase):
+    """HedgePolicy test case."""
+
+    def setUp(self):
+        self.policy = HedgePolicy(min_samples=2, min_delay=0.01)
+
+    def tearDown(self):
+        self.policy.close()
+
+    def test_delay(self):
+        """Validate the hedge delay."""
+        self.assertIsNone(self.policy.get_delay())
+        for latency in (0.1, 0.2, 0.3, 0.4):
+            self.policy.record(latency)
+        self.assertEqual(self.policy.get_delay(), 0.4)
+        self.policy.percentile = 50
+        self.assertEqual(self.policy.get_delay(), 0.2)
+
+    def test_no_samples(self):
+        """Validate that requests are not hedged without samples."""
+        self.assertEqual(self.policy.run(lambda: 1, lambda: 2), 1)
+        self.assertEqual(self.policy.stats.get('hedges'), 0)
+
+    def test_hedge(self):
+        """Validate that the faster request wins."""
+        self.policy.record(0.01)
+        self.policy.record(0.01)
+        self.policy.stats.incr('requests', 10)
+        event = threading.Event()
+        result = self.policy.run(lambda: event.wait(1) and 1, lambda: 2)
+        event.set()
+        self.assertEqual(result, 2)
+        self.assertEqual(self.policy.stats.get('hedges'), 1)
+        self.assertEqual(self.policy.stats.get('hedge_wins'), 1)
+
+    def test_hedge_error(self):
+        """Validate that a failing hedge doesn't fail the request."""
+        self.policy.record(0.01)
+        self.policy.record(0.01)
+        self.policy.stats.incr('requests', 10)
+
+        def hedge():
+            raise ValueError('wrong')
+
+        event = threading.Event()
+        result = self.policy.run(lambda: event.wait(0.1) or 1, hedge)
+        self.assertEqual(result, 1)
+
+    def test_not_capped(self):
+        """Validate that the first requests don't share the hedge pool."""
+        self.policy.max_workers = 1
+        self.policy.max_rate = 0
+        self.policy.record(0.01)
+        self.policy.record(0.01)
+        running = []
+        all_running = threading.Event()
+        results = []
+
+        def primary():
+            running.append(1)
+            if len(running) == 3:
+                all_running.set()
+            return all_running.wait(1)
+
+        def call():
+            results.append(self.policy.run(primary, lambda: False))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(results, [True, True, True])
+
+    def test_primary_error(self):
+        """Validate that both requests must fail to fail the request."""
+        self.policy.record(0.01)
+        self.policy.record(0.01)
+        self.policy.stats.incr('requests', 10)
+        event = threading.Event()
+
+        def primary():
+            event.wait(0.1)
+            raise ValueError('primary')
+
+        def hedge():
+            event.wait(0.2)
+            raise ValueError('hedge')
+
+        self.assertRaises(ValueError, self.policy.run, primary, hedge)
+        self.assertEqual(self.policy.stats.get('hedges'), 1)
+
+    def test_max_rate(self):
+        """Validate that the hedge rate is capped."""
+        self.policy.max_rate = 0
+        self.policy.record(0.01)
+        self.policy.record(0.01)
+        event = threading.Event()
+        result = self.policy.run(lambda: event.wait(0.1) or 1, lambda: 2)
+        self.assertEqual(result, 1)
+        self.assertEqual(self.policy.stats.get('hedges'), 0)
+
+
+class ClientHedgingTestCase(base.BaseTestCase):
+    """Hedged requests of the API and the listing resource."""
+
+    BASE_URLS = ['https://mls1.com', 'https://mls2.com']
+
+    def setUp(self):
+        self.policy = HedgePolicy(min_samples=1, min_delay=0.01)
+        self.policy.record(0.01)
+        self.policy.stats.incr('requests', 10)
+        self.transport = SlowTransport('https://mls1.com')
+
+    def tearDown(self):
+        self.transport.release.set()
+        self.policy.close()
+
+    def test_api(self):
+        """Validate that a slow request is sent to the other mirror."""
+        path = '/api/rest/v1/developments'
+        for base_url in self.BASE_URLS:
+            self.transport.add(base_url + path, body=u'{}')
+        mls = api.API(
+            self.BASE_URLS, transport=self.transport, hedging=self.policy,
+        )
+        self.assertEqual(mls.get(path)['status'], 200)
+        self.assertEqual(self.policy.stats.get('hedge_wins'), 1)
+        self.assertIs(mls.listing_resource.hedging, self.policy)
+
+    def test_listing_resource(self):
+        """Validate that a slow request is sent to the other host."""
+        for base_url in self.BASE_URLS:
+            self.transport.add(
+                base_url + '/api/listings/listing/l1',
+                body=u'{"status": "ok", "result": {"id": "l1"}}',
+            )
+        resource = ListingResource(
+            self.BASE_URLS, transport=self.transport, hedging=self.policy,
+        )
+        self.assertEqual(resource.get('l1'), {'id': 'l1'})
+        self.assertEqual(self.policy.stats.get('hedge_wins'), 1)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Test multi host failover."""
+
+from mls.apiclient import api
+from mls.apiclient import exceptions
+from mls.apiclient.client import ListingResource
+from mls.apiclient.hosts import HostPool
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+from mls.apiclient.transport import MemoryTransport
+
+
+BASE_URLS = ['https://mls1.com', 'https://mls2.com/']
+
+
+class HostPoolTestCase(base.BaseTestCase):
+    """HostPool test case."""
+
+    def _callFUT(self, base_urls=BASE_URLS, **kw):
+        return HostPool(base_urls, **kw)
+
+    def test_single_url(self):
+        """Validate that a single base URL is accepted."""
+        pool = self._callFUT('https://mls1.com/')
+        self.assertEqual(pool.base_urls, ['https://mls1.com'])
+
+    def test_empty(self):
+        """Validate that at least one base URL is required."""
+        self.assertRaises(ValueError, self._callFUT, [])
+
+    def test_configured_order(self):
+        """Validate that hosts without requests keep the configured order."""
+        pool = self._callFUT()
+        self.assertEqual(pool.ordered(), [
+            'https://mls1.com', 'https://mls2.com',
+        ])
+
+    def test_latency(self):
+        """Validate that the faster host is preferred."""
+        pool = self._callFUT()
+        pool.record('https://mls1.com/api', 0.5)
+        pool.record('https://mls2.com/api', 0.1)
+        self.assertEqual(pool.best(), 'https://mls2.com')
+
+    def test_errors(self):
+        """Validate that failing hosts are penalized."""
+        pool = self._callFUT()
+        pool.record('https://mls1.com/api', 0.1, error=True)
+        pool.record('https://mls2.com/api', 0.5)
+        self.assertEqual(pool.best(), 'https://mls2.com')
+        stats = pool.stats()['https://mls1.com']
+        self.assertEqual(stats['errors'], 1)
+        self.assertIsNone(stats['latency'])
+
+    def test_recovery(self):
+        """Validate that a failed host is tried again after a while."""
+        clock = Clock()
+        pool = self._callFUT(half_life=10, clock=clock)
+        pool.record('https://mls1.com/api', 0.1, error=True)
+        for _ in range(100):
+            pool.record('https://mls2.com/api', 0.5)
+            self.assertEqual(pool.best(), 'https://mls2.com')
+            clock.now += 0.1
+        clock.now += 30
+        self.assertEqual(pool.best(), 'https://mls1.com')
+        stats = pool.stats()['https://mls1.com']
+        self.assertAlmostEqual(stats['error_rate'], 0.3 * 0.5 ** 4)
+
+    def test_candidates(self):
+        """Validate that URLs are moved to every host."""
+        pool = self._callFUT()
+        pool.record('https://mls2.com/api', 0.1)
+        pool.record('https://mls1.com/api', 0.2)
+        self.assertEqual(pool.candidates('https://mls1.com/api/listings'), [
+            'https://mls2.com/api/listings',
+            'https://mls1.com/api/listings',
+        ])
+        self.assertEqual(
+            pool.candidates('https://mls1.com/api', failover=False),
+            ['https://mls2.com/api'],
+        )
+
+    def test_unknown_host(self):
+        """Validate that URLs of other hosts are not touched."""
+        pool = self._callFUT()
+        self.assertEqual(
+            pool.candidates('https://mls10.com/api'),
+            ['https://mls10.com/api'],
+        )
+        pool.record('https://mls10.com/api', 0.1)
+        self.assertEqual(pool.stats()['https://mls1.com']['requests'], 0)
+
+
+class APIFailoverTestCase(base.BaseTestCase):
+    """API failover test case."""
+
+    PATH = '/api/rest/v1/developments'
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.api = api.API(BASE_URLS, transport=self.transport)
+
+    def test_base_url(self):
+        """Validate that the first host is the primary base URL."""
+        self.assertEqual(self.api.base_url, 'https://mls1.com')
+        self.assertEqual(self.api.base_urls, [
+            'https://mls1.com', 'https://mls2.com',
+        ])
+
+    def test_failover(self):
+        """Validate that a failing host is skipped."""
+        self.transport.add('https://mls1.com' + self.PATH, status=503)
+        self.transport.add('https://mls2.com' + self.PATH, body=u'{}')
+        self.assertEqual(self.api.get(self.PATH)['status'], 200)
+        stats = self.api.host_stats()
+        self.assertEqual(stats['https://mls1.com']['errors'], 1)
+        self.assertEqual(stats['https://mls2.com']['errors'], 0)
+
+        # The healthy host is used first afterwards.
+        self.api.get(self.PATH)
+        self.assertTrue(
+            self.transport.calls[-1][1].startswith('https://mls2.com/'),
+        )
+        self.assertEqual(len(self.transport.calls), 3)
+
+    def test_all_hosts_fail(self):
+        """Validate that the last error is raised."""
+        self.transport.add('https://mls1.com' + self.PATH, status=503)
+        self.transport.add('https://mls2.com' + self.PATH, status=502)
+        self.assertRaises(exceptions.ServerError, self.api.get, self.PATH)
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_client_error(self):
+        """Validate that client errors do not fail over."""
+        self.assertRaises(
+            exceptions.ResourceNotFound, self.api.get, self.PATH,
+        )
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_no_failover_for_post(self):
+        """Validate that only GET requests fail over."""
+        self.transport.add(
+            'https://mls1.com' + self.PATH, status=503, method='POST',
+        )
+        self.assertRaises(
+            exceptions.ServerError,
+            self.api.request,
+            'https://mls1.com' + self.PATH,
+            'POST',
+            body={},
+        )
+        self.assertEqual(len(self.transport.calls), 1)
+
+
+class ResourceFailoverTestCase(base.BaseTestCase):
+    """ListingResource failover test case."""
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.resource = ListingResource(BASE_URLS, transport=self.transport)
+
+    def test_failover(self):
+        """Validate that a failing host is skipped."""
+        self.transport.add(
+            'https://mls1.com/api/listings/categories/view_types',
+            status=500,
+        )
+        self.transport.add(
+            'https://mls2.com/api/listings/categories/view_types',
+            body=u'{"status": "ok", "result": [["beach_view", "Beach"]]}',
+        )
+        self.assertEqual(
+            self.resource.category('view_types'),
+            [('beach_view', 'Beach')],
+        )
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_shared_hosts(self):
+        """Validate that the API shares its host statistics."""
+        mls = api.API(BASE_URLS, transport=self.transport)
+        self.assertIs(mls.listing_resource._hosts, mls.hosts)
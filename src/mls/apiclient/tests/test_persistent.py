@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Test the persistent response cache."""
+
+from mls.apiclient import api
+from mls.apiclient.client import ListingResource
+from mls.apiclient.persistent import make_key
+from mls.apiclient.persistent import SQLiteCache
+from mls.apiclient.resources import Development
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+from mls.apiclient.transport import MemoryTransport
+
+import json
+import os
+import shutil
+import tempfile
+
+
+class MakeKeyTestCase(base.BaseTestCase):
+    """Test the 'make_key' function."""
+
+    def _callFUT(self, *args, **kwargs):
+        return make_key(*args, **kwargs)
+
+    def test_params_order(self):
+        """Validate that the key doesn't depend on the params order."""
+        url = 'https://demomls.com/api/listings/listing/l1'
+        self.assertEqual(
+            self._callFUT(url, {'a': '1', 'b': '2', 'lang': 'en'}),
+            self._callFUT(url, {'b': '2', 'a': '1'}, lang='en'),
+        )
+        self.assertNotEqual(
+            self._callFUT(url, {'a': '1', 'b': '2'}, lang='en'),
+            self._callFUT(url, {'a': '1', 'b': '2'}, lang='de'),
+        )
+
+    def test_hashed(self):
+        """Validate that credentials are not part of the key."""
+        key = self._callFUT(
+            u'https://demomls.com/api/listings/listing/l1',
+            {'apikey': 'SECRET-KEY'},
+        )
+        self.assertEqual(len(key), 64)
+        self.assertNotIn('SECRET-KEY', key)
+
+
+class SQLiteCacheTestCase(base.BaseTestCase):
+    """SQLiteCache test case."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite')
+        self.clock = Clock()
+        self.cache = SQLiteCache(
+            self.path, ttl=10, touch_interval=1, clock=self.clock,
+        )
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_set(self):
+        """Validate caching values and counting lookups."""
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', {'title': u'Beach Villa'})
+        self.assertEqual(self.cache.get('a'), {'title': u'Beach Villa'})
+        self.assertEqual(self.cache.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_ttl(self):
+        """Validate that entries expire."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2, ttl=20)
+        self.clock.now += 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+
+    def test_max_size(self):
+        """Validate that the least recently used entries are evicted."""
+        value = os.urandom(200).encode('hex')
+        self.cache.set('a', value)
+        size = self.cache._connection.execute(
+            'SELECT size FROM responses',
+        ).fetchone()[0]
+        self.cache.max_size = size * 2
+        self.clock.now += 1
+        self.cache.set('b', value)
+        self.clock.now += 1
+        self.cache.get('a')
+        self.clock.now += 1
+        self.cache.set('c', value)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), value)
+        self.assertEqual(self.cache.get('c'), value)
+        self.assertEqual(self.cache.stats.get('evictions'), 1)
+
+    def test_size(self):
+        """Validate that the total size follows every change."""
+        def total():
+            return self.cache._connection.execute(
+                'SELECT value FROM totals',
+            ).fetchone()[0]
+
+        def stored():
+            return self.cache._connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses',
+            ).fetchone()[0]
+
+        self.cache.set('a', 'x' * 100)
+        self.cache.set('b', 'y')
+        self.cache.set('a', 'z')
+        self.assertEqual(total(), stored())
+        self.cache.invalidate('a')
+        self.assertEqual(total(), stored())
+        self.cache.max_size = 0
+        self.clock.now += 10
+        self.cache.set('c', 'c')
+        self.assertEqual(total(), 0)
+        self.assertEqual(stored(), 0)
+
+    def test_read_only_get(self):
+        """Validate that reads only rarely update the access time."""
+        self.cache.set('a', 1)
+        self.clock.now += 0.5
+        self.cache.get('a')
+
+        def accessed():
+            return self.cache._connection.execute(
+                'SELECT accessed FROM responses',
+            ).fetchone()[0]
+
+        self.assertEqual(accessed(), 1000.0)
+        self.clock.now += 0.5
+        self.cache.get('a')
+        self.assertEqual(accessed(), 1001.0)
+
+    def test_shared(self):
+        """Validate that the database survives the cache instance."""
+        self.cache.set('a', [1, 2])
+        self.cache.close()
+        other = SQLiteCache(self.path, clock=self.clock)
+        self.assertEqual(other.get('a'), [1, 2])
+        other.invalidate('a')
+        self.assertIsNone(self.cache.get('a'))
+        other.close()
+
+    def test_invalidate(self):
+        """Validate removing all entries."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+
+
+class ResponseCacheTestCase(base.BaseTestCase):
+    """Resources using the persistent response cache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = SQLiteCache(os.path.join(self.tmpdir, 'cache.sqlite'))
+        self.transport = MemoryTransport()
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_listing(self):
+        """Validate that listing details are cached."""
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/l1',
+            body=json.dumps({'status': 'ok', 'result': {'id': 'l1'}}),
+        )
+        resource = ListingResource(
+            self.BASE_URL, transport=self.transport,
+            response_cache=self.cache,
+        )
+        self.assertEqual(resource.get('l1', lang='en'), {'id': 'l1'})
+        self.assertEqual(resource.get('l1', lang='en'), {'id': 'l1'})
+        self.assertEqual(len(self.transport.calls), 1)
+        resource.get('l1', lang='de')
+        self.assertEqual(len(self.transport.calls), 2)
+
+    def test_resource(self):
+        """Validate that resource details are cached."""
+        self.transport.add(
+            self.BASE_URL + '/api/rest/v1/developments/dev-1',
+            body=u'{"id": "dev-1"}',
+        )
+        mls = api.API(
+            self.BASE_URL, transport=self.transport,
+            response_cache=self.cache,
+        )
+        Development.get(mls, 'dev-1')
+        development = Development.get(mls, 'dev-1')
+        self.assertEqual(development._data, {'id': 'dev-1'})
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertIs(mls.listing_resource.response_cache, self.cache)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Test the client side rate limiting."""
+
+from mls.apiclient import api
+from mls.apiclient import exceptions
+from mls.apiclient.client import ListingResource
+from mls.apiclient.concurrency import AdaptiveLimiter
+from mls.apiclient.deadline import Deadline
+from mls.apiclient.ratelimit import RateLimiter
+from mls.apiclient.ratelimit import TokenBucket
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+from mls.apiclient.transport import MemoryTransport
+
+
+class TokenBucketTestCase(base.BaseTestCase):
+    """TokenBucket test case."""
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def _callFUT(self, rate, burst=1):
+        return TokenBucket(
+            rate, burst, clock=self.clock, sleep=self.clock.sleep,
+        )
+
+    def test_burst(self):
+        """Validate that a burst is sent without waiting."""
+        bucket = self._callFUT(2, burst=3)
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.acquire(), 0.5)
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_queue(self):
+        """Validate that waiting callers get consecutive slots."""
+        bucket = self._callFUT(4)
+        self.assertEqual(
+            [bucket.reserve() for _ in range(4)], [0, 0.25, 0.5, 0.75],
+        )
+
+    def test_refill(self):
+        """Validate that tokens are refilled over time up to the burst."""
+        bucket = self._callFUT(1, burst=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.clock.now += 10
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 1])
+
+    def test_update(self):
+        """Validate adapting to the limits of the MLS."""
+        bucket = self._callFUT(10, burst=10)
+        bucket.update(rate=5, remaining=0, reset=2)
+        self.assertEqual(bucket.rate, 5)
+        self.assertEqual(bucket.reserve(), 2)
+
+    def test_deadline(self):
+        """Validate failing at once if the token is due after a deadline."""
+        bucket = self._callFUT(1 / 3.)
+        bucket.acquire()
+        self.assertRaises(
+            exceptions.DeadlineExceeded,
+            bucket.acquire, Deadline(0.5, clock=self.clock),
+        )
+        self.assertEqual(self.clock.sleeps, [])
+        # The token was not taken.
+        self.assertEqual(bucket.reserve(), 3)
+
+    def test_invalid_rate(self):
+        """Validate that the rate must be positive."""
+        self.assertRaises(ValueError, self._callFUT, 0)
+
+
+class RateLimiterTestCase(base.BaseTestCase):
+    """RateLimiter test case."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.limiter = RateLimiter(
+            1, clock=self.clock, sleep=self.clock.sleep,
+        )
+
+    def test_buckets(self):
+        """Validate the buckets per host and API key."""
+        self.limiter.acquire('https://mls1.com/api', 'key1')
+        self.limiter.acquire('https://mls1.com/api', 'key2')
+        self.limiter.acquire('https://mls2.com/api', 'key1')
+        self.assertEqual(self.clock.sleeps, [])
+        self.limiter.acquire('https://mls1.com/api/other', 'key1')
+        self.assertEqual(self.clock.sleeps, [1])
+        self.assertEqual(self.limiter.stats.as_dict(), {
+            'throttled': 1, 'throttle_time': 1,
+        })
+
+    def test_update(self):
+        """Validate reading the rate limit headers."""
+        self.limiter.update('https://mls1.com/api', 'key1', {
+            'RateLimit-Limit': '60', 'RateLimit-Period': '30',
+        })
+        self.assertEqual(self.limiter.get('https://mls1.com', 'key1').rate, 2)
+        self.limiter.update('https://mls1.com/api', 'key1', {'Other': '1'})
+        self.assertEqual(self.limiter.get('https://mls1.com', 'key1').rate, 2)
+
+    def test_not_adaptive(self):
+        """Validate that headers can be ignored."""
+        self.limiter.adaptive = False
+        self.limiter.update('https://mls1.com/api', 'key1', {
+            'RateLimit-Limit': '60',
+        })
+        self.assertEqual(self.limiter.get('https://mls1.com', 'key1').rate, 1)
+
+
+class ClientRateLimitTestCase(base.BaseTestCase):
+    """Rate limiting in the API and the listing resource."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.limiter = RateLimiter(
+            10, clock=self.clock, sleep=self.clock.sleep,
+        )
+        self.transport = MemoryTransport()
+
+    def test_api(self):
+        """Validate that API requests are limited and adapt the rate."""
+        url = self.BASE_URL + '/api/rest/v1/developments'
+        self.transport.add(url, body=u'{}', headers={
+            'X-MLS-RateLimit-Limit': '5',
+        })
+        mls = api.API(
+            self.BASE_URL,
+            api_key='1234',
+            transport=self.transport,
+            rate_limiter=self.limiter,
+        )
+        mls.get('api/rest/v1/developments')
+        mls.get('api/rest/v1/developments')
+        self.assertEqual(self.clock.sleeps, [0.2])
+        self.assertIs(mls.listing_resource.rate_limiter, self.limiter)
+
+    def test_deadline(self):
+        """Validate that throttled requests keep their deadline."""
+        url = self.BASE_URL + '/api/rest/v1/developments'
+        self.transport.add(url, body=u'{}')
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/l1',
+            body=u'{"status": "ok", "result": {}}',
+        )
+        limiter = RateLimiter(
+            1 / 3., clock=self.clock, sleep=self.clock.sleep,
+        )
+        mls = api.API(
+            self.BASE_URL, transport=self.transport, rate_limiter=limiter,
+        )
+        mls.get('api/rest/v1/developments')
+        self.assertRaises(
+            exceptions.DeadlineExceeded,
+            mls.get, 'api/rest/v1/developments',
+            deadline=Deadline(0.5, clock=self.clock),
+        )
+        with Deadline(0.5, clock=self.clock):
+            self.assertRaises(
+                exceptions.DeadlineExceeded,
+                mls.listing_resource.get, 'l1',
+            )
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_listing_resource(self):
+        """Validate that listing resource requests are limited."""
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/l1',
+            body=u'{"status": "ok", "result": {}}',
+        )
+        resource = ListingResource(
+            self.BASE_URL,
+            transport=self.transport,
+            rate_limiter=self.limiter,
+        )
+        resource.get('l1')
+        resource.get('l1')
+        self.assertEqual(self.clock.sleeps, [0.1])
+
+    def test_not_latency(self):
+        """Validate that throttling doesn't count as request latency."""
+        url = self.BASE_URL + '/api/rest/v1/developments'
+        self.transport.add(url, body=u'{}')
+        self.transport.add(
+            self.BASE_URL + '/api/listings/listing/l1',
+            body=u'{"status": "ok", "result": {}}',
+        )
+        concurrency = AdaptiveLimiter(initial=16, clock=self.clock)
+        mls = api.API(
+            self.BASE_URL,
+            transport=self.transport,
+            rate_limiter=self.limiter,
+            concurrency_limiter=concurrency,
+            coalesce=False,
+        )
+        for _ in range(20):
+            mls.get('api/rest/v1/developments')
+            mls.listing_resource.get('l1')
+        self.assertEqual(len(self.clock.sleeps), 39)
+        self.assertEqual(concurrency.stats.get('decreases'), 0)
+        self.assertGreaterEqual(concurrency.limit, 16)
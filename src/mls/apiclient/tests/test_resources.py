@@ -2,6 +2,8 @@
 """Test the resource classes."""
 
 from mls.apiclient import api
+from mls.apiclient import deadline
+from mls.apiclient import exceptions
 from mls.apiclient import resources
 from mls.apiclient.tests import base
 from mls.apiclient.tests import utils
@@ -9,6 +11,7 @@ from mls.apiclient.utils import join_url
 
 import json
 import responses
+import urlparse
 
 
 class ResourceTestCase(base.BaseTestCase):
@@ -222,6 +225,52 @@ class DevelopmentTestCase(base.BaseTestCase):
         response_dict = json.loads(response)
         self.assertEqual(result._data, response_dict.get('response'))
 
+    def test_get_many(self):
+        """Validate the input order and per id failures."""
+        for index in range(3):
+            responses.add(
+                responses.GET,
+                utils.get_url(
+                    self.API_BASE, join_url(self.endpoint, str(index)),
+                ),
+                body=json.dumps({'id': str(index)}),
+            )
+        responses.add(
+            responses.GET,
+            utils.get_url(self.API_BASE, join_url(self.endpoint, 'missing')),
+            status=404,
+        )
+        result = resources.Development.get_many(
+            self.api, ['2', 'missing', '0', '1'],
+        )
+        self.assertIsInstance(result[1], exceptions.ResourceNotFound)
+        self.assertEqual(result[0].get_id(), '2')
+        self.assertEqual(result[2].get_id(), '0')
+        self.assertEqual(result[3].get_id(), '1')
+
+    def test_get_many_deadline(self):
+        """Validate that the workers use the deadline of the caller."""
+        timeouts = []
+
+        def callback(request):
+            timeouts.append(request.req_kwargs['timeout'])
+            return (200, {}, u'{}')
+
+        for index in range(3):
+            responses.add_callback(
+                responses.GET,
+                utils.get_url(
+                    self.API_BASE, join_url(self.endpoint, str(index)),
+                ),
+                callback=callback,
+            )
+        with deadline.Deadline(1):
+            resources.Development.get_many(self.api, ['0', '1', '2'])
+        self.assertEqual(len(timeouts), 3)
+        for connect, read in timeouts:
+            self.assertTrue(0 < connect <= 1)
+            self.assertTrue(0 < read <= 1)
+
     def test_get_all(self):
         """Validate the 'search' endpoint to get all developments."""
         resource = self.endpoint
@@ -236,6 +285,97 @@ class DevelopmentTestCase(base.BaseTestCase):
         response_dict = json.loads(response)
         self.assertEqual(result._data, response_dict.get('response'))
 
+    def _register_pages(self):
+        def callback(request):
+            if 'offset=25' in request.url:
+                fixture = 'integration/development_list_26-2.json'
+            else:
+                fixture = 'integration/development_list_26-1.json'
+            return (200, {}, utils.load_fixture(fixture))
+
+        responses.add_callback(
+            responses.GET,
+            utils.get_url(self.API_BASE, self.endpoint),
+            callback=callback,
+        )
+
+    def test_iter_search(self):
+        """Validate following the 'next' links of the collection."""
+        self._register_pages()
+        result = list(resources.Development.iter_search(self.api))
+        self.assertEqual(len(result), 26)
+        self.assertEqual(result[-1].get_id(), 'budget-dev__budev011')
+        self.assertEqual(len(responses.calls), 2)
+
+    def test_iter_search_limits(self):
+        """Validate the item and page limits."""
+        self._register_pages()
+        result = resources.Development.iter_search(self.api, max_items=3)
+        self.assertEqual(len(list(result)), 3)
+        result = resources.Development.iter_search(self.api, max_pages=1)
+        self.assertEqual(len(list(result)), 25)
+        self.assertEqual(len(responses.calls), 2)
+
+    def _register_counted_pages(self, total=5, limit=2):
+        def callback(request):
+            params = dict(urlparse.parse_qsl(request.url.split('?')[1]))
+            offset = int(params.get('offset', 0))
+            self.assertEqual(params.get('limit', str(limit)), str(limit))
+            ids = range(offset, min(offset + limit, total))
+            headers = {
+                'X-MLS-CountTotal': str(total),
+                'X-MLS-CountLimit': str(limit),
+                'X-MLS-CountOffset': str(offset),
+            }
+            body = {'collection': [{'id': str(i)} for i in ids]}
+            return (200, headers, json.dumps(body))
+
+        responses.add_callback(
+            responses.GET,
+            utils.get_url(self.API_BASE, self.endpoint),
+            callback=callback,
+        )
+
+    def test_iter_search_offsets(self):
+        """Validate following the count headers without links."""
+        self._register_counted_pages()
+        result = resources.Development.iter_search(self.api, page_size=2)
+        self.assertEqual(
+            [item.get_id() for item in result], ['0', '1', '2', '3', '4'],
+        )
+        self.assertEqual(len(responses.calls), 3)
+
+    def test_iter_search_prefetch(self):
+        """Validate prefetching the following pages."""
+        self._register_counted_pages(total=9)
+        result = resources.Development.iter_search(
+            self.api, page_size=2, prefetch=2,
+        )
+        self.assertEqual(
+            [item.get_id() for item in result], [str(i) for i in range(9)],
+        )
+        self.assertEqual(len(responses.calls), 5)
+
+    def test_fetch_all(self):
+        """Validate fetching the remaining pages concurrently."""
+        self._register_counted_pages(total=9)
+        result = resources.Development.fetch_all(self.api, page_size=2)
+        self.assertEqual(
+            [item.get_id() for item in result], [str(i) for i in range(9)],
+        )
+        self.assertEqual(len(responses.calls), 5)
+
+    def test_fetch_all_unordered(self):
+        """Validate yielding the pages as they complete."""
+        self._register_counted_pages(total=9)
+        result = resources.Development.fetch_all(
+            self.api, page_size=2, ordered=False,
+        )
+        self.assertEqual(
+            sorted(item.get_id() for item in result),
+            [str(i) for i in range(9)],
+        )
+
     def test_get_items_development(self):
         """Validate the 'search' endpoint to get all developments and get the
         list of developments from the result.
@@ -282,6 +422,26 @@ class DevelopmentTestCase(base.BaseTestCase):
         development = self._callFUT(self.api, {})
         self.assertIsNone(development.listings())
 
+    def test_listings_search(self):
+        """Validate the listing search reuses the API's listing resource."""
+        data = json.loads(utils.load_fixture('development_en.json'))
+        data['response']['listing_url'] = data['response']['listings_url']
+        development = self._callFUT(self.api, data)
+        responses.add(
+            responses.GET,
+            utils.get_url(self.BASE_URL, 'api/listings/search'),
+            body=utils.load_fixture(
+                'listings-search-sort_on__last_activated-reverse.json',
+            ),
+        )
+        listing_resource = self.api.listing_resource
+        results, batching = development.listings()
+        self.assertEqual(batching['results'], 1732)
+        self.assertIs(self.api.listing_resource, listing_resource)
+        self.assertEqual(len(responses.calls), 1)
+        request = responses.calls[0].request
+        self.assertIn('development_listings=dev-agency__dev001', request.url)
+
     def test_listings_url(self):
         """Validate the deprecated listing search for developments."""
         data = json.loads(utils.load_fixture('development_en.json'))
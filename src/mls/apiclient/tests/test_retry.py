@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Test the retry and circuit breaker policies."""
+
+from collections import namedtuple
+from mls.apiclient import retry
+from mls.apiclient.tests import base
+from mls.apiclient.tests.utils import Clock
+
+
+Response = namedtuple('Response', 'status_code headers')
+
+
+class RetryPolicyTestCase(base.BaseTestCase):
+    """Test the retry policy."""
+
+    def test_can_retry(self):
+        policy = retry.RetryPolicy(total=2)
+        self.assertTrue(policy.can_retry('GET', 0))
+        self.assertTrue(policy.can_retry('get', 1))
+        self.assertFalse(policy.can_retry('GET', 2))
+        self.assertFalse(policy.can_retry('POST', 0))
+
+    def test_retryable_status(self):
+        policy = retry.RetryPolicy()
+        self.assertTrue(policy.is_retryable_status(503))
+        self.assertFalse(policy.is_retryable_status(404))
+        self.assertFalse(policy.is_retryable_status(200))
+
+    def test_backoff(self):
+        policy = retry.RetryPolicy(
+            backoff_factor=0.5, max_backoff=3, jitter=False,
+        )
+        self.assertEqual(policy.get_backoff(0), 0.5)
+        self.assertEqual(policy.get_backoff(1), 1.0)
+        self.assertEqual(policy.get_backoff(2), 2.0)
+        self.assertEqual(policy.get_backoff(3), 3)
+
+    def test_backoff_jitter(self):
+        policy = retry.RetryPolicy(backoff_factor=1, max_backoff=10)
+        for attempt in range(5):
+            delay = policy.get_backoff(attempt)
+            self.assertTrue(0 <= delay <= min(10, 2 ** attempt))
+
+    def test_retry_after(self):
+        policy = retry.RetryPolicy(max_backoff=10, jitter=False)
+        response = Response(503, {'Retry-After': '3'})
+        self.assertEqual(policy.get_delay(0, response), 3)
+        response = Response(503, {'Retry-After': '120'})
+        self.assertIsNone(policy.get_delay(0, response))
+        response = Response(503, {'Retry-After': 'invalid'})
+        self.assertEqual(policy.get_delay(0, response), 0.1)
+        response = Response(
+            503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+        )
+        self.assertEqual(policy.get_delay(0, response), 0)
+        policy = retry.RetryPolicy(jitter=False, respect_retry_after=False)
+        response = Response(503, {'Retry-After': '3'})
+        self.assertEqual(policy.get_delay(0, response), 0.1)
+
+
+class CircuitBreakerTestCase(base.BaseTestCase):
+    """Test the circuit breaker."""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = retry.CircuitBreaker(
+            failure_threshold=2, recovery_timeout=10, clock=self.clock,
+        )
+
+    def test_open(self):
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, retry.CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, retry.CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, retry.CircuitBreaker.CLOSED)
+
+    def test_half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertEqual(self.breaker.state, retry.CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        # Only one probe at a time.
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, retry.CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_failure(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, retry.CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_registry(self):
+        registry = retry.CircuitBreakerRegistry(clock=self.clock)
+        breaker = registry.get('https://demomls.com')
+        self.assertIs(registry.get('https://demomls.com'), breaker)
+        self.assertIsNot(registry.get('https://mirror.demomls.com'), breaker)
+        self.assertEqual(registry.states(), {
+            'https://demomls.com': retry.CircuitBreaker.CLOSED,
+            'https://mirror.demomls.com': retry.CircuitBreaker.CLOSED,
+        })
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Test the priority scheduling of requests."""
+
+from mls.apiclient import api
+from mls.apiclient import exceptions
+from mls.apiclient import executor
+from mls.apiclient import scheduler
+from mls.apiclient.deadline import Deadline
+from mls.apiclient.tests import base
+from mls.apiclient.transport import MemoryTransport
+
+import threading
+import time
+
+
+class PriorityTestCase(base.BaseTestCase):
+    """Thread local priority class test case."""
+
+    def test_priority(self):
+        """Validate setting the priority class of the current thread."""
+        self.assertEqual(scheduler.current(), scheduler.INTERACTIVE)
+        with scheduler.priority(scheduler.BULK):
+            self.assertEqual(scheduler.current(), scheduler.BULK)
+            with scheduler.priority(scheduler.PREFETCH):
+                self.assertEqual(scheduler.current(), scheduler.PREFETCH)
+            self.assertEqual(scheduler.current(), scheduler.BULK)
+        self.assertEqual(scheduler.current(), scheduler.INTERACTIVE)
+
+    def test_unknown(self):
+        """Validate that only known priority classes are accepted."""
+        with self.assertRaises(ValueError):
+            with scheduler.priority('urgent'):
+                pass
+
+    def test_executor(self):
+        """Validate that workers run with the submitter's priority."""
+        workers = executor.Executor(max_workers=1)
+        with scheduler.priority(scheduler.BULK):
+            future = workers.submit(scheduler.current)
+        self.assertEqual(future.result(1), scheduler.BULK)
+        workers.shutdown()
+
+    def test_prefetch(self):
+        """Validate that prefetching runs with the prefetch priority."""
+        def produce():
+            yield scheduler.current()
+
+        self.assertEqual(
+            list(executor.prefetch(produce(), 1)), [scheduler.PREFETCH],
+        )
+        with scheduler.priority(scheduler.BULK):
+            self.assertEqual(
+                list(executor.prefetch(produce(), 1)), [scheduler.BULK],
+            )
+
+
+class PrioritySchedulerTestCase(base.BaseTestCase):
+    """PriorityScheduler test case."""
+
+    def setUp(self):
+        self.scheduler = scheduler.PriorityScheduler(
+            capacity=3, reserved={scheduler.INTERACTIVE: 1},
+        )
+
+    def _start(self, name, started):
+        def request():
+            with self.scheduler.slot(name):
+                started.append(name)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        return thread
+
+    def _wait_for_queue(self, name, depth):
+        for _ in range(100):
+            if self.scheduler.queue_depths()[name] == depth:
+                return
+            time.sleep(0.01)
+        self.fail('Queue of {0} did not reach {1}.'.format(name, depth))
+
+    def test_reserved(self):
+        """Validate that bulk requests leave the reserved slots free."""
+        self.scheduler.acquire(scheduler.BULK)
+        self.scheduler.acquire(scheduler.BULK)
+        started = []
+        thread = self._start(scheduler.BULK, started)
+        self._wait_for_queue(scheduler.BULK, 1)
+        self.scheduler.acquire(scheduler.INTERACTIVE)
+        self.scheduler.release()
+        self.scheduler.release()
+        thread.join(1)
+        self.assertEqual(started, [scheduler.BULK])
+        self.assertEqual(self.scheduler.stats.get('bulk_waited'), 1)
+
+    def test_yield(self):
+        """Validate that waiting higher classes go first."""
+        for _ in range(3):
+            self.scheduler.acquire(scheduler.INTERACTIVE)
+        started = []
+        bulk = self._start(scheduler.BULK, started)
+        self._wait_for_queue(scheduler.BULK, 1)
+        interactive = self._start(scheduler.INTERACTIVE, started)
+        self._wait_for_queue(scheduler.INTERACTIVE, 1)
+        self.assertEqual(self.scheduler.queue_depths(), {
+            scheduler.INTERACTIVE: 1, scheduler.PREFETCH: 0, scheduler.BULK: 1,
+        })
+        # A free slot goes to the interactive request.
+        self.scheduler.release()
+        interactive.join(1)
+        self.assertEqual(started, [scheduler.INTERACTIVE])
+        self.scheduler.release()
+        self.scheduler.release()
+        bulk.join(1)
+        self.assertEqual(started, [scheduler.INTERACTIVE, scheduler.BULK])
+        self.assertGreater(self.scheduler.stats.get('bulk_wait_time'), 0)
+
+    def test_deadline(self):
+        """Validate that queued requests give up at their deadline."""
+        self.scheduler.acquire(scheduler.BULK)
+        self.scheduler.acquire(scheduler.BULK)
+        start = time.time()
+        self.assertRaises(
+            exceptions.DeadlineExceeded,
+            self.scheduler.acquire, scheduler.BULK, Deadline(0.05),
+        )
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(self.scheduler.queue_depths()[scheduler.BULK], 0)
+        self.assertEqual(self.scheduler.stats.get('bulk_waited'), 1)
+        self.assertGreater(self.scheduler.stats.get('bulk_wait_time'), 0)
+        self.assertEqual(self.scheduler._in_flight, 2)
+
+    def test_api(self):
+        """Validate that API requests use the scheduler."""
+        transport = MemoryTransport()
+        path = '/api/rest/v1/developments'
+        transport.add(self.BASE_URL + path, body=u'{}')
+        mls = api.API(
+            self.BASE_URL, transport=transport, scheduler=self.scheduler,
+        )
+        with scheduler.priority(scheduler.BULK):
+            mls.get(path)
+        mls.get(path)
+        self.assertEqual(self.scheduler.stats.get(scheduler.BULK), 1)
+        self.assertEqual(self.scheduler.stats.get(scheduler.INTERACTIVE), 1)
+        self.assertIs(mls.listing_resource.scheduler, self.scheduler)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Test request coalescing."""
+
+from mls.apiclient import api
+from mls.apiclient import exceptions
+from mls.apiclient.deadline import Deadline
+from mls.apiclient.executor import TimeoutError
+from mls.apiclient.singleflight import SingleFlight
+from mls.apiclient.tests import base
+from mls.apiclient.transport import MemoryTransport
+
+import threading
+import time
+
+
+class SingleFlightTestCase(base.BaseTestCase):
+    """SingleFlight test case."""
+
+    def setUp(self):
+        self.flight = SingleFlight()
+
+    def _run_concurrently(self, key, fn, count=5):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(self.flight.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_coalesce(self):
+        """Validate that concurrent calls share one result."""
+        event = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            event.wait(1)
+            return {'items': [1]}
+
+        threads, results, errors = self._run_concurrently('key', fn)
+        while self.flight.stats.get('coalesced') < 4:
+            event.wait(0.01)
+        event.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'items': [1]}] * 5)
+        self.assertEqual(
+            self.flight.stats.as_dict(), {'leaders': 1, 'coalesced': 4},
+        )
+        # Every caller gets its own copy.
+        self.assertEqual(len(set(id(result) for result in results)), 5)
+
+    def test_exception(self):
+        """Validate that the exception of the leader is shared."""
+        event = threading.Event()
+
+        def fn():
+            event.wait(1)
+            raise ValueError('wrong')
+
+        threads, results, errors = self._run_concurrently('key', fn, count=3)
+        while self.flight.stats.get('coalesced') < 2:
+            event.wait(0.01)
+        event.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+
+    def test_wait(self):
+        """Validate that waiting callers can give up."""
+        event = threading.Event()
+
+        def fn():
+            event.wait(1)
+            return 1
+
+        threads, results, errors = self._run_concurrently('key', fn, count=1)
+        while self.flight.stats.get('leaders') < 1:
+            event.wait(0.01)
+        self.assertRaises(
+            TimeoutError, self.flight.do, 'key', fn, wait=0.01,
+        )
+        event.set()
+        threads[0].join()
+        self.assertEqual(results, [1])
+        self.assertEqual(self.flight.stats.get('timeouts'), 1)
+
+    def test_sequential(self):
+        """Validate that finished calls are not shared."""
+        calls = []
+        self.flight.do('key', calls.append, 1)
+        self.flight.do('key', calls.append, 2)
+        self.assertEqual(calls, [1, 2])
+
+
+class APICoalesceTestCase(base.BaseTestCase):
+    """API request coalescing test case."""
+
+    PATH = '/api/rest/v1/developments'
+
+    def test_key(self):
+        """Validate that the parameter order doesn't matter."""
+        transport = MemoryTransport()
+        transport.add(self.BASE_URL + self.PATH, body=u'{}')
+        mls = api.API(self.BASE_URL, api_key='1234', transport=transport)
+        keys = []
+
+        def do(key, fn, *args, **kwargs):
+            keys.append(key)
+            return fn(*args)
+
+        mls.single_flight.do = do
+        mls.get(self.PATH + '?b=2&a=1')
+        mls.get(self.PATH, params={'a': '1', 'b': '2'})
+        self.assertEqual(keys[0], keys[1])
+
+    def test_list_params(self):
+        """Validate that list parameters can be coalesced."""
+        transport = MemoryTransport()
+        transport.add(self.BASE_URL + self.PATH, body=u'{"count": 2}')
+        mls = api.API(self.BASE_URL, transport=transport)
+        result = mls.get(self.PATH, {'ids': ['a', 'b']})
+        self.assertEqual(result['response'], {'count': 2})
+        self.assertEqual(mls.single_flight.stats.get('leaders'), 1)
+
+    def test_deadline(self):
+        """Validate that a waiting request keeps its own deadline."""
+        event = threading.Event()
+        transport = MemoryTransport()
+        transport.add(self.BASE_URL + self.PATH, body=u'{}')
+        send = transport.send
+
+        def slow_send(*args, **kwargs):
+            event.wait(1)
+            return send(*args, **kwargs)
+
+        transport.send = slow_send
+        mls = api.API(self.BASE_URL, transport=transport)
+        leader = threading.Thread(target=mls.get, args=(self.PATH,))
+        leader.start()
+        while mls.single_flight.stats.get('leaders') < 1:
+            event.wait(0.01)
+        start = time.time()
+        with Deadline(0.05):
+            self.assertRaises(
+                exceptions.DeadlineExceeded, mls.get, self.PATH,
+            )
+        self.assertLess(time.time() - start, 0.5)
+        event.set()
+        leader.join()
+
+    def test_disabled(self):
+        """Validate that coalescing can be disabled."""
+        mls = api.API(self.BASE_URL, coalesce=False)
+        self.assertIsNone(mls.single_flight)
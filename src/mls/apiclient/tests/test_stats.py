@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Test the runtime statistics helpers."""
+
+from mls.apiclient import stats
+from mls.apiclient.tests import base
+
+
+class CountersTestCase(base.BaseTestCase):
+    """Test the thread-safe counters."""
+
+    def test_incr(self):
+        counters = stats.Counters()
+        self.assertEqual(counters.get('requests'), 0)
+        counters.incr('requests')
+        counters.incr('requests')
+        counters.incr('bytes', 512)
+        self.assertEqual(counters.get('requests'), 2)
+        self.assertEqual(counters.as_dict(), {'requests': 2, 'bytes': 512})
+
+    def test_reset(self):
+        counters = stats.Counters()
+        counters.incr('requests')
+        counters.reset()
+        self.assertEqual(counters.as_dict(), {})
@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+"""Test the HTTP transports."""
+
+from mls.apiclient import api
+from mls.apiclient import deadline
+from mls.apiclient import dns
+from mls.apiclient import exceptions
+from mls.apiclient import retry
+from mls.apiclient import transport
+from mls.apiclient.client import ListingResource
+from mls.apiclient.tests import base
+from mls.apiclient.tests import utils
+
+import json
+import requests
+import responses
+import socket
+import threading
+import time
+
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+
+
+class MLSStubServer(ThreadingMixIn, HTTPServer):
+    """Local MLS stub, handling every connection in its own thread."""
+
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        return ThreadingMixIn.process_request(self, request, client_address)
+
+
+class MLSStubHandler(BaseHTTPRequestHandler):
+    """Serve the fixture of a development list, gzip compressed."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/redirect'):
+            self.send_response(302)
+            self.send_header('Location', '/redirect')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if not self.path.startswith('/api/rest/v1/developments'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = utils.gzip_content(
+            utils.load_fixture('development_list_1.json'),
+        )
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-MLS-Path', self.path)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RequestsTransportTestCase(base.BaseTestCase):
+    """Test the requests based transport."""
+
+    PATH = '/api/listings/categories'
+
+    def setUp(self):
+        responses.start()
+        self.transport = transport.RequestsTransport()
+
+    def tearDown(self):
+        responses.stop()
+        responses.reset()
+
+    def test_request(self):
+        """Validate sending a request through the pooled session."""
+        responses.add(responses.GET, self.URL, body=u'{}', status=200)
+        session = self.transport.session
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(self.transport.session, session)
+
+    def _register_bad_certificate(self):
+        """Fail every verified request with an SSL error."""
+        verify = []
+
+        def callback(request):
+            verify.append(request.req_kwargs['verify'])
+            if request.req_kwargs['verify'] is not False:
+                raise requests.exceptions.SSLError('bad certificate')
+            return (200, {}, u'{}')
+
+        responses.add_callback(responses.GET, self.URL, callback=callback)
+        return verify
+
+    def test_ssl_fallback(self):
+        """Validate the retry without SSL verification."""
+        verify = self._register_bad_certificate()
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(verify), 2)
+        self.assertFalse(verify[1])
+        self.assertEqual(self.transport.stats.get('ssl_fallback'), 1)
+        self.assertEqual(self.transport.unverified_hosts, set([self.BASE_URL]))
+
+    def test_ssl_fallback_remembered(self):
+        """Validate that later requests skip the failing verification."""
+        verify = self._register_bad_certificate()
+        self.transport.request('GET', self.URL)
+        self.transport.request('GET', self.URL)
+        self.assertEqual(len(verify), 3)
+        self.assertFalse(verify[2])
+        self.assertEqual(self.transport.stats.get('ssl_fallback'), 1)
+
+    def test_ssl_verify_strict(self):
+        """Validate that a configured verification never falls back."""
+        self._register_bad_certificate()
+        self.transport.verify = True
+        self.assertRaises(
+            requests.exceptions.SSLError,
+            self.transport.request, 'GET', self.URL,
+        )
+        self.assertEqual(self.transport.unverified_hosts, set())
+
+    def test_ssl_verify_disabled(self):
+        """Validate the explicit opt-out of the verification."""
+        verify = self._register_bad_certificate()
+        self.transport.verify = False
+        self.transport.request('GET', self.URL)
+        self.assertEqual(verify, [False])
+        self.assertEqual(self.transport.stats.get('ssl_fallback'), 0)
+
+    def test_ssl_fingerprint(self):
+        """Validate the pinning of the certificate fingerprint."""
+        fingerprint = 'AA:BB:CC'
+        pinned = transport.RequestsTransport(fingerprint=fingerprint)
+        adapter = pinned.session.get_adapter(self.BASE_URL)
+        self.assertIsInstance(adapter, transport.FingerprintAdapter)
+        self.assertEqual(
+            adapter.poolmanager.connection_pool_kw['assert_fingerprint'],
+            fingerprint,
+        )
+        self.assertFalse(pinned._get_verify(self.BASE_URL))
+
+    def test_close(self):
+        """Validate that closing the transport drops the session."""
+        session = self.transport.session
+        self.transport.close()
+        self.assertIsNot(self.transport.session, session)
+
+    def test_shared_with_api(self):
+        """Validate that the API and listing resource share the transport."""
+        mls = api.API(self.BASE_URL, api_key='YOUR_API_KEY')
+        listing_resource = mls.listing_resource
+        self.assertIsInstance(listing_resource, ListingResource)
+        self.assertIs(listing_resource._transport, mls.transport)
+        self.assertIs(mls.listing_resource, listing_resource)
+
+    def test_listing_resource(self):
+        """Validate the legacy listing client using a shared transport."""
+        responses.add(
+            responses.GET,
+            utils.get_url(self.URL, 'view_types'),
+            body=utils.load_fixture('category_view_types_en.json'),
+        )
+        client = ListingResource(self.BASE_URL, transport=self.transport)
+        category = client.category('view_types')
+        self.assertEqual(category, [('beach_view', 'Beach View')])
+
+    def test_accept_encoding(self):
+        """Validate the negotiation of compressed responses."""
+        responses.add(responses.GET, self.URL, body=u'{}', status=200)
+        self.transport.request('GET', self.URL)
+        headers = responses.calls[0].request.headers
+        self.assertIn('gzip', headers['Accept-Encoding'])
+        self.assertIn('deflate', headers['Accept-Encoding'])
+
+    def test_compressed_response(self):
+        """Validate the decoding of compressed responses and byte counts."""
+        content = utils.load_fixture('development_list_1.json')
+        compressed = utils.gzip_content(content)
+        responses.add(
+            responses.GET,
+            self.URL,
+            body=compressed,
+            adding_headers={'Content-Encoding': 'gzip'},
+            status=200,
+        )
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.content, content)
+        self.assertEqual(response.wire_size, len(compressed))
+        self.assertEqual(response.decoded_size, len(content))
+        self.assertLess(response.wire_size, response.decoded_size)
+        self.assertEqual(self.transport.stats.get('requests'), 1)
+        self.assertEqual(
+            self.transport.stats.get('bytes_wire'), len(compressed),
+        )
+        self.assertEqual(
+            self.transport.stats.get('bytes_decoded'), len(content),
+        )
+
+    def test_retry_server_error(self):
+        """Validate retrying a GET after a server error."""
+        responses.add(responses.GET, self.URL, status=503)
+        responses.add(responses.GET, self.URL, body=u'{}', status=200)
+        self.transport.retry = retry.RetryPolicy(total=2, jitter=False)
+        delays = []
+        self.transport.sleep = delays.append
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(responses.calls), 2)
+        self.assertEqual(delays, [0.1])
+        self.assertEqual(self.transport.stats.get('retries'), 1)
+
+    def test_retry_exhausted(self):
+        """Validate that the last response is returned after all retries."""
+        responses.add(responses.GET, self.URL, status=500)
+        self.transport.retry = retry.RetryPolicy(total=2)
+        self.transport.sleep = lambda delay: None
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(responses.calls), 3)
+
+    def test_retry_connection_error(self):
+        """Validate retrying a GET after a connection error."""
+        responses.add(
+            responses.GET,
+            self.URL,
+            body=requests.exceptions.ConnectionError('refused'),
+        )
+        responses.add(responses.GET, self.URL, body=u'{}', status=200)
+        self.transport.retry = retry.RetryPolicy(total=1)
+        self.transport.sleep = lambda delay: None
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_retry_post(self):
+        """Validate that non-idempotent requests are not retried."""
+        responses.add(responses.POST, self.URL, status=503)
+        self.transport.retry = retry.RetryPolicy(total=2)
+        response = self.transport.request('POST', self.URL)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(responses.calls), 1)
+
+    def test_circuit_breaker(self):
+        """Validate failing fast while the circuit is open."""
+        responses.add(responses.GET, self.URL, status=503)
+        self.transport.circuit_breakers = retry.CircuitBreakerRegistry(
+            failure_threshold=2,
+        )
+        self.transport.request('GET', self.URL)
+        self.transport.request('GET', self.URL)
+        self.assertRaises(
+            exceptions.CircuitOpenError,
+            self.transport.request, 'GET', self.URL,
+        )
+        self.assertEqual(len(responses.calls), 2)
+        self.assertEqual(self.transport.stats.get('circuit_open'), 1)
+
+    def test_circuit_breaker_probe_error(self):
+        """Validate that a failing probe doesn't block the circuit."""
+        self.transport.circuit_breakers = retry.CircuitBreakerRegistry(
+            failure_threshold=1, recovery_timeout=0,
+        )
+        outcomes = [(503, {}, u''), requests.exceptions.ChunkedEncodingError()]
+
+        def callback(request):
+            outcome = outcomes.pop(0) if outcomes else (200, {}, u'{}')
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        responses.add_callback(responses.GET, self.URL, callback=callback)
+        self.transport.request('GET', self.URL)
+        self.assertRaises(
+            requests.exceptions.ChunkedEncodingError,
+            self.transport.request, 'GET', self.URL,
+        )
+        response = self.transport.request('GET', self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.transport.stats.get('circuit_open'), 0)
+
+    def test_deadline_timeout(self):
+        """Validate that the deadline limits the request timeout."""
+        timeouts = []
+
+        def callback(request):
+            timeouts.append(request.req_kwargs['timeout'])
+            return (200, {}, u'{}')
+
+        responses.add_callback(responses.GET, self.URL, callback=callback)
+        budget = deadline.Deadline(1)
+        self.transport.request(
+            'GET', self.URL, timeout=(3, 30), deadline=budget,
+        )
+        connect, read = timeouts[0]
+        self.assertTrue(0 < connect <= 1)
+        self.assertTrue(0 < read <= 1)
+
+        with deadline.Deadline(60):
+            self.transport.request('GET', self.URL, timeout=(3, 30))
+        self.assertEqual(timeouts[1], (3, 30))
+
+    def test_deadline_exceeded(self):
+        """Validate failing fast once the deadline is spent."""
+        responses.add(responses.GET, self.URL, body=u'{}', status=200)
+        budget = deadline.Deadline(0)
+        self.assertRaises(
+            exceptions.DeadlineExceeded,
+            self.transport.request, 'GET', self.URL, deadline=budget,
+        )
+        self.assertEqual(len(responses.calls), 0)
+
+    def test_deadline_skips_retry(self):
+        """Validate that no retry is made which can not finish in time."""
+        responses.add(responses.GET, self.URL, status=503)
+        self.transport.retry = retry.RetryPolicy(
+            total=3, backoff_factor=10, max_backoff=10, jitter=False,
+        )
+        budget = deadline.Deadline(5)
+        response = self.transport.request('GET', self.URL, deadline=budget)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(responses.calls), 1)
+
+
+class HTTP2TransportTestCase(base.BaseTestCase):
+    """Test the optional HTTP/2 transport."""
+
+    class FakeHTTP20Adapter(requests.adapters.HTTPAdapter):
+        """Stand-in for ``hyper.contrib.HTTP20Adapter``."""
+
+    def setUp(self):
+        self._adapter = transport.HTTP20Adapter
+
+    def tearDown(self):
+        transport.HTTP20Adapter = self._adapter
+
+    def test_http2(self):
+        """Validate mounting the HTTP/2 adapter for HTTPS requests."""
+        transport.HTTP20Adapter = self.FakeHTTP20Adapter
+        mls = api.API(self.BASE_URL, http2=True)
+        self.assertTrue(mls.transport.uses_http2)
+        self.assertIsInstance(
+            mls.session.get_adapter(self.BASE_URL), self.FakeHTTP20Adapter,
+        )
+
+    def test_http2_fallback(self):
+        """Validate the fallback to HTTP/1.1 without HTTP/2 support."""
+        transport.HTTP20Adapter = None
+        mls = api.API(self.BASE_URL, http2=True)
+        self.assertFalse(mls.transport.uses_http2)
+        self.assertIsInstance(
+            mls.session.get_adapter(self.BASE_URL),
+            requests.adapters.HTTPAdapter,
+        )
+
+    def test_http2_fingerprint(self):
+        """Validate that certificate pinning disables HTTP/2."""
+        transport.HTTP20Adapter = self.FakeHTTP20Adapter
+        pinned = transport.RequestsTransport(
+            http2=True, fingerprint='AA:BB:CC',
+        )
+        self.assertFalse(pinned.uses_http2)
+        self.assertIsInstance(
+            pinned.session.get_adapter(self.BASE_URL),
+            transport.FingerprintAdapter,
+        )
+
+    def test_http1(self):
+        """Validate that HTTP/2 is not used unless configured."""
+        transport.HTTP20Adapter = self.FakeHTTP20Adapter
+        mls = api.API(self.BASE_URL)
+        self.assertFalse(mls.transport.uses_http2)
+
+
+class StubServerTestCase(base.BaseTestCase):
+    """Base class for tests against a local MLS stub."""
+
+    def setUp(self):
+        self.server = MLSStubServer(('127.0.0.1', 0), MLSStubHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.base_url = 'http://127.0.0.1:{0}'.format(self.server.server_port)
+        self.url = self.base_url + '/api/rest/v1/developments'
+        self.transport = self._create_transport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _create_transport(self, **kwargs):
+        raise NotImplementedError
+
+
+class Urllib3TransportTestCase(StubServerTestCase):
+    """Test the urllib3 based transport against a local MLS stub."""
+
+    def _create_transport(self, **kwargs):
+        return transport.Urllib3Transport(**kwargs)
+
+    def test_request(self):
+        """Validate sending a request and decoding the response."""
+        content = utils.load_fixture('development_list_1.json')
+        response = self.transport.request(
+            'GET',
+            self.base_url + '/api/rest/v1/developments',
+            params={'lang': 'en'},
+            timeout=(1, 5),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.reason, 'OK')
+        self.assertEqual(response.content, content)
+        self.assertEqual(response.json(), json.loads(content))
+        self.assertEqual(response.decoded_size, len(content))
+        self.assertLess(response.wire_size, response.decoded_size)
+        self.assertEqual(
+            response.headers['x-mls-path'],
+            '/api/rest/v1/developments?lang=en',
+        )
+
+    def test_api(self):
+        """Validate the API using the urllib3 transport."""
+        mls = api.API(self.base_url, lang='en', transport=self.transport)
+        result = mls.get('api/rest/v1/developments')
+        self.assertEqual(
+            result, json.loads(utils.load_fixture('development_list_1.json')),
+        )
+        self.assertRaises(
+            exceptions.ResourceNotFound,
+            mls.get, 'api/rest/v1/unknown',
+        )
+        self.assertEqual(self.transport.stats.get('requests'), 2)
+
+    def test_connection_error(self):
+        """Validate that connection errors raise requests exceptions."""
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        url = 'http://127.0.0.1:{0}'.format(sock.getsockname()[1])
+        sock.close()
+        self.assertRaises(
+            requests.exceptions.ConnectionError,
+            self.transport.request, 'GET', url, timeout=1,
+        )
+
+    def test_redirect_loop(self):
+        """Validate that the number of redirects is limited."""
+        self.assertRaises(
+            requests.exceptions.TooManyRedirects,
+            self.transport.request, 'GET', self.base_url + '/redirect',
+            timeout=1,
+        )
+
+
+class MemoryTransportTestCase(base.BaseTestCase):
+    """Test the in-memory transport."""
+
+    PATH = '/api/rest/v1/developments'
+
+    def setUp(self):
+        self.transport = transport.MemoryTransport()
+        self.api = api.API(
+            self.BASE_URL, api_key='YOUR_API_KEY', transport=self.transport,
+        )
+
+    def test_api(self):
+        """Validate serving API requests from memory."""
+        self.transport.add(self.URL, body=u'{"some": "content"}')
+        result = self.api.get(self.PATH)
+        self.assertEqual(result['response'], {'some': 'content'})
+        self.assertEqual(
+            self.transport.calls,
+            [('GET', self.URL + '?apikey=YOUR_API_KEY')],
+        )
+
+    def test_not_found(self):
+        """Validate the 404 response for unknown URLs."""
+        self.assertRaises(
+            exceptions.ResourceNotFound,
+            self.api.get, self.PATH,
+        )
+
+    def test_listing_resource(self):
+        """Validate the legacy listing client using the memory transport."""
+        self.transport.add(
+            utils.get_url(self.BASE_URL, 'api/listings/categories/view_types'),
+            body=utils.load_fixture('category_view_types_en.json'),
+        )
+        category = self.api.listing_resource.category('view_types')
+        self.assertEqual(category, [('beach_view', 'Beach View')])
+
+
+class WarmupTestCase(StubServerTestCase):
+    """Test opening pooled connections ahead of the first request."""
+
+    def _create_transport(self, **kwargs):
+        return transport.RequestsTransport(**kwargs)
+
+    def _wait_for_connections(self, count):
+        for _ in range(100):
+            if self.server.connections >= count:
+                break
+            time.sleep(0.01)
+
+    def test_warmup(self):
+        """Validate that requests reuse the warmed up connections."""
+        mls = api.API(self.base_url, transport=self.transport)
+        self.assertEqual(mls.warmup(connections=3), 3)
+        self.assertEqual(mls.warmup(connections=3), 0)
+        self._wait_for_connections(3)
+        self.assertEqual(self.server.connections, 3)
+        mls.get('api/rest/v1/developments')
+        mls.get('api/rest/v1/developments')
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(self.transport.stats.get('warmed_connections'), 3)
+
+    def test_warmup_urllib3(self):
+        """Validate the warmup of the urllib3 transport."""
+        self.transport = transport.Urllib3Transport()
+        self.assertEqual(self.transport.warmup(self.url, connections=2), 2)
+        self.transport.request('GET', self.url)
+        self._wait_for_connections(2)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_warmup_memory(self):
+        """Validate that the warmup is a no-op without connection pools."""
+        memory = transport.MemoryTransport()
+        self.assertEqual(memory.warmup(self.url, connections=2), 0)
+
+    def test_warmup_max_pool_size(self):
+        """Validate that no more connections are opened than pooled."""
+        self.transport = transport.RequestsTransport(pool_maxsize=2)
+        self.assertEqual(self.transport.warmup(self.url, connections=5), 2)
+
+    def test_dns_cache(self):
+        """Validate resolving the host using the DNS cache."""
+        lookups = []
+
+        def resolver(host, port, family, type):
+            lookups.append(host)
+            return [(socket.AF_INET, type, 6, '', ('127.0.0.1', port))]
+
+        cache = dns.DNSCache(resolver=resolver)
+        self.transport = transport.RequestsTransport(dns_cache=cache)
+        url = 'http://mls.example:{0}/api/rest/v1/developments'.format(
+            self.server.server_port,
+        )
+        self.transport.warmup(url, connections=2)
+        response = self.transport.request('GET', url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups, ['mls.example'])
+        self.assertEqual(cache.stats.get('misses'), 1)
+        self.assertEqual(cache.stats.get('hits'), 2)
+
+    def test_keep_warm(self):
+        """Validate keeping idle connections open in the background."""
+        self.transport.keep_warm(self.url, connections=2, interval=0.01)
+        self._wait_for_connections(2)
+        self.assertEqual(self.server.connections, 2)
+        self.transport.close()
+        self.assertEqual(self.transport._keep_warm, [])
@@ -28,3 +28,16 @@ class TestUtils(base.BaseTestCase):
 
         result = utils.extract_headers(headers, 'prefix3')
         self.assertEqual(result, {})
+
+    def test_get_count(self):
+        headers = {'CountTotal': '26', 'CountLimit': 'all'}
+        self.assertEqual(utils.get_count(headers, 'CountTotal'), 26)
+        self.assertIsNone(utils.get_count(headers, 'CountLimit'))
+        self.assertEqual(utils.get_count(headers, 'CountOffset', 0), 0)
+
+    def test_get_page_offsets(self):
+        headers = {'CountTotal': 60, 'CountLimit': 25, 'CountOffset': 0}
+        self.assertEqual(utils.get_page_offsets(headers), [25, 50])
+        headers['CountOffset'] = 50
+        self.assertEqual(utils.get_page_offsets(headers), [])
+        self.assertEqual(utils.get_page_offsets({}), [])
@@ -2,6 +2,8 @@
 """Several test utils."""
 
 # python imports
+import gzip
+import io
 import os
 
 
@@ -25,6 +27,14 @@ def load_fixture(name):
     return fixture.read()
 
 
+def gzip_content(content):
+    """Return the gzip compressed content."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(content)
+    return buf.getvalue()
+
+
 def wrap_content(content, status_code=200, headers={}):
     """Wrap content into JSON structure.
 
@@ -38,6 +48,21 @@ def wrap_content(content, status_code=200, headers={}):
     )
 
 
+class Clock(object):
+    """Manually advanced clock, also advanced by sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
 def setup_fixtures():
     """Register fixtures for the MLS API."""
     from mls.apiclient import testing
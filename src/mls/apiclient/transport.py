@@ -0,0 +1,743 @@
+# -*- coding: utf-8 -*-
+"""HTTP transports shared by the REST API and the legacy listing client.
+
+A transport sends a request and returns a :class:`Response` with the status,
+the headers and the decoded body. :class:`Transport` implements everything
+which does not depend on the HTTP library (retries, circuit breakers,
+deadlines, TLS fallback and statistics), the subclasses implement ``send``:
+
+:class:`RequestsTransport`
+    Based on a ``requests`` session (the default).
+:class:`Urllib3Transport`
+    Talks to ``urllib3`` directly, avoiding the per request overhead of
+    ``requests`` (hooks, adapters, cookies, URL re-parsing).
+:class:`MemoryTransport`
+    Serves registered responses from memory, e.g. for tests or to measure
+    the overhead of the client itself.
+
+All transports raise the ``requests.exceptions`` for connection errors.
+"""
+
+from mls.apiclient import deadline as deadlines
+from mls.apiclient import dns
+from mls.apiclient import exceptions
+from mls.apiclient import PRODUCT_NAME
+from mls.apiclient.stats import Counters
+
+import json
+import logging
+import requests
+import socket
+import threading
+import time
+import urllib3
+
+
+try:
+    from http.client import responses as HTTP_REASONS
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from httplib import responses as HTTP_REASONS
+    from cookielib import DefaultCookiePolicy
+
+try:
+    from urllib.parse import urlencode
+    from urllib.parse import urlsplit
+except ImportError:
+    from urllib import urlencode
+    from urlparse import urlsplit
+
+try:
+    import brotli  # noqa
+except ImportError:
+    HAS_BROTLI = False
+else:
+    HAS_BROTLI = True
+
+try:
+    from hyper.contrib import HTTP20Adapter
+except ImportError:
+    HTTP20Adapter = None
+
+
+logger = logging.getLogger(PRODUCT_NAME)
+
+#: Size of the chunks read from the socket while decoding a response body.
+CHUNK_SIZE = 64 * 1024
+
+
+def accept_encoding():
+    """Return the content codings the transports are able to decode."""
+    encodings = ['gzip', 'deflate']
+    if HAS_BROTLI:
+        encodings.append('br')
+    return ', '.join(encodings)
+
+
+def get_base_url(url):
+    """Return the scheme and host part of ``url``."""
+    parts = urlsplit(url)
+    return '{0}://{1}'.format(parts.scheme, parts.netloc)
+
+
+def build_url(url, params=None):
+    """Append the encoded ``params`` to the query string of ``url``."""
+    if not params:
+        return url
+    separator = '&' if '?' in url else '?'
+    return url + separator + urlencode(params)
+
+
+def read_body(raw):
+    """Read and decompress a streamed ``urllib3`` response body.
+
+    The body is decompressed chunk by chunk while it is read from the socket.
+    Returns a tuple of the decoded body and the number of bytes received.
+    """
+    chunks = []
+    try:
+        for chunk in raw.stream(CHUNK_SIZE, decode_content=True):
+            chunks.append(chunk)
+    except urllib3.exceptions.DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e)
+    except urllib3.exceptions.ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+    except urllib3.exceptions.ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e)
+    return b''.join(chunks), raw.tell()
+
+
+def fill_pool(pool, count):
+    """Open connections in an ``urllib3`` connection pool.
+
+    Makes sure that up to ``count`` idle, connected connections are
+    available in ``pool``. Returns the number of newly opened connections.
+    """
+    connections = []
+    opened = 0
+    try:
+        for _ in range(min(count, pool.pool.maxsize)):
+            try:
+                connection = pool._get_conn(timeout=0)
+            except urllib3.exceptions.EmptyPoolError:
+                break
+            connections.append(connection)
+            if connection.sock is None:
+                connection.connect()
+                opened += 1
+    except (socket.error, urllib3.exceptions.HTTPError) as e:
+        raise requests.exceptions.ConnectionError(e)
+    finally:
+        for connection in connections:
+            pool._put_conn(connection)
+    return opened
+
+
+class Response(object):
+    """The response of a transport.
+
+    ``wire_size`` is the number of bytes received, ``decoded_size`` the size
+    of the decompressed body.
+    """
+
+    def __init__(
+        self, status_code, content=b'', headers=None, url=None, reason=None,
+        wire_size=None,
+    ):
+        self.status_code = status_code
+        self.content = content
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.url = url
+        if reason is None:
+            reason = HTTP_REASONS.get(status_code)
+        self.reason = reason
+        self.wire_size = len(content) if wire_size is None else wire_size
+
+    def __repr__(self):
+        return '<Response [{0}]>'.format(self.status_code)
+
+    @property
+    def decoded_size(self):
+        return len(self.content)
+
+    def json(self):
+        """Return the decoded JSON body."""
+        return json.loads(self.content.decode('utf-8'))
+
+    def close(self):
+        """Release the response, the body is already read."""
+        pass
+
+
+class Transport(object):
+    """Base class for transports.
+
+    One transport can be shared by several :class:`mls.apiclient.api.API`
+    and :class:`mls.apiclient.client.ResourceBase` objects and between
+    threads, so that all of them reuse the same warm connections.
+
+    Responses are requested compressed. The totals of received and decoded
+    bytes are kept in ``stats``, together with the number of requests and
+    the time spent sending them (``request_time``).
+
+    Failed requests are retried according to the optional ``retry`` policy
+    (see :class:`mls.apiclient.retry.RetryPolicy`). With a
+    :class:`mls.apiclient.retry.CircuitBreakerRegistry` as
+    ``circuit_breakers``, requests to an unhealthy MLS host fail fast with
+    :class:`mls.apiclient.exceptions.CircuitOpenError`.
+
+    TLS certificates are verified according to ``verify``:
+
+    ``None`` (default)
+        Verify the certificate. If the verification fails for a host, the
+        request is sent again without verification and the host is
+        remembered, so that later requests go unverified right away. The
+        number of fallbacks is counted as ``ssl_fallback`` in ``stats``.
+    ``True`` or the path to a CA bundle
+        Always verify the certificate and never fall back.
+    ``False``
+        Never verify the certificate.
+
+    Alternatively, the SHA-256 (or SHA-1) ``fingerprint`` of the MLS
+    certificate can be pinned, which replaces the CA based verification.
+
+    With a :class:`mls.apiclient.dns.DNSCache` as ``dns_cache``, new
+    connections use the cached host addresses instead of resolving the host
+    every time.
+    """
+
+    def __init__(
+        self, retry=None, circuit_breakers=None, verify=None, fingerprint=None,
+        dns_cache=None,
+    ):
+        self.retry = retry
+        self.circuit_breakers = circuit_breakers
+        self.verify = verify
+        self.fingerprint = fingerprint
+        self.dns_cache = dns_cache
+        self.stats = Counters()
+        self.sleep = time.sleep
+        self._unverified_hosts = set()
+        self._keep_warm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close all pooled connections and stop keeping them warm.
+
+        The transport stays usable, new connections are opened on the next
+        request.
+        """
+        self._stop_keep_warm()
+
+    def _stop_keep_warm(self):
+        keep_warm, self._keep_warm = self._keep_warm, []
+        for stop in keep_warm:
+            stop.set()
+
+    def get_pool(self, url, verify=True):
+        """Return the ``urllib3`` connection pool used for ``url``.
+
+        Returns ``None`` if the transport does not pool connections.
+        """
+        return None
+
+    def warmup(self, url, connections=1):
+        """Resolve the host of ``url`` and open pooled connections to it.
+
+        Returns the number of newly opened connections.
+        """
+        base_url = get_base_url(url)
+        if self.dns_cache is not None:
+            parts = urlsplit(base_url)
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+            try:
+                self.dns_cache.resolve(parts.hostname, port)
+            except socket.error as e:
+                raise requests.exceptions.ConnectionError(e)
+        pool = self.get_pool(base_url, verify=self._get_verify(base_url))
+        if pool is None:
+            return 0
+        opened = fill_pool(pool, connections)
+        self.stats.incr('warmed_connections', opened)
+        return opened
+
+    def keep_warm(self, url, connections=1, interval=30.0):
+        """Keep at least ``connections`` idle connections to ``url`` open.
+
+        A background thread checks the pool every ``interval`` seconds and
+        opens new connections where needed, until the transport is closed.
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.warmup(url, connections)
+                except Exception as e:
+                    logger.warning(
+                        'Keeping connections to {0} warm failed: {1}'.format(
+                            url, e,
+                        )
+                    )
+
+        self._keep_warm.append(stop)
+        thread = threading.Thread(target=run, name='mls-keep-warm')
+        thread.daemon = True
+        thread.start()
+
+    def send(
+        self, method, url, params=None, headers=None, data=None,
+        timeout=None, verify=True,
+    ):
+        """Send a single request and return a :class:`Response`."""
+        raise NotImplementedError
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """Send a request and return a :class:`Response`.
+
+        ``kwargs`` are passed to ``send``. Connection errors and responses
+        with a retryable status code are retried as long as the retry policy
+        allows it. With a ``deadline`` (or an active
+        :class:`mls.apiclient.deadline.Deadline`), the timeout of every
+        attempt is limited to the remaining time and no retry is made which
+        could not finish in time.
+        """
+        if deadline is None:
+            deadline = deadlines.current()
+        timeout = kwargs.pop('timeout', None)
+        breaker = None
+        if self.circuit_breakers is not None:
+            breaker = self.circuit_breakers.get(get_base_url(url))
+        attempt = 0
+        while True:
+            if deadline is not None:
+                deadline.check(url)
+                kwargs['timeout'] = deadline.clamp(timeout)
+            else:
+                kwargs['timeout'] = timeout
+            if breaker is not None and not breaker.allow():
+                self.stats.incr('circuit_open')
+                raise exceptions.CircuitOpenError(
+                    503, 'Circuit open', get_base_url(url),
+                )
+            try:
+                response = self._send(method, url, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ):
+                if breaker is not None:
+                    breaker.record_failure()
+                delay = None
+                if self._can_retry(method, attempt):
+                    delay = self.retry.get_delay(attempt)
+                if not self._in_time(delay, deadline):
+                    raise
+            except BaseException:
+                # Any other error (e.g. while reading the body) must not
+                # leave a half open circuit waiting for its probe forever.
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            else:
+                failed = response.status_code >= 500
+                if breaker is not None:
+                    if failed:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                delay = None
+                if (self._can_retry(method, attempt) and
+                        self.retry.is_retryable_status(response.status_code)):
+                    delay = self.retry.get_delay(attempt, response)
+                if not self._in_time(delay, deadline):
+                    return response
+                response.close()
+            self.stats.incr('retries')
+            self.sleep(delay)
+            attempt += 1
+
+    def _can_retry(self, method, attempt):
+        return self.retry is not None and self.retry.can_retry(method, attempt)
+
+    def _in_time(self, delay, deadline):
+        """Return if a retry after ``delay`` seconds fits into the deadline."""
+        if delay is None:
+            return False
+        return deadline is None or delay < deadline.remaining()
+
+    @property
+    def unverified_hosts(self):
+        """Return the hosts which failed the TLS verification."""
+        return frozenset(self._unverified_hosts)
+
+    def _get_verify(self, base_url):
+        """Return the TLS verification setting for requests to a host."""
+        if self.fingerprint:
+            # The pinned fingerprint is checked by the connection instead.
+            return False
+        if self.verify is not None:
+            return self.verify
+        return base_url not in self._unverified_hosts
+
+    def _send(self, method, url, **kwargs):
+        """Send a single request, fall back to an unverified TLS connection.
+        """
+        base_url = get_base_url(url)
+        verify = self._get_verify(base_url)
+        try:
+            return self._timed_send(method, url, verify=verify, **kwargs)
+        except requests.exceptions.SSLError:
+            if verify is not True or self.verify is not None:
+                raise
+        self._unverified_hosts.add(base_url)
+        self.stats.incr('ssl_fallback')
+        logger.warning(
+            'SSL verification for {0} failed, '
+            'continuing without verification.'.format(base_url)
+        )
+        return self._timed_send(method, url, verify=False, **kwargs)
+
+    def _timed_send(self, method, url, **kwargs):
+        start = time.time()
+        response = self.send(method, url, **kwargs)
+        self.stats.incr('requests')
+        self.stats.incr('request_time', time.time() - start)
+        self.stats.incr('bytes_wire', response.wire_size)
+        self.stats.incr('bytes_decoded', response.decoded_size)
+        return response
+
+
+class FingerprintAdapter(requests.adapters.HTTPAdapter):
+    """HTTP adapter accepting only certificates with a pinned fingerprint."""
+
+    def __init__(self, fingerprint, **kwargs):
+        self.fingerprint = fingerprint
+        super(FingerprintAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['assert_fingerprint'] = self.fingerprint
+        return super(FingerprintAdapter, self).init_poolmanager(
+            *args, **kwargs
+        )
+
+
+class RequestsTransport(Transport):
+    """Connection pooling transport based on a ``requests`` session.
+
+    ``pool_connections`` is the number of per-host connection pools to keep,
+    ``pool_maxsize`` the maximum number of connections kept alive per host.
+    With ``pool_block`` set, no more than ``pool_maxsize`` connections per
+    host are opened at any time.
+
+    With ``http2`` set, HTTPS requests are multiplexed over a single HTTP/2
+    connection per host. This requires the optional ``hyper`` package
+    (``pip install mls.apiclient[http2]``); without it, the transport falls
+    back to the pooled HTTP/1.1 connections. Certificate pinning is only
+    supported for HTTP/1.1, so a ``fingerprint`` disables HTTP/2.
+    """
+
+    def __init__(
+        self, pool_connections=10, pool_maxsize=10, pool_block=False,
+        http2=False, **kwargs
+    ):
+        super(RequestsTransport, self).__init__(**kwargs)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.http2 = http2
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Return the connection pooling session, create it if needed."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        """Create a keep-alive session which is safe to share between threads.
+
+        The MLS API does not use cookies, so the cookie jar (the only part of
+        the session mutated while sending) is disabled.
+        """
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.headers['Accept-Encoding'] = accept_encoding()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        https_adapter = self._create_https_adapter() or adapter
+        if self.dns_cache is not None:
+            pool_classes = dns.pool_classes_by_scheme(self.dns_cache)
+            for item in (adapter, https_adapter):
+                if isinstance(item, requests.adapters.HTTPAdapter):
+                    item.poolmanager.pool_classes_by_scheme = pool_classes
+        session.mount('https://', https_adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _create_https_adapter(self):
+        """Return a special adapter for HTTPS requests, if configured."""
+        if self.http2 and self.fingerprint:
+            logger.warning(
+                'Certificate pinning is not supported with HTTP/2, '
+                'falling back to HTTP/1.1.'
+            )
+        elif self.http2:
+            if HTTP20Adapter is not None:
+                return HTTP20Adapter()
+            logger.warning(
+                'HTTP/2 requires the "hyper" package, '
+                'falling back to HTTP/1.1.'
+            )
+        if self.fingerprint:
+            return FingerprintAdapter(
+                self.fingerprint,
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                pool_block=self.pool_block,
+            )
+
+    @property
+    def uses_http2(self):
+        """Return if HTTPS requests are sent using HTTP/2."""
+        return (
+            HTTP20Adapter is not None and
+            isinstance(self.session.get_adapter('https://'), HTTP20Adapter)
+        )
+
+    def get_pool(self, url, verify=True):
+        adapter = self.session.get_adapter(url)
+        if not isinstance(adapter, requests.adapters.HTTPAdapter):
+            return None
+        pool = adapter.get_connection(url)
+        adapter.cert_verify(pool, url, verify, None)
+        return pool
+
+    def close(self):
+        super(RequestsTransport, self).close()
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def send(
+        self, method, url, params=None, headers=None, data=None,
+        timeout=None, verify=True,
+    ):
+        response = self.session.request(
+            method,
+            url,
+            params=params,
+            headers=headers,
+            data=data,
+            timeout=timeout,
+            verify=verify,
+            stream=True,
+        )
+        raw = response.raw
+        if hasattr(raw, 'stream'):
+            content, wire_size = read_body(raw)
+        else:
+            content = response.content
+            wire_size = len(content)
+        return Response(
+            response.status_code,
+            content=content,
+            headers=response.headers,
+            url=response.url,
+            reason=response.reason,
+            wire_size=wire_size,
+        )
+
+
+class Urllib3Transport(Transport):
+    """Connection pooling transport using ``urllib3`` directly.
+
+    ``pool_connections``, ``pool_maxsize`` and ``pool_block`` have the same
+    meaning as for :class:`RequestsTransport`. Like ``requests``, up to 30
+    redirects are followed, but no retries are made by ``urllib3`` itself.
+    """
+
+    def __init__(
+        self, pool_connections=10, pool_maxsize=10, pool_block=False,
+        **kwargs
+    ):
+        super(Urllib3Transport, self).__init__(**kwargs)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.headers = {'Accept-Encoding': accept_encoding()}
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def get_pool_manager(self, verify=True):
+        """Return the pool manager for the TLS verification setting."""
+        manager = self._pools.get(verify)
+        if manager is None:
+            with self._pools_lock:
+                manager = self._pools.get(verify)
+                if manager is None:
+                    manager = self._create_pool_manager(verify)
+                    self._pools[verify] = manager
+        return manager
+
+    def _create_pool_manager(self, verify):
+        kwargs = dict(
+            num_pools=self.pool_connections,
+            maxsize=self.pool_maxsize,
+            block=self.pool_block,
+        )
+        if self.fingerprint:
+            kwargs.update(
+                cert_reqs='CERT_NONE',
+                assert_fingerprint=self.fingerprint,
+            )
+        elif verify is False:
+            kwargs.update(cert_reqs='CERT_NONE')
+        else:
+            ca_certs = verify
+            if verify is True:
+                ca_certs = requests.certs.where()
+            kwargs.update(cert_reqs='CERT_REQUIRED', ca_certs=ca_certs)
+        manager = urllib3.PoolManager(**kwargs)
+        if self.dns_cache is not None:
+            manager.pool_classes_by_scheme = dns.pool_classes_by_scheme(
+                self.dns_cache,
+            )
+        return manager
+
+    def get_pool(self, url, verify=True):
+        return self.get_pool_manager(verify).connection_from_url(url)
+
+    def close(self):
+        super(Urllib3Transport, self).close()
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+        for manager in pools.values():
+            manager.clear()
+
+    def _get_timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return urllib3.Timeout(connect=connect, read=read)
+        return urllib3.Timeout(connect=timeout, read=timeout)
+
+    def send(
+        self, method, url, params=None, headers=None, data=None,
+        timeout=None, verify=True,
+    ):
+        url = build_url(url, params)
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        manager = self.get_pool_manager(verify)
+        try:
+            raw = manager.urlopen(
+                method,
+                url,
+                body=data,
+                headers=request_headers,
+                timeout=self._get_timeout(timeout),
+                retries=urllib3.Retry(
+                    total=None, connect=0, read=0,
+                    redirect=requests.models.DEFAULT_REDIRECT_LIMIT,
+                ),
+                preload_content=False,
+            )
+            content, wire_size = read_body(raw)
+        except urllib3.exceptions.MaxRetryError as e:
+            self._raise(e.reason or e, url)
+        except urllib3.exceptions.HTTPError as e:
+            self._raise(e, url)
+        raw.release_conn()
+        return Response(
+            raw.status,
+            content=content,
+            headers=raw.headers,
+            url=url,
+            reason=raw.reason,
+            wire_size=wire_size,
+        )
+
+    def _raise(self, error, url):
+        """Raise the ``requests`` exception for an ``urllib3`` error."""
+        request = requests.Request('GET', url)
+        if isinstance(error, urllib3.exceptions.SSLError):
+            cls = requests.exceptions.SSLError
+        elif isinstance(error, urllib3.exceptions.ConnectTimeoutError):
+            cls = requests.exceptions.ConnectTimeout
+        elif isinstance(error, urllib3.exceptions.ReadTimeoutError):
+            cls = requests.exceptions.ReadTimeout
+        elif isinstance(error, urllib3.exceptions.LocationValueError):
+            cls = requests.exceptions.InvalidURL
+        elif isinstance(error, urllib3.exceptions.ResponseError):
+            # Only redirects are retried on a response.
+            cls = requests.exceptions.TooManyRedirects
+        else:
+            cls = requests.exceptions.ConnectionError
+        raise cls(error, request=request)
+
+
+class MemoryTransport(Transport):
+    """Transport serving registered responses from memory.
+
+    Usage::
+
+        >>> from mls.apiclient import api
+        >>> from mls.apiclient.transport import MemoryTransport
+        >>> transport = MemoryTransport()
+        >>> transport.add(
+        ...     'https://demomls.com/api/rest/v1/developments',
+        ...     body='{"collection": []}',
+        ... )
+        >>> mls = api.API('https://demomls.com', transport=transport)
+
+    Responses are matched by method and URL without the query string.
+    Requests without a registered response get a 404 response. All sent
+    requests are recorded in ``calls``.
+    """
+
+    def __init__(self, **kwargs):
+        super(MemoryTransport, self).__init__(**kwargs)
+        self.calls = []
+        self._responses = {}
+
+    def add(self, url, body=b'', status=200, headers=None, method='GET'):
+        """Register a response."""
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self._responses[(method.upper(), url.split('?')[0])] = (
+            status, body, headers or {},
+        )
+
+    def reset(self):
+        """Remove all registered responses and recorded calls."""
+        self.calls = []
+        self._responses = {}
+
+    def send(
+        self, method, url, params=None, headers=None, data=None,
+        timeout=None, verify=True,
+    ):
+        url = build_url(url, params)
+        self.calls.append((method, url))
+        status, body, response_headers = self._responses.get(
+            (method.upper(), url.split('?')[0]), (404, b'', {}),
+        )
+        return Response(
+            status,
+            content=body,
+            headers=response_headers,
+            url=url,
+        )
@@ -107,6 +107,35 @@ def extract_headers(headers, prefix):
                 if key.upper().startswith(prefix))
 
 
+def get_count(headers, name, default=None):
+    """Return the integer value of a count header like ``CountTotal``."""
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_page_offsets(headers):
+    """Return the offsets of the pages following the current page.
+
+    Uses the ``CountTotal``, ``CountLimit`` and ``CountOffset`` headers of
+    a collection.
+
+    Usage::
+
+        >>> get_page_offsets(
+        ...     {'CountTotal': 60, 'CountLimit': 25, 'CountOffset': 0},
+        ... )
+        [25, 50]
+    """
+    total = get_count(headers, 'CountTotal')
+    limit = get_count(headers, 'CountLimit')
+    if total is None or not limit:
+        return []
+    offset = get_count(headers, 'CountOffset', 0)
+    return range(offset + limit, total, limit)
+
+
 def wrap_data_response(data, status=200, headers={}):
     """Wrap a data dictionary with the appropriate response format if the
     response uses enveloped headers with optional parameters to include a